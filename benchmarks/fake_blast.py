@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Stand-in for blastn/blastx that replays canned outfmt-6 hits.
+
+Installed as `blastn` and `blastx` (symlinks) in a directory placed first on PATH.
+The name it is called by picks the canned file: $CDMEC_FAKE_HITS/<blastn|blastx>.outfmt6.
+Only rows whose qseqid is in the query FASTA are printed; batched "<sample>::<contig>"
+queries get their prefix back. Latency is $CDMEC_FAKE_LATENCY seconds per call plus
+$CDMEC_FAKE_LATENCY_PER_MB seconds per megabase of query.
+"""
+
+import os
+import sys
+import time
+
+def query_ids(handle):
+    ids, bases = {}, 0
+    for line in handle:
+        if line.startswith('>'):
+            query_id = line[1:].split()[0]
+            # Batched IDs look like <sample>::<contig>; canned hits use the bare contig ID
+            ids[query_id.rsplit("::", 1)[-1]] = query_id
+        else: bases += len(line.strip())
+    return ids, bases
+
+def main(argv):
+    tool = os.path.basename(argv[0])
+    query = argv[argv.index("-query") + 1]
+    if query == "-": ids, bases = query_ids(sys.stdin)
+    else:
+        with open(query) as f: ids, bases = query_ids(f)
+
+    time.sleep(float(os.environ.get("CDMEC_FAKE_LATENCY", 0)) + float(os.environ.get("CDMEC_FAKE_LATENCY_PER_MB", 0)) * bases / 1e6)
+
+    canned = os.path.join(os.environ.get("CDMEC_FAKE_HITS", "."), f"{tool}.outfmt6")
+    out = sys.stdout
+    with open(canned) as f:
+        for line in f:
+            contig_id, rest = line.split('\t', 1)
+            if contig_id in ids: out.write(f"{ids[contig_id]}\t{rest}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
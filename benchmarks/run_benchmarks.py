@@ -0,0 +1,232 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Times the CdMEC-A pipeline stages on synthetic data and compares them against a stored baseline."""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path[:0] = [os.path.join(REPO, "bin"), os.path.join(REPO, "plotting"), HERE]
+
+from synthetic import SCALES, write_dataset
+
+STAGES = ["parse_hits", "analyze_context", "write_output", "process_sample", "collector", "signature_distance", "startup"]
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+CDMEC = os.path.join(REPO, "bin", "cdmec.py")
+STARTUP_COMMANDS = ["analyze", "report", "stats", "collect", "signatures", "plot", "map", "reanalyze", "shards"]
+# Commands that must start without any of HEAVY_MODULES (array jobs pay their start-up once per task)
+LIGHT_COMMANDS = ["analyze", "report", "reanalyze", "shards", "db", "flanks"]
+HEAVY_MODULES = {"pandas", "numpy", "matplotlib", "seaborn", "scipy", "pyarrow", "tqdm"}
+
+def timed(fn, repeat):
+    """Runs fn repeat times; returns (seconds per run, last result)."""
+    runs, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    return runs, result
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()): yield
+
+@contextlib.contextmanager
+def fake_blast(hits_dir, latency, latency_per_mb):
+    """Puts blastn/blastx stand-ins that replay hits_dir first on PATH."""
+    bin_dir = tempfile.mkdtemp(prefix="cdmec_fake_blast_")
+    saved = {k: os.environ.get(k) for k in ["PATH", "CDMEC_FAKE_HITS", "CDMEC_FAKE_LATENCY", "CDMEC_FAKE_LATENCY_PER_MB"]}
+    try:
+        for tool in ["blastn", "blastx"]: os.symlink(os.path.join(HERE, "fake_blast.py"), os.path.join(bin_dir, tool))
+        os.environ.update({"PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""), "CDMEC_FAKE_HITS": hits_dir,
+                           "CDMEC_FAKE_LATENCY": str(latency), "CDMEC_FAKE_LATENCY_PER_MB": str(latency_per_mb)})
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None: os.environ.pop(k, None)
+            else: os.environ[k] = v
+        shutil.rmtree(bin_dir, ignore_errors=True)
+
+def heavy_imports(command=None):
+    """HEAVY_MODULES imported by `cdmec [command] --help`, from the interpreter's -X importtime log."""
+    cmd = [sys.executable, "-X", "importtime", CDMEC] + ([command] if command else []) + ["--help"]
+    log = subprocess.run(cmd, capture_output=True, text=True).stderr
+    names = {line.rsplit('|', 1)[-1].strip().split('.')[0] for line in log.splitlines() if line.startswith("import time:")}
+    return sorted(names & HEAVY_MODULES)
+
+def sample_of(contig_id):
+    return contig_id.rsplit("_ctg", 1)[0]
+
+def group_by_sample(hits):
+    grouped = {}
+    for hit in hits: grouped.setdefault(sample_of(hit['Contig_ID']), []).append(hit)
+    return grouped
+
+def run_suite(data_dir, work_dir, stages, repeat, workers, latency, latency_per_mb):
+    import cdmec_analyzer as analyzer
+
+    results = {}
+    def record(name, runs, items, unit):
+        results[name] = {"Min_Seconds": min(runs), "Median_Seconds": statistics.median(runs), "Runs": runs,
+                         "Items": items, "Unit": unit, "Per_Item_ms": 1000 * min(runs) / items if items else None}
+        print(f"{name:<20} {min(runs):>9.3f}s  (median {statistics.median(runs):.3f}s, {items} {unit})")
+
+    with open(os.path.join(data_dir, "hits", "blastx.outfmt6")) as f: arg_lines = f.readlines()
+    with open(os.path.join(data_dir, "hits", "blastn.outfmt6")) as f: mge_lines = f.readlines()
+    fasta_files = sorted(glob.glob(os.path.join(data_dir, "fasta", "*.fasta")))
+
+    runs, (arg_hits, mge_hits) = timed(lambda: (analyzer.parse_hits(arg_lines, "ARG"), analyzer.parse_hits(mge_lines, "MGE")), repeat)
+    if "parse_hits" in stages: record("parse_hits", runs, len(arg_lines) + len(mge_lines), "lines")
+
+    args_by_sample, mges_by_sample = group_by_sample(arg_hits), group_by_sample(mge_hits)
+    samples = sorted(set(args_by_sample) | set(mges_by_sample))
+    runs, contexts = timed(lambda: {s: analyzer.analyze_context(args_by_sample.get(s, []), mges_by_sample.get(s, []))
+                                    for s in samples}, repeat)
+    if "analyze_context" in stages: record("analyze_context", runs, len(arg_hits), "ARG hits")
+
+    summary_dir = os.path.join(work_dir, "summaries")
+    runs, _ = timed(lambda: [analyzer.write_output(summary_dir, s, rows) for s, rows in contexts.items() if rows], repeat)
+    if "write_output" in stages: record("write_output", runs, sum(map(len, contexts.values())), "rows")
+
+    if "process_sample" in stages:
+        out_dir = os.path.join(work_dir, "pipeline")
+        with fake_blast(os.path.join(data_dir, "hits"), latency, latency_per_mb), quiet():
+            runs, reports = timed(lambda: [analyzer.process_sample(f, out_dir, "1") for f in fasta_files], repeat)
+        record("process_sample", runs, len(fasta_files), "samples")
+        # A broken stand-in would otherwise look like a very fast pipeline
+        results["process_sample"]["Failures"] = sum(message.startswith("Failed") for message, _, _ in reports)
+        if results["process_sample"]["Failures"]: print(f"  warning: {results['process_sample']['Failures']} samples failed")
+
+    if "collector" in stages:
+        import master_Collector
+        master_path = os.path.join(work_dir, "Benchmark_Master.csv")
+        with quiet(): runs, _ = timed(lambda: master_Collector.collect_data(summary_dir, master_path, workers, full=True), repeat)
+        record("collector", runs, len(glob.glob(os.path.join(summary_dir, "*_summary.tsv"))), "files")
+
+    if "signature_distance" in stages:
+        import SignatureDistance
+        summaries = sorted(glob.glob(os.path.join(summary_dir, "*_summary.tsv")))
+        folders = {}
+        for h, host in enumerate(["Porcine", "Environment", "Human"]):
+            folders[host] = os.path.join(work_dir, "hosts", host)
+            os.makedirs(folders[host], exist_ok=True)
+            for path in summaries[h::3]: shutil.copy(path, folders[host])
+        cwd = os.getcwd()
+        os.chdir(work_dir)  # run_analysis writes its CSV to the working directory
+        try:
+            with quiet(): runs, _ = timed(lambda: SignatureDistance.run_analysis(folders, "*_summary.tsv", workers), repeat)
+        finally: os.chdir(cwd)
+        record("signature_distance", runs, len(summaries), "files")
+
+    if "startup" in stages:
+        # Fresh interpreters, so this is the cold start every `cdmec <command>` invocation pays
+        per_command = {c: timed(lambda c=c: subprocess.run([sys.executable, CDMEC, c, "--help"], capture_output=True).returncode,
+                                repeat) for c in STARTUP_COMMANDS}
+        runs = [sum(per_command[c][0][i] for c in STARTUP_COMMANDS) for i in range(repeat)]
+        record("startup", runs, len(STARTUP_COMMANDS), "commands")
+        results["startup"]["Commands"] = {c: min(r) for c, (r, _) in per_command.items()}
+        results["startup"]["Failures"] = sorted(c for c, (_, code) in per_command.items() if code != 0)
+        if results["startup"]["Failures"]: print(f"  warning: --help failed for {', '.join(results['startup']['Failures'])}")
+        heavy = {c or "cdmec": heavy_imports(c) for c in [None] + LIGHT_COMMANDS}
+        results["startup"]["Heavy_Imports"] = {c: mods for c, mods in heavy.items() if mods}
+        for c, mods in results["startup"]["Heavy_Imports"].items(): print(f"  warning: '{c}' imports {', '.join(mods)} at start-up")
+    return results
+
+def compare(results, baseline, tolerance):
+    """Per-stage ratio of current to baseline minimum time; beyond +/- tolerance is a regression or improvement."""
+    comparison = {}
+    for name, current in results.items():
+        base = baseline.get("Benchmarks", {}).get(name)
+        if not base: continue
+        ratio = current["Min_Seconds"] / base["Min_Seconds"] if base["Min_Seconds"] else float('inf')
+        status = "regression" if ratio > 1 + tolerance else ("improved" if ratio < 1 / (1 + tolerance) else "ok")
+        comparison[name] = {"Baseline_Seconds": base["Min_Seconds"], "Current_Seconds": current["Min_Seconds"],
+                            "Ratio": ratio, "Status": status}
+    return comparison
+
+def environment():
+    try: commit = subprocess.run(["git", "-C", REPO, "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError: commit = ""
+    return {"Timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "Commit": commit or None, "Python": platform.python_version(),
+            "Platform": platform.platform(), "CPUs": os.cpu_count()}
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="CdMEC-A benchmark suite (synthetic data, stand-in BLAST).")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Synthetic dataset size.")
+    parser.add_argument("--samples", type=int, help="Override the number of samples for the chosen scale.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data_dir", help="Reuse (or create) the synthetic dataset here instead of a temporary directory.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to time.")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per stage; the minimum is compared.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Workers for the collector and SignatureDistance.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stand-in BLAST latency per call (seconds).")
+    parser.add_argument("--latency_per_mb", type=float, default=0.0, help="Extra stand-in BLAST latency per Mb of query.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Where to write the JSON results.")
+    parser.add_argument("-b", "--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against.")
+    parser.add_argument("--save_baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a stage counts as a regression.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    dataset = dict(SCALES[args.scale], Scale=args.scale, Seed=args.seed)
+    if args.samples: dataset["Samples"] = args.samples
+
+    work_dir = tempfile.mkdtemp(prefix="cdmec_bench_")
+    data_dir = args.data_dir or os.path.join(work_dir, "data")
+    try:
+        meta_path = os.path.join(data_dir, "dataset.json")
+        wanted = {k: dataset[k] for k in ["Samples", "Contigs", "Contig_Length", "ARGs_Per_Mb", "MGEs_Per_Mb", "Seed"]}
+        meta = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f: meta = json.load(f)
+            if {k: meta.get(k) for k in wanted} != wanted: meta = None
+        if meta is None:
+            print(f"Generating {args.scale} dataset in {data_dir} ...")
+            if os.path.isdir(data_dir) and args.data_dir: shutil.rmtree(data_dir)
+            meta = write_dataset(data_dir, wanted["Samples"], wanted["Contigs"], wanted["Contig_Length"],
+                                 wanted["ARGs_Per_Mb"], wanted["MGEs_Per_Mb"], wanted["Seed"])
+        print(f"Dataset: {meta['Samples']} samples, {meta['Bases'] / 1e6:.1f} Mb, {meta['ARG_Hits']} ARG / {meta['MGE_Hits']} MGE hits")
+
+        results = run_suite(data_dir, work_dir, args.stages, args.repeat, args.workers, args.latency, args.latency_per_mb)
+    finally: shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"Environment": environment(), "Dataset": {**meta, "Scale": args.scale},
+              "Settings": {"Repeat": args.repeat, "Workers": args.workers, "Latency": args.latency,
+                           "Latency_Per_Mb": args.latency_per_mb},
+              "Benchmarks": results}
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        if baseline.get("Dataset", {}).get("Bases") != meta["Bases"] or baseline.get("Settings") != report["Settings"]:
+            print(f"Note: {args.baseline} was recorded with a different dataset or settings; ratios are indicative only.")
+        report["Baseline"] = {"Path": os.path.abspath(args.baseline), "Environment": baseline.get("Environment")}
+        report["Comparison"] = compare(results, baseline, args.tolerance)
+        print("\nStage                 Baseline    Current   Ratio  Status")
+        for name, c in report["Comparison"].items():
+            print(f"{name:<20} {c['Baseline_Seconds']:>9.3f}s {c['Current_Seconds']:>9.3f}s {c['Ratio']:>6.2f}x  {c['Status']}")
+        regressions = [name for name, c in report["Comparison"].items() if c["Status"] == "regression"]
+
+    with open(args.output, 'w') as f: json.dump(report, f, indent=4)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f: json.dump(report, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
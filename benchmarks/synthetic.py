@@ -0,0 +1,73 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Synthetic C. difficile-like assemblies and matching outfmt-6 hit sets for benchmarking."""
+
+import argparse
+import json
+import os
+import numpy as np
+
+GC_CONTENT = 0.29  # C. difficile genomes are ~29% GC
+ARG_NAMES = ["gb|AAB60941|ARO:3000186|tetM", "gb|CAA47323|ARO:3000498|ermB", "gb|AAA26631|ARO:3002639|aac(6')-Ie-aph(2'')-Ia",
+             "gb|AAF86219|ARO:3000190|tetO", "gb|ABC59680|ARO:3002822|vanG", "gb|ACF33399|ARO:3004123|cfrC",
+             "gb|AAB82633|ARO:3002617|ant(6)-Ia", "gb|CAB60046|ARO:3002897|lnuB"]
+MGE_NAMES = ["Tn916_Integrase", "Tn916_Excisionase", "Tn5397_Resolvase", "Tn6194_Transposase", "IS1165_Transposase",
+             "ISCdi3_Transposase", "CTn1_Integrase", "repA_pCD6", "pCDBI1_plasmid_rep", "phiCD119_Integrase"]
+SCALES = {
+    "small": {"Samples": 8, "Contigs": 40, "Contig_Length": 100000, "ARGs_Per_Mb": 12, "MGEs_Per_Mb": 40},
+    "medium": {"Samples": 32, "Contigs": 60, "Contig_Length": 70000, "ARGs_Per_Mb": 15, "MGEs_Per_Mb": 60},
+    "large": {"Samples": 128, "Contigs": 80, "Contig_Length": 52000, "ARGs_Per_Mb": 20, "MGEs_Per_Mb": 80},
+}
+
+def make_assembly(rng, sample_id, n_contigs, contig_length):
+    """Contigs of varying length (+/- 50%) drawn with C. difficile base composition."""
+    probs = [(1 - GC_CONTENT) / 2, GC_CONTENT / 2, GC_CONTENT / 2, (1 - GC_CONTENT) / 2]
+    bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+    for i in range(n_contigs):
+        length = int(contig_length * rng.uniform(0.5, 1.5))
+        yield f"{sample_id}_ctg{i + 1}", bases[rng.choice(4, size=length, p=probs)].tobytes().decode('ascii')
+
+def hit_rows(rng, contig_id, contig_length, names, per_mb, span):
+    """outfmt-6 rows (qseqid sseqid pident length qstart qend sstart send evalue bitscore slen) at random positions."""
+    rows = []
+    for _ in range(rng.poisson(per_mb * contig_length / 1e6)):
+        length = int(rng.integers(*span))
+        start = int(rng.integers(1, max(2, contig_length - length)))
+        q_start, q_end = (start, start + length - 1) if rng.random() < 0.5 else (start + length - 1, start)
+        rows.append(f"{contig_id}\t{names[rng.integers(len(names))]}\t{rng.uniform(80, 100):.3f}\t{length}\t"
+                    f"{q_start}\t{q_end}\t1\t{length}\t{10 ** -rng.uniform(10, 180):.2e}\t{rng.uniform(100, 2000):.1f}\t{length}\n")
+    return rows
+
+def write_dataset(out_dir, samples, contigs, contig_length, args_per_mb, mges_per_mb, seed=0):
+    """Writes fasta/<sample>.fasta plus hits/blastx.outfmt6 (ARGs) and hits/blastn.outfmt6 (MGEs)."""
+    rng = np.random.default_rng(seed)
+    fasta_dir, hits_dir = os.path.join(out_dir, "fasta"), os.path.join(out_dir, "hits")
+    os.makedirs(fasta_dir, exist_ok=True); os.makedirs(hits_dir, exist_ok=True)
+    totals = {"Bases": 0, "ARG_Hits": 0, "MGE_Hits": 0}
+    with open(os.path.join(hits_dir, "blastx.outfmt6"), 'w') as arg_out, open(os.path.join(hits_dir, "blastn.outfmt6"), 'w') as mge_out:
+        for s in range(samples):
+            sample_id = f"synCD{s + 1:04d}"
+            with open(os.path.join(fasta_dir, f"{sample_id}.fasta"), 'w') as fasta:
+                for contig_id, seq in make_assembly(rng, sample_id, contigs, contig_length):
+                    fasta.write(f">{contig_id}\n")
+                    for i in range(0, len(seq), 80): fasta.write(seq[i:i + 80] + "\n")
+                    arg_rows = hit_rows(rng, contig_id, len(seq), ARG_NAMES, args_per_mb, (600, 2400))
+                    mge_rows = hit_rows(rng, contig_id, len(seq), MGE_NAMES, mges_per_mb, (300, 5000))
+                    arg_out.writelines(arg_rows); mge_out.writelines(mge_rows)
+                    totals["Bases"] += len(seq); totals["ARG_Hits"] += len(arg_rows); totals["MGE_Hits"] += len(mge_rows)
+    meta = {"Samples": samples, "Contigs": contigs, "Contig_Length": contig_length, "ARGs_Per_Mb": args_per_mb,
+            "MGEs_Per_Mb": mges_per_mb, "Seed": seed, **totals}
+    with open(os.path.join(out_dir, "dataset.json"), 'w') as f: json.dump(meta, f, indent=4)
+    return meta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic CdMEC-A benchmark dataset.")
+    parser.add_argument("-o", "--output_dir", required=True)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    s = SCALES[args.scale]
+    meta = write_dataset(args.output_dir, s["Samples"], s["Contigs"], s["Contig_Length"], s["ARGs_Per_Mb"], s["MGEs_Per_Mb"], args.seed)
+    print(f"Wrote {meta['Samples']} samples ({meta['Bases'] / 1e6:.1f} Mb, {meta['ARG_Hits']} ARG / {meta['MGE_Hits']} MGE hits) to {args.output_dir}")
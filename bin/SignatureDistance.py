@@ -5,78 +5,159 @@
 import pandas as pd
 import os
 import glob
+import json
 import argparse
-from concurrent.futures import ThreadPoolExecutor
-from tqdm import tqdm
-from scipy import stats 
+from concurrent.futures import ProcessPoolExecutor
 
 def parse_args():
     parser = argparse.ArgumentParser(description="One Health Parallel Analysis (Signature Logic)")
     parser.add_argument("--porcine", "-p", default="animal_fna_cdmec")
     parser.add_argument("--environment", "-e", default="env_fna_cdmec")
     parser.add_argument("--human", "-u", default="human_fna_cdmec")
-    parser.add_argument("--pattern", default="*.tsv")
+    parser.add_argument("--pattern", default="*.tsv", help="File pattern per host folder, e.g. '*.tsv' or '*_cdmec.parquet'.")
     parser.add_argument("--workers", "-w", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk_size", type=int, default=256, help="Files parsed per worker task.")
+    parser.add_argument("--save_partials", metavar="DIR",
+                        help="Also write each host's partial aggregate to DIR/<host>_signature_partial.json.")
+    parser.add_argument("--merge_partials", nargs="+", metavar="JSON",
+                        help="Skip the TSVs: merge saved partials (from runs over disjoint sets of files) per host.")
     return parser.parse_args()
 
 def process_single_file(file_path):
     try:
         # Load columns + file source to track prevalence correctly
-        df = pd.read_csv(file_path, sep="\t", usecols=["ARG_Name", "Proximity_bp"])
+        if file_path.endswith(".parquet"):
+            df = pd.read_parquet(file_path, columns=["ARG_Name", "Proximity_bp"])
+            df["ARG_Name"] = df["ARG_Name"].astype(object)
+        else:
+            df = pd.read_csv(file_path, sep="\t", usecols=["ARG_Name", "Proximity_bp"])
         df.columns = [c.strip() for c in df.columns]
         # Track which file this came from
         df['File_Source'] = os.path.basename(file_path)
         return df
     except Exception:
         return pd.DataFrame()
-def run_analysis(folders, pattern, max_workers):
+def aggregate_files(file_paths):
+    """Partial aggregate for a chunk of files. Partials merge by summation (merge_partials), so chunks,
+    workers or whole per-host runs saved with --save_partials combine without re-reading any TSV."""
+    frames = [df for df in map(process_single_file, file_paths) if not df.empty]
+    if not frames:
+        return {"Pairs": pd.Series(dtype="int64"), "Hits": pd.Series(dtype="int64"),
+                "Files": pd.Series(dtype="int64"), "N_Files": len(file_paths)}
+    chunk = pd.concat(frames, ignore_index=True)
+    return {
+        # (gene, distance) occurrence counts -> the distance mode
+        "Pairs": chunk.groupby(["ARG_Name", "Proximity_bp"]).size(),
+        "Hits": chunk.groupby("ARG_Name").size(),
+        "Files": chunk.drop_duplicates(["ARG_Name", "File_Source"]).groupby("ARG_Name").size(),
+        "N_Files": len(file_paths),
+    }
+
+def merge_partials(partials):
+    partials = list(partials)
+    merged = {"N_Files": sum(p["N_Files"] for p in partials)}
+    for key in ["Pairs", "Hits", "Files"]:
+        parts = [p[key] for p in partials if len(p[key])]
+        merged[key] = (pd.concat(parts).groupby(level=list(range(parts[0].index.nlevels))).sum()
+                       if parts else pd.Series(dtype="int64"))
+    return merged
+
+def save_partial(partial, host, path):
+    """Writes a host's partial aggregate as JSON (index tuples + counts) for a later --merge_partials."""
+    def records(series): return [[*(k if isinstance(k, tuple) else (k,)), int(n)] for k, n in series.items()]
+    data = {"Host": host, "N_Files": partial["N_Files"],
+            **{key: records(partial[key]) for key in ["Pairs", "Hits", "Files"]}}
+    with open(f"{path}.tmp", 'w') as f: json.dump(data, f, separators=(',', ':'))
+    os.replace(f"{path}.tmp", path)
+
+def load_partial(path):
+    with open(path) as f: data = json.load(f)
+    def series(rows, names):
+        if not rows: return pd.Series(dtype="int64")
+        index = (pd.MultiIndex.from_tuples([tuple(r[:-1]) for r in rows], names=names) if len(names) > 1
+                 else pd.Index([r[0] for r in rows], name=names[0]))
+        return pd.Series([r[-1] for r in rows], index=index, dtype="int64")
+    return data["Host"], {"Pairs": series(data["Pairs"], ["ARG_Name", "Proximity_bp"]),
+                          "Hits": series(data["Hits"], ["ARG_Name"]), "Files": series(data["Files"], ["ARG_Name"]),
+                          "N_Files": data["N_Files"]}
+
+def summarize_partial(partial, total_samples, host):
+    """Per-gene signature table from a (merged) partial aggregate."""
+    pairs = partial["Pairs"].rename("Count").reset_index()
+    # Most frequent distance per gene; ties go to the smallest distance, as scipy.stats.mode does
+    modes = (pairs.sort_values(["ARG_Name", "Count", "Proximity_bp"], ascending=[True, False, True])
+             .drop_duplicates("ARG_Name").set_index("ARG_Name")["Proximity_bp"])
+    summary = pd.DataFrame({
+        # Distance Signature
+        "Signature_Distance_bp": modes,
+        # Total Count (for Redundancy)
+        "Total_Hits": partial["Hits"],
+        # Unique Files (for Prevalence)
+        "Samples_With_Gene": partial["Files"],
+    }).rename_axis("ARG_Name").sort_index().reset_index()
+
+    # 1. Prevalence %: Percentage of genomes containing the gene (Max 100%)
+    summary["Prevalence_Pct"] = (summary["Samples_With_Gene"] / total_samples) * 100
+    
+    # 2. Avg Copies: The "Redundancy" / Dosage metric (e.g., 15.4 copies/genome)
+    summary["Avg_Copies_Per_Genome"] = summary["Total_Hits"] / total_samples
+    
+    summary["Host"] = host
+    summary.rename(columns={"ARG_Name": "Gene"}, inplace=True)
+    return summary
+
+def write_signatures(final_rows):
+    if final_rows:
+        output_df = pd.concat(final_rows, ignore_index=True)
+        # This will now have the columns your Visualization script expects
+        output_df.to_csv("one_health_spatial_signatures.csv", index=False)
+        print("\n Success: 'one_health_spatial_signatures.csv' created with Prevalence and Redundancy metrics.")
+
+def merge_saved(paths):
+    """Signatures from saved partials; partials of the same host are summed, so they must cover disjoint files."""
+    by_host = {}
+    for path in paths:
+        host, partial = load_partial(path)
+        by_host.setdefault(host, []).append(partial)
     final_rows = []
+    for host, partials in by_host.items():
+        partial = merge_partials(partials)
+        print(f"[*] Merged {host}: {len(partials)} partials, {partial['N_Files']} files")
+        if partial["N_Files"] and len(partial["Hits"]): final_rows.append(summarize_partial(partial, partial["N_Files"], host))
+    write_signatures(final_rows)
+
+def run_analysis(folders, pattern, max_workers, chunk_size=256, partials_dir=None):
+    from tqdm import tqdm  # progress bars only; not needed to import the aggregation helpers
+    final_rows = []
+    if partials_dir: os.makedirs(partials_dir, exist_ok=True)
 
     for host, path in folders.items():
         if not os.path.isdir(path):
             continue
 
-        files = glob.glob(os.path.join(path, pattern))
+        files = sorted(glob.glob(os.path.join(path, pattern)))
         total_samples = len(files)
         if total_samples == 0:
             continue
 
         print(f"[*] Processing {host} ({total_samples} files)...")
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = list(tqdm(executor.map(process_single_file, files), total=total_samples))
-
-        if not results: continue
-        host_df = pd.concat(results, ignore_index=True)
-        # --- REVISED CALCULATION LOGIC ---
-        summary = host_df.groupby("ARG_Name").agg(
-            # Distance Signature
-            Signature_Distance_bp=("Proximity_bp", lambda x: stats.mode(x, keepdims=True).mode[0]),
-            # Total Count (for Redundancy)
-            Total_Hits=("ARG_Name", "size"),
-            # Unique Files (for Prevalence)
-            Samples_With_Gene=("File_Source", "nunique")
-        ).reset_index()
-
-        # 1. Prevalence %: Percentage of genomes containing the gene (Max 100%)
-        summary["Prevalence_Pct"] = (summary["Samples_With_Gene"] / total_samples) * 100
-        
-        # 2. Avg Copies: The "Redundancy" / Dosage metric (e.g., 15.4 copies/genome)
-        summary["Avg_Copies_Per_Genome"] = summary["Total_Hits"] / total_samples
-        
-        summary["Host"] = host
-        summary.rename(columns={"ARG_Name": "Gene"}, inplace=True)
-        
-        final_rows.append(summary)
+        # Parsing is GIL-bound, so chunks of files go to separate processes and come back as small partials
+        chunks = [files[i:i + chunk_size] for i in range(0, total_samples, chunk_size)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            partials = list(tqdm(executor.map(aggregate_files, chunks), total=len(chunks), unit="chunk"))
 
-    if final_rows:
-        output_df = pd.concat(final_rows, ignore_index=True)
-        # This will now have the columns your Visualization script expects
-        output_df.to_csv("one_health_spatial_signatures.csv", index=False)
-        print("\n Success: 'one_health_spatial_signatures.csv' created with Prevalence and Redundancy metrics.")
+        partial = merge_partials(partials)
+        if partials_dir: save_partial(partial, host, os.path.join(partials_dir, f"{host}_signature_partial.json"))
+        if not len(partial["Hits"]): continue
+        final_rows.append(summarize_partial(partial, total_samples, host))
+
+    write_signatures(final_rows)
 
 if __name__ == "__main__":
     args = parse_args()
-    target_folders = {"Porcine": args.porcine, "Environment": args.environment, "Human": args.human}
-    run_analysis(target_folders, args.pattern, args.workers)
+    if args.merge_partials: merge_saved(args.merge_partials)
+    else:
+        target_folders = {"Porcine": args.porcine, "Environment": args.environment, "Human": args.human}
+        run_analysis(target_folders, args.pattern, args.workers, args.chunk_size, args.save_partials)
 
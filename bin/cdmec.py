@@ -0,0 +1,78 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Single `cdmec` entry point: `cdmec <command> [options]` runs the matching script.
+
+Only the chosen command's module is imported, so pandas, matplotlib and seaborn load only for the
+commands that use them and `cdmec analyze` starts as fast as the bare analyzer.
+"""
+
+import importlib.util
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# plotting/ sits beside bin/ in the checkout and inside the installed cdmec package
+PLOTTING = os.path.join(HERE, "plotting")
+if not os.path.isdir(PLOTTING): PLOTTING = os.path.join(os.path.dirname(HERE), "plotting")
+
+# command: (module, summary)
+COMMANDS = {
+    "analyze": ("cdmec_analyzer", "BLAST the assemblies and classify ARG-MGE context"),
+    "collect": ("master_Collector", "Merge per-sample results into the master table and plot the distribution"),
+    "report": ("cdmec_reporter", "Manuscript summary statistics"),
+    "stats": ("cdmec_stats_generator", "Top mobile ARG and MGE tables"),
+    "signatures": ("SignatureDistance", "Per-host spatial signatures and prevalence"),
+    "plot": ("arg_mge_plotter", "Per-sample proximity histograms"),
+    "map": ("arg_mge_plotter_Map", "Contig maps of ARG-MGE neighbourhoods"),
+    "onehealth": ("OneHealthVisualization", "One Health cross-host comparison figures"),
+    "reanalyze": ("cdmec_reanalyze", "Sweep context thresholds over saved hits without BLAST"),
+    "shards": ("cdmec_shards", "Preview a sharded split, or verify and merge finished shards"),
+    "db": ("cdmec_db", "BLAST database status, build and node-local staging"),
+    "flanks": ("cdmec_flanks", "FASTA indexing and flanking-sequence export"),
+    "kmer": ("cdmec_kmer", "Build or validate the k-mer MGE index"),
+    "store": ("cdmec_store", "Import summaries into the SQLite results store"),
+}
+
+def usage():
+    width = max(map(len, COMMANDS))
+    lines = ["usage: cdmec <command> [options]", "", "commands:"]
+    lines += [f"  {name:<{width}}  {summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += ["", "Run 'cdmec <command> --help' for a command's options."]
+    return "\n".join(lines)
+
+def run_as_main(spec):
+    """Runs a script as __main__ like runpy.run_module(alter_sys=True), minus its sys.argv[0] rewrite.
+
+    The script executes in a real __main__ module, so its worker functions stay picklable for the process
+    pools, and argparse keeps 'cdmec <command>' as the program name instead of the script's path.
+    """
+    script = importlib.util.module_from_spec(spec)
+    script.__name__ = "__main__"
+    saved = sys.modules["__main__"]
+    sys.modules["__main__"] = script
+    try: exec(spec.loader.get_code(spec.name), script.__dict__)
+    finally: sys.modules["__main__"] = saved
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    if argv[0] not in COMMANDS:
+        sys.stderr.write(f"cdmec: unknown command '{argv[0]}'\n\n{usage()}\n")
+        return 2
+    module = COMMANDS[argv[0]][0]
+    for path in (HERE, PLOTTING):
+        if path not in sys.path: sys.path.insert(0, path)
+    spec = importlib.util.find_spec(module)
+    if spec is None:
+        sys.stderr.write(f"cdmec: cannot find {module}.py; run from the repository or reinstall it with 'pip install .'\n")
+        return 1
+    sys.argv = [f"cdmec {argv[0]}", *argv[1:]]
+    run_as_main(spec)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
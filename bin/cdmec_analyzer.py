@@ -9,7 +9,24 @@ import csv
 import sys
 import os
 import glob
+import gzip
+import tempfile
+import threading
+import contextlib
+import cProfile
+import time
+from collections import Counter
+from itertools import groupby
 from concurrent.futures import ProcessPoolExecutor, as_completed
+from cdmec_cache import HitCache, cache_key, sequence_hash
+from cdmec_db import DEFAULT_REFERENCES, db_exists, db_fingerprint, ensure_mge_db, stage_db
+from cdmec_manifest import RunManifest
+from cdmec_fasta import QueryFeed, fasta_size, find_fastas, query_records, read_fasta
+from cdmec_store import store_results
+from cdmec_sketch import sketch_path, write_sketch
+from cdmec_flanks import export_flanks, flanks_path
+from cdmec_shards import assign_shards, parse_shard, shard_dir, write_shard_plan
+from cdmec_telemetry import RUN_LOG_NAME, RunLog, merge_profiles, peak_rss_mb, print_summary, reset_peak_rss
 
 # --- Configuration & Global Variables ---
 BLAST_TOOL_NUCL = "blastn"
@@ -18,121 +35,749 @@ BLAST_TOOL_PROT = "blastx"
 ARG_DB_PATH = "card_protein_homolog_db"
 MGE_DB_PATH = "combined_C_Diff_mge_nucl_db"
 CONTEXT_THRESHOLD = 10000
+BLAST_TIMEOUT = 600       # floor of the per-search timeout (seconds)
+TIMEOUT_PER_MB = 150      # ...which grows by this much per Mb of query, so large genomes are not cut off
+EVALUE_CUTOFF = 1e-5
+# Two HSPs are one locus when they share at least this fraction of the shorter one
+MIN_LOCUS_OVERLAP = 0.5
+# Longest ARG footprint (bp) a two-stage window must hold beyond CONTEXT_THRESHOLD so hits are never truncated
+TWO_STAGE_MARGIN = 10000
+# Joins a tag and the contig ID in packed queries (sample ID in multi-sample batches, query index for cache misses)
+BATCH_ID_SEP = "::"
 
 def parse_arguments():
     parser = argparse.ArgumentParser(
         description="CdMEC-A: Hybrid Multithreaded Context Analyzer.",
         formatter_class=argparse.RawTextHelpFormatter 
     )
-    parser.add_argument("-i", "--input_dir", required=True, help="Directory containing FASTA files.")
+    parser.add_argument("-i", "--input_dir", required=True,
+                        help="Directory containing FASTA files (plain, or gzip/bgzip/zstd compressed).")
     parser.add_argument("-o", "--output_dir", default="./cdmec_analysis_reports", help="Output directory.")
     parser.add_argument("-t", "--workers", type=int, default=2, 
                         help="Number of samples to process in parallel (Python workers).")
     parser.add_argument("-bt", "--blast_threads", type=str, default="4", 
                         help="Number of threads per BLAST command (BLAST -num_threads).")
+    parser.add_argument("--all_mge_hits", action="store_true",
+                        help="Also write every MGE within the context window of each ARG\n(all_mges/<sample>_cdmec_all_mges.tsv), not just the nearest.")
+    parser.add_argument("--output_format", choices=["tsv", "parquet", "both"], default="tsv",
+                        help="Per-sample results as JSON+TSV (default), typed Parquet (<sample>_cdmec.parquet),\nor both. Parquet needs pyarrow.")
+    parser.add_argument("--parquet_dataset", default=None,
+                        help="Also write every sample into one Hive-partitioned Parquet dataset\n(<dir>/Sample_ID=<sample>/part-0.parquet).")
+    parser.add_argument("--store", default=None,
+                        help="SQLite results store to update as each sample finishes; the reporter, stats\ngenerator and plotters can query it with --store.")
+    parser.add_argument("--save_hits", action="store_true",
+                        help="Keep each sample's parsed ARG and MGE hits (<sample>_cdmec_hits.json.gz) so\n"
+                             "cdmec_reanalyze.py can sweep context thresholds without BLAST.")
+    parser.add_argument("--raw_hits", action="store_true",
+                        help="Write the raw BLAST outfmt-6 rows to <sample>_{arg,mge}_hits.outfmt6\nas they stream in.")
+    parser.add_argument("--cache_dir", default=None,
+                        help="Reuse per-contig BLAST hits keyed on sequence, database and parameters;\nonly novel contigs are searched.")
+    parser.add_argument("--cache_max_mb", type=int, default=2048,
+                        help="Size bound for --cache_dir; least recently used entries are evicted.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip samples whose input, databases and settings match the run manifest\n(<output_dir>/cdmec_manifest.json); failed or missing samples are retried.")
+    parser.add_argument("--two_stage", choices=["contigs", "windows"], default=None,
+                        help="Run the MGE blastn first and blastx only the MGE-bearing regions:\n"
+                             "  contigs - whole contigs carrying an MGE hit (identical to the full search)\n"
+                             "  windows - merged +/-(threshold + margin) windows around MGE hits (smallest query);\n"
+                             "            APPROXIMATE: e-values are rescaled to the contig length, which does not\n"
+                             "            reproduce BLAST's effective search space or composition-based statistics,\n"
+                             "            so hits near the 1e-5 cutoff can differ from a whole-contig search")
+    parser.add_argument("--arg_db", default=ARG_DB_PATH, help="ARG (CARD protein) BLAST database prefix.")
+    parser.add_argument("--mge_db", default=MGE_DB_PATH,
+                        help="MGE nucleotide BLAST database prefix; built from --mge_references when missing or stale.")
+    parser.add_argument("--mge_references", default=DEFAULT_REFERENCES,
+                        help="Directory of MGE *.fasta files behind --mge_db and the k-mer index.")
+    parser.add_argument("--stage_db", default=None, metavar="DIR",
+                        help="Copy the BLAST databases to fast local storage (e.g. /dev/shm or $TMPDIR) once per\n"
+                             "node before the workers start, instead of every BLAST reading them over NFS.")
+    parser.add_argument("--mge_engine", choices=["blastn", "kmer"], default="blastn",
+                        help="MGE search engine: blastn against --mge_db, or the built-in k-mer screener\n"
+                             "over --mge_references (see cdmec_kmer.py validate).")
+    parser.add_argument("--mge_index", default="mge_kmer_index",
+                        help="k-mer index directory for --mge_engine kmer; built or refreshed automatically.")
+    parser.add_argument("--min_pident", type=float, default=0.0,
+                        help="Drop ARG hits below this percent identity.")
+    parser.add_argument("--min_coverage", type=float, default=0.0,
+                        help="Drop ARG hits covering less than this percent of the CARD reference.")
+    parser.add_argument("--collapse", choices=["arg", "all", "none"], default="arg",
+                        help="Collapse overlapping HSPs on a contig to the best-scoring one (bitscore, then e-value)\n"
+                             "before the context search: ARG hits only (default), ARG and MGE hits, or none.\n"
+                             "The default reports fewer rows than versions without this option; 'none'\n"
+                             "reproduces their rows exactly. It is a manifest setting, so --resume over\n"
+                             "older output reprocesses every sample.")
+    parser.add_argument("--batch_samples", type=int, default=None,
+                        help="Pack up to N samples into one blastx/blastn query and demultiplex the hits.")
+    parser.add_argument("--batch_bases", type=int, default=None,
+                        help="Cap packed batches by total input size (FASTA bytes, roughly bases).")
+    parser.add_argument("--export_flanks", type=int, nargs="?", const=CONTEXT_THRESHOLD, default=None, metavar="BP",
+                        help="Also write <sample>_cdmec_flanks.fasta: each ARG-MGE span plus BP (default 10000)\n"
+                             "either side, read through a .fai index without loading whole genomes.")
+    parser.add_argument("--orchestrator", choices=["pool", "async"], default="pool",
+                        help="pool  - -t worker processes, each running blastx then blastn with -bt threads\n"
+                             "async - one asyncio scheduler runs every BLAST under a --cpus budget: ARG and MGE\n"
+                             "        searches overlap, largest genomes go first and threads are sized per job;\n"
+                             "        -t sets the parse/analysis process pool")
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1,
+                        help="Total BLAST threads for --orchestrator async (default: all cores).")
+    parser.add_argument("--shard", type=parse_shard, default=None, metavar="I/N",
+                        help="Process only shard I of N (1-based) of the sorted inputs, balanced by total bases;\n"
+                             "outputs go to <output_dir>/shards/shard_I_of_N. Combine finished shards with\n"
+                             "cdmec_shards.py merge -o <output_dir>.")
+    parser.add_argument("--run_log", default=None,
+                        help=f"JSONL telemetry log (per-sample BLAST/stage timings, hits, peak RSS and a run\nsummary); default <output_dir>/{RUN_LOG_NAME}.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run each worker under cProfile; per-batch dumps go to <output_dir>/profiles and are\nmerged into <output_dir>/cdmec_profile.prof.")
     return parser.parse_args()
 
-def run_homology_search(query_fasta, db_prefix, hit_type, blast_threads):
-    """Executes BLAST with the -num_threads parameter."""
+def blast_command(query_fasta, db_prefix, hit_type, blast_threads):
     tool = BLAST_TOOL_PROT if hit_type == "ARG" else BLAST_TOOL_NUCL
-        
-    blast_cmd = [
+    return [
         tool, 
         "-query", query_fasta,
         "-db", db_prefix,
         "-num_threads", blast_threads,  # Internal BLAST multithreading
-        "-outfmt", "6 qseqid sseqid pident length qstart qend sstart send evalue bitscore",
-        "-evalue", "1e-5" 
+        "-outfmt", "6 qseqid sseqid pident length qstart qend sstart send evalue bitscore slen",
+        "-evalue", str(EVALUE_CUTOFF) 
     ]
+
+def blast_timeout(query_bytes):
+    return max(BLAST_TIMEOUT, TIMEOUT_PER_MB * query_bytes / 1e6)
+
+def run_homology_search(query_fasta, db_prefix, hit_type, blast_threads):
+    """Executes BLAST with the -num_threads parameter."""
+    blast_cmd = blast_command(query_fasta, db_prefix, hit_type, blast_threads)
     try:
-        result = subprocess.run(blast_cmd, capture_output=True, check=True, timeout=600) 
+        result = subprocess.run(blast_cmd, capture_output=True, check=True, timeout=blast_timeout(os.path.getsize(query_fasta)))
         stdout_str = result.stdout.decode('utf-8') 
         return [line for line in stdout_str.split('\n') if line.strip()]
     except Exception as e:
         sys.stderr.write(f"Error in {hit_type} search for {os.path.basename(query_fasta)}: {str(e)}\n")
         return []
 
-# ... [parse_hits, calculate_distance, analyze_context, write_output functions remain the same] ...
+def blast_stream(query, db_prefix, hit_type, blast_threads, raw_out_path=None, stats=None, query_bytes=None, rows=None):
+    """Parses BLAST stdout into hits line by line, optionally teeing the raw rows to raw_out_path. Raises on failure.
+
+    query is a FASTA path (plain or compressed) or a callable yielding (contig_id, sequence); see QueryFeed.
+    query_bytes sets the timeout when the query is not a file. Wall time, exit status, output bytes and time
+    spent parsing are added to stats as <hit_type>_blast_*. A rows list receives the raw row of each hit.
+    """
+    hits, tmp_path = [], f"{raw_out_path}.part" if raw_out_path else None
+    stats = stats if stats is not None else Counter()
+    started, parse_seconds, out_bytes = time.perf_counter(), 0.0, 0
+    timeout = blast_timeout(query_bytes if query_bytes is not None else fasta_size(query))
+    try:
+        with QueryFeed(query) as feed, tempfile.TemporaryFile() as err, \
+                subprocess.Popen(blast_command(feed.argument, db_prefix, hit_type, blast_threads), stdin=feed.stdin,
+                                 stdout=subprocess.PIPE, stderr=err, text=True) as proc:
+            feed.started()
+            blast_cmd = proc.args
+            expired = threading.Event()
+            timer = threading.Timer(timeout, lambda: (expired.set(), proc.kill()))
+            timer.start()
+            try:
+                with (open(tmp_path, 'w') if tmp_path else contextlib.nullcontext()) as raw_out:
+                    for line in proc.stdout:
+                        out_bytes += len(line)
+                        if raw_out: raw_out.write(line)
+                        parse_started = time.perf_counter()
+                        hit = parse_hit_line(line, hit_type)
+                        parse_seconds += time.perf_counter() - parse_started
+                        if hit:
+                            hits.append(hit)
+                            if rows is not None: rows.append(line)
+                returncode = proc.wait()
+            finally:
+                timer.cancel()
+                stats[f"{hit_type}_blast_exit"] = proc.returncode if proc.returncode is not None else -1
+            if expired.is_set():
+                stats[f"{hit_type}_blast_timeouts"] += 1
+                raise subprocess.TimeoutExpired(blast_cmd, timeout)
+            if returncode != 0:
+                err.seek(0)
+                raise subprocess.CalledProcessError(returncode, blast_cmd, stderr=err.read())
+            feed.finish()
+    except BaseException:
+        if tmp_path and os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    finally:
+        stats[f"{hit_type}_blast_seconds"] += time.perf_counter() - started
+        stats[f"{hit_type}_blast_bytes"] += out_bytes
+        stats[f"{hit_type}_parse_seconds"] += parse_seconds
+        stats[f"{hit_type}_blast_calls"] += 1
+    if tmp_path: os.replace(tmp_path, raw_out_path)
+    return hits
+
+def stream_homology_search(query, db_prefix, hit_type, blast_threads, raw_out_path=None, stats=None, label=None,
+                           query_bytes=None):
+    try:
+        return blast_stream(query, db_prefix, hit_type, blast_threads, raw_out_path, stats, query_bytes)
+    except Exception as e:
+        sys.stderr.write(f"Error in {hit_type} search for {label or os.path.basename(query)}: {str(e)}\n")
+        if stats is not None: stats["blast_failures"] += 1
+        return []
+
+def cached_homology_search(cache, query, db_prefix, hit_type, blast_threads, stats, raw_out_path=None, label=None):
+    """BLASTs only contigs whose (sequence, database, parameters) key is not cached; remaps cached hits to current IDs.
+
+    The cache holds each contig's raw BLAST rows without the query ID, so raw_out_path receives the full
+    merged row set, cached and searched contigs alike.
+    """
+    contigs = list(query_records(query))
+    params = ' '.join(blast_command("-", "", hit_type, "1"))  # query/db/threads held fixed; the DB enters via db_fp
+    db_fp = db_fingerprint(db_prefix)
+    keys = {cid: cache_key(sequence_hash(seq), db_fp, params) for cid, seq in contigs}
+    cached = cache.get_many(keys.values())
+    novel = [(cid, seq) for cid, seq in contigs if keys[cid] not in cached]
+    stats[f"{hit_type}_cache_hits"] += len(contigs) - len(novel)
+    stats[f"{hit_type}_cache_misses"] += len(novel)
+
+    fresh, unmapped = {}, []
+    if novel:
+        rows = []
+        # Sent as <index>::<contig ID> so every row maps back to its query, whatever BLAST does to the ID itself
+        tagged = [(f"{i}{BATCH_ID_SEP}{cid}", seq) for i, (cid, seq) in enumerate(novel)]
+        try:
+            blast_stream(lambda: tagged, db_prefix, hit_type, blast_threads, None, stats,
+                         sum(len(seq) for _, seq in novel), rows)
+        except Exception as e:
+            sys.stderr.write(f"Error in {hit_type} search for {label or os.path.basename(query)}: {str(e)}\n")
+            stats["blast_failures"] += 1
+            return []
+        for row in rows:
+            query_id, rest = row.rstrip('\n').split('\t', 1)
+            index, sep, _ = query_id.partition(BATCH_ID_SEP)
+            if sep and index.isdigit() and int(index) < len(novel): fresh.setdefault(novel[int(index)][0], []).append(rest)
+            else: unmapped.append(row.rstrip('\n'))
+        # An unmappable row belongs to some contig of this batch, so none of them can be cached as hitless
+        cache.put_many({keys[cid]: fresh.get(cid, []) for cid, _ in novel if cid in fresh or not unmapped})
+
+    # Rebuild in FASTA order, which is the order BLAST reports queries in
+    merged = []
+    for cid, _ in contigs:
+        found = cached[keys[cid]] if keys[cid] in cached else fresh.get(cid, [])
+        merged.extend(f"{cid}\t{row}" for row in found)
+    merged.extend(unmapped)  # uncached, but still reported under the ID BLAST gave them
+    if raw_out_path:
+        with open(f"{raw_out_path}.part", 'w') as f: f.writelines(f"{row}\n" for row in merged)
+        os.replace(f"{raw_out_path}.part", raw_out_path)
+    return parse_hits(merged, hit_type)
+
+def mge_region_records(contigs, mge_hits, mode, regions, threshold=CONTEXT_THRESHOLD, margin=TWO_STAGE_MARGIN):
+    """Yields the MGE-bearing contigs, or their merged +/-(threshold + margin) windows, as a stage-two query.
+
+    Fills regions with {query_id: (contig_id, offset, contig_length, region_length)} for mapping hits back;
+    it is complete once the records are exhausted.
+    """
+    spans = {}
+    for hit in mge_hits: spans.setdefault(hit['Contig_ID'], []).append((hit['Start'], hit['End']))
+    regions.clear()
+    for cid, seq in contigs:
+        if cid not in spans: continue
+        if mode == "contigs":
+            regions[cid] = (cid, 0, len(seq), len(seq))
+            yield cid, seq
+            continue
+        windows = []
+        for start, end in sorted(spans[cid]):
+            lo, hi = max(1, start - threshold - margin), min(len(seq), end + threshold + margin)
+            if windows and lo <= windows[-1][1] + 1: windows[-1][1] = max(windows[-1][1], hi)
+            else: windows.append([lo, hi])
+        for lo, hi in windows:
+            query_id = f"cdmec_region_{len(regions)}"
+            regions[query_id] = (cid, lo - 1, len(seq), hi - lo + 1)
+            yield query_id, seq[lo - 1:hi]
+
+def map_region_hits(hits, regions):
+    """Shifts stage-two hits back onto their contigs and reapplies the e-value cutoff at (approximately) full-contig
+    search space. Hits are regrouped in input contig and window order, keeping BLAST's order within each query,
+    so whole-contig (--two_stage contigs) hits come back exactly as the full search reports them."""
+    contig_rank, region_rank = {}, {}
+    for query_id, (cid, *_) in regions.items():
+        contig_rank.setdefault(cid, len(contig_rank))
+        region_rank[query_id] = (contig_rank[cid], len(region_rank))
+    mapped = []
+    for hit in hits:
+        if hit['Contig_ID'] not in regions: continue
+        cid, offset, contig_len, region_len = regions[hit['Contig_ID']]
+        # E-values scale with query length; a window would otherwise admit hits the full contig rejects.
+        # Linear scaling only approximates BLAST's effective search space (length adjustment, composition stats).
+        evalue = hit['Evalue'] * contig_len / region_len
+        if evalue > EVALUE_CUTOFF: continue
+        mapped.append((region_rank[hit['Contig_ID']], {**hit, "Contig_ID": cid, "Start": hit['Start'] + offset,
+                                                      "End": hit['End'] + offset, "Evalue": evalue}))
+    mapped.sort(key=lambda ranked: ranked[0])  # stable
+    return [hit for _, hit in mapped]
+
+def parse_hit_line(line, hit_type):
+    fields = line.strip().split() 
+    if not fields or len(fields) < 10: return None
+    try:
+        q_start, q_end, evalue = int(fields[4]), int(fields[5]), float(fields[8])
+        pident, bitscore = float(fields[2]), float(fields[9])
+        # Rows written before slen was requested have no coverage; the coverage filter lets them through
+        coverage = round(100 * (abs(int(fields[7]) - int(fields[6])) + 1) / int(fields[10]), 2) if len(fields) > 10 else None
+    except (ValueError, ZeroDivisionError): return None
+    return {
+        "Contig_ID": fields[0], "Hit_Name": fields[1],
+        "Start": min(q_start, q_end), "End": max(q_start, q_end), "Hit_Type": hit_type, "Evalue": evalue,
+        "Pident": pident, "Bitscore": bitscore, "Coverage": coverage
+    }
 
 def parse_hits(raw_output_lines, hit_type):
     parsed_hits = []
     for line in raw_output_lines:
-        fields = line.strip().split() 
-        if not fields or len(fields) < 10: continue 
-        try:
-            q_start, q_end = int(fields[4]), int(fields[5])
-            parsed_hits.append({
-                "Contig_ID": fields[0], "Hit_Name": fields[1],
-                "Start": min(q_start, q_end), "End": max(q_start, q_end), "Hit_Type": hit_type
-            })
-        except ValueError: continue
+        hit = parse_hit_line(line, hit_type)
+        if hit: parsed_hits.append(hit)
     return parsed_hits 
 
+def hit_rank(hit):
+    """Sort key, best first: bitscore, then e-value, then identity (k-mer MGE hits carry none and tie)."""
+    return (-(hit.get('Bitscore') or 0), hit.get('Evalue', float('inf')), -(hit.get('Pident') or 0))
+
+def resolve_loci(hits, min_pident=0.0, min_coverage=0.0, collapse=True, min_overlap=MIN_LOCUS_OVERLAP):
+    """Applies the identity/coverage floors, then sweeps each contig's hits in start order and keeps the
+    best-ranked hit of every run of overlapping HSPs. Survivors are returned in their original order."""
+    kept = [(i, hit) for i, hit in enumerate(hits)
+            if (hit.get('Pident') is None or hit['Pident'] >= min_pident)
+            and (hit.get('Coverage') is None or hit['Coverage'] >= min_coverage)]
+    if not collapse: return [hit for _, hit in kept]
+    best = []
+    kept.sort(key=lambda e: (e[1]['Contig_ID'], e[1]['Start'], e[1]['End'], e[0]))
+    for _, group in groupby(kept, key=lambda e: e[1]['Contig_ID']):
+        rep, locus_end = None, None
+        for entry in group:
+            hit = entry[1]
+            if rep is not None:
+                shorter = min(hit['End'] - hit['Start'], rep[1]['End'] - rep[1]['Start']) + 1
+                if min(hit['End'], locus_end) - hit['Start'] + 1 >= min_overlap * shorter:
+                    locus_end = max(locus_end, hit['End'])
+                    if (hit_rank(hit), entry[0]) < (hit_rank(rep[1]), rep[0]): rep = entry
+                    continue
+                best.append(rep)
+            rep, locus_end = entry, hit['End']
+        if rep is not None: best.append(rep)
+    return [hit for _, hit in sorted(best, key=lambda e: e[0])]
+
+def resolve_sample_hits(arg_hits, mge_hits, stats, min_pident=0.0, min_coverage=0.0, collapse="arg"):
+    """Locus resolution ahead of the context search; records how many HSPs each step removed."""
+    resolved_args = resolve_loci(arg_hits, min_pident, min_coverage, collapse in ("arg", "all"))
+    resolved_mges = resolve_loci(mge_hits) if collapse == "all" else mge_hits
+    stats["ARG_hits_resolved"] += len(arg_hits) - len(resolved_args)
+    stats["MGE_hits_resolved"] += len(mge_hits) - len(resolved_mges)
+    return resolved_args, resolved_mges
+
 def calculate_distance(arg_start, arg_end, mge_start, mge_end):
-    if max(arg_start, mge_start) < min(arg_end, mge_end): return 0, "Overlapping"
-    elif mge_end < arg_start: return -(arg_start - mge_end), "Upstream"
-    elif arg_end < mge_start: return (mge_start - arg_end), "Downstream"
-    return 0, "Internal Overlap"
-
-def analyze_context(arg_hits, mge_hits):
-    results = []
-    mge_by_contig = {}
-    for hit in mge_hits:
-        mge_by_contig.setdefault(hit['Contig_ID'], []).append(hit)
-    for arg in arg_hits:
-        contig_id = arg['Contig_ID']
-        if contig_id in mge_by_contig:
-            nearest_mge, min_dist, final_signed, final_status = None, float('inf'), None, None
-            for mge in mge_by_contig[contig_id]:
-                s_dist, p_status = calculate_distance(arg['Start'], arg['End'], mge['Start'], mge['End'])
-                if abs(s_dist) <= CONTEXT_THRESHOLD and abs(s_dist) < min_dist:
-                    min_dist, nearest_mge, final_signed = abs(s_dist), mge, s_dist
-                    if p_status in ["Overlapping", "Internal Overlap"]: final_status = "Embedded within MGE"
-                    elif any(x in nearest_mge['Hit_Name'] for x in ["Transposase", "Integrase"]):
-                        final_status = f"Transposon-Associated ({p_status})"
-                    elif "rep" in nearest_mge['Hit_Name'] or "plasmid" in nearest_mge['Hit_Name'].lower():
-                        final_status = f"Plasmid-Associated ({p_status})"
-                    else: final_status = f"MGE-Associated ({p_status})"
-            if nearest_mge:
-                results.append({
-                    "ARG_Name": arg['Hit_Name'], "Contig_ID": contig_id,
-                    "ARG_Start": arg['Start'], "ARG_End": arg['End'],
-                    "MGE_Association": f"{nearest_mge['Hit_Name']}:{nearest_mge['Start']}-{nearest_mge['End']}",
-                    "Proximity_bp": final_signed, "Inferred_Status": final_status
-                })
-    return results
-
-def write_output(output_dir, sample_id, results):
-    os.makedirs(output_dir, exist_ok=True)
-    json_path = os.path.join(output_dir, f"{sample_id}_cdmec.json")
-    with open(json_path, 'w') as f: json.dump({"Sample_ID": sample_id, "ARG_Hits": results}, f, indent=4)
-    tsv_path = os.path.join(output_dir, f"{sample_id}_cdmec_summary.tsv")
+    """(signed distance, position) for one ARG-MGE pair; a one-pair call into cdmec_hits.signed_distances."""
+    import numpy as np
+    from cdmec_hits import POSITIONS, signed_distances
+    pair = (np.array([x], dtype=np.int64) for x in (arg_start, arg_end, mge_start, mge_end))
+    distance, position = signed_distances(*pair)
+    return int(distance[0]), POSITIONS[position[0]]
+
+def build_mge_index(mge_hits):
+    """Columnar per-contig MGE store (cdmec_hits.MGEIndex), built once per sample and shared by every query."""
+    from cdmec_hits import MGEIndex  # NumPy is only loaded once there are hits to analyze
+    return MGEIndex(mge_hits)
+
+def analyze_context(arg_hits, mge_hits, mge_index=None, threshold=CONTEXT_THRESHOLD):
+    """Pairs each ARG with its nearest MGE (ties go to the earliest BLAST hit) within threshold."""
+    return analyze_thresholds(arg_hits, mge_hits, [threshold], mge_index)[threshold]
+
+def analyze_all_context(arg_hits, mge_hits, mge_index=None, threshold=CONTEXT_THRESHOLD):
+    """Like analyze_context, but reports every MGE within threshold of each ARG."""
+    return analyze_thresholds(arg_hits, mge_hits, [threshold], mge_index, all_mges=True)[threshold]
+
+def analyze_thresholds(arg_hits, mge_hits, thresholds, mge_index=None, all_mges=False):
+    """analyze_context (or analyze_all_context) at every threshold from one vectorized window query per contig.
+
+    Candidates are ranked once at the widest window; a narrower window keeps the ones inside it, so the
+    nearest MGE within the widest window is also the answer at every threshold it falls within.
+    Returns {threshold: rows}.
+    """
+    if not arg_hits or not mge_hits: return {t: [] for t in thresholds}
+    mge_index = mge_index if mge_index is not None else build_mge_index(mge_hits)
+    pairs = mge_index.pairs(arg_hits, max(thresholds))
+    return {t: mge_index.rows(arg_hits, pairs, t, nearest=not all_mges) for t in thresholds}
+
+ALL_MGES_DIR = "all_mges"
+SUMMARY_FIELDS = ["Sample_ID", "Contig_ID", "ARG_Name", "ARG_Start", "ARG_End", "MGE_Association", "Proximity_bp", "Inferred_Status"]
+
+def write_tsv(tsv_path, sample_id, results):
     with open(tsv_path, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=["Sample_ID", "Contig_ID", "ARG_Name", "ARG_Start", "ARG_End", "MGE_Association", "Proximity_bp", "Inferred_Status"], delimiter='\t')
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, delimiter='\t')
         writer.writeheader()
         for hit in results: writer.writerow({**hit, "Sample_ID": sample_id})
 
-def process_sample(input_fasta_path, output_dir, blast_threads):
-    sample_id = os.path.basename(input_fasta_path).split('.')[0]
-    raw_arg = run_homology_search(input_fasta_path, ARG_DB_PATH, "ARG", blast_threads)
-    raw_mge = run_homology_search(input_fasta_path, MGE_DB_PATH, "MGE", blast_threads)
-    context_results = analyze_context(parse_hits(raw_arg, "ARG"), parse_hits(raw_mge, "MGE"))
-    if context_results:
-        write_output(output_dir, sample_id, context_results)
-        return f"Done: {sample_id}"
-    return f"Done: {sample_id} (No hits)"
+def write_parquet(parquet_path, sample_id, results, partitioned=False):
+    """Columnar copy of the summary: integer coordinates, dictionary-encoded names and statuses.
+
+    Partitioned files leave Sample_ID to the Sample_ID=<id> directory name.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow).")
+    columns = {field: [hit.get(field) for hit in results] for field in SUMMARY_FIELDS[1:]}
+    table = pa.table({
+        **({} if partitioned else {"Sample_ID": pa.array([sample_id] * len(results)).dictionary_encode()}),
+        "Contig_ID": pa.array(columns["Contig_ID"], pa.string()),
+        "ARG_Name": pa.array(columns["ARG_Name"], pa.string()).dictionary_encode(),
+        "ARG_Start": pa.array(columns["ARG_Start"], pa.int64()),
+        "ARG_End": pa.array(columns["ARG_End"], pa.int64()),
+        "MGE_Association": pa.array(columns["MGE_Association"], pa.string()),
+        "Proximity_bp": pa.array(columns["Proximity_bp"], pa.int64()),
+        "Inferred_Status": pa.array(columns["Inferred_Status"], pa.string()).dictionary_encode(),
+    })
+    os.makedirs(os.path.dirname(parquet_path) or '.', exist_ok=True)
+    pq.write_table(table, parquet_path)
+
+def write_output(output_dir, sample_id, results, all_results=None, output_format="tsv", dataset_dir=None,
+                 flank_fasta=None, flank_bp=None):
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    if output_format in ("tsv", "both"):
+        json_path = os.path.join(output_dir, f"{sample_id}_cdmec.json")
+        with open(json_path, 'w') as f: json.dump({"Sample_ID": sample_id, "ARG_Hits": results}, f, indent=4)
+        tsv_path = os.path.join(output_dir, f"{sample_id}_cdmec_summary.tsv")
+        write_tsv(tsv_path, sample_id, results)
+        outputs += [json_path, tsv_path]
+    if output_format in ("parquet", "both"):
+        parquet_path = os.path.join(output_dir, f"{sample_id}_cdmec.parquet")
+        write_parquet(parquet_path, sample_id, results)
+        outputs.append(parquet_path)
+    # Partial aggregate the reporters merge instead of re-reading every row
+    sketch = sketch_path(output_dir, sample_id)
+    write_sketch(sketch, sample_id, results)
+    outputs.append(sketch)
+    if dataset_dir:
+        # Hive-style partition, so the whole run reads back as one dataset: pd.read_parquet(dataset_dir)
+        part_path = os.path.join(dataset_dir, f"Sample_ID={sample_id}", "part-0.parquet")
+        write_parquet(part_path, sample_id, results, partitioned=True)
+        outputs.append(part_path)
+    if all_results is not None:
+        all_path = all_mges_path(output_dir, sample_id)
+        os.makedirs(os.path.dirname(all_path), exist_ok=True)
+        write_tsv(all_path, sample_id, all_results)
+        outputs.append(all_path)
+    if flank_fasta and flank_bp is not None:
+        # Random access through <fasta>.fai; the genome is never loaded whole
+        flank_path = flanks_path(output_dir, sample_id)
+        export_flanks(flank_fasta, sample_id, results, flank_path, flank_bp)
+        outputs.append(flank_path)
+    return outputs
+
+def all_mges_path(output_dir, sample_id):
+    # In a subdirectory, so globs over the results directory (*.tsv, *_summary.tsv) keep seeing one row per ARG
+    return os.path.join(output_dir, ALL_MGES_DIR, f"{sample_id}_cdmec_all_mges.tsv")
+
+def raw_hits_path(output_dir, sample_id, hit_type):
+    return os.path.join(output_dir, f"{sample_id}_{hit_type.lower()}_hits.outfmt6")
+
+def parsed_hits_path(output_dir, sample_id):
+    return os.path.join(output_dir, f"{sample_id}_cdmec_hits.json.gz")
+
+def save_parsed_hits(path, sample_id, arg_hits, mge_hits, settings):
+    """Stores a sample's parsed hits (before locus resolution) with the settings that produced them, for reanalysis."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with gzip.open(f"{path}.part", 'wt') as f:
+        json.dump({"Sample_ID": sample_id, "Settings": settings, "ARG_Hits": arg_hits, "MGE_Hits": mge_hits}, f,
+                  separators=(',', ':'))
+    os.replace(f"{path}.part", path)
+
+def load_parsed_hits(path):
+    with gzip.open(path, 'rt') as f: return json.load(f)
+
+def search_hits(query, label, blast_threads, stats, raw_arg_path=None, raw_mge_path=None,
+                cache_dir=None, cache_max_mb=2048, two_stage=None, mge_engine="blastn", mge_index=None,
+                arg_db=ARG_DB_PATH, mge_db=MGE_DB_PATH, query_bytes=None):
+    """Runs the ARG and MGE searches for one query (a sample's FASTA, or the records of a packed batch) and
+    returns both hit lists."""
+    cache = HitCache(cache_dir, cache_max_mb * 1024**2) if cache_dir else None
+    query_bytes = query_bytes if query_bytes is not None else fasta_size(query)
+
+    def search(query, db_prefix, hit_type, raw_out_path):
+        started = time.perf_counter()
+        if hit_type == "MGE" and mge_engine == "kmer":
+            from cdmec_kmer import KmerIndex  # NumPy is only needed for this engine
+            hits = KmerIndex(mge_index).screen(query_records(query))
+        elif cache: hits = cached_homology_search(cache, query, db_prefix, hit_type, blast_threads, stats, raw_out_path, label)
+        else: hits = stream_homology_search(query, db_prefix, hit_type, blast_threads, raw_out_path, stats, label, query_bytes)
+        stats[f"{hit_type}_search_seconds"] += time.perf_counter() - started
+        stats[f"{hit_type}_hits"] += len(hits)
+        return hits
+
+    try:
+        if two_stage:
+            # Stage one: the cheap MGE blastn decides which parts of the assembly blastx needs to see
+            mge_hits = search(query, mge_db, "MGE", raw_mge_path)
+            arg_hits = []
+            if mge_hits and not stats["blast_failures"]:
+                # Regions are cut from the input as blastx reads them; the mapping is complete when it finishes
+                regions = {}
+                region_query = lambda: mge_region_records(query_records(query), mge_hits, two_stage, regions)
+                arg_hits = map_region_hits(search(region_query, arg_db, "ARG", raw_arg_path), regions)
+        else:
+            arg_hits = search(query, arg_db, "ARG", raw_arg_path)
+            mge_hits = search(query, mge_db, "MGE", raw_mge_path)
+    finally:
+        if cache: cache.close()
+    return arg_hits, mge_hits
+
+def report_sample(output_dir, sample_id, arg_hits, mge_hits, all_mge_hits=False, store_path=None, stats=None,
+                  locus_options=None, save_hits=None, **output_options):
+    """Locus resolution, context analysis and output for one sample's hits; returns (message, output paths).
+
+    save_hits is the run settings to store alongside the parsed hits (see cdmec_reanalyze.py), or None.
+    """
+    stats = stats if stats is not None else Counter()
+    saved = []
+    if save_hits is not None:
+        saved = [parsed_hits_path(output_dir, sample_id)]
+        save_parsed_hits(saved[0], sample_id, arg_hits, mge_hits, save_hits)
+    started = time.perf_counter()
+    if locus_options: arg_hits, mge_hits = resolve_sample_hits(arg_hits, mge_hits, stats, **locus_options)
+    mge_index = build_mge_index(mge_hits)
+    context_results = analyze_context(arg_hits, mge_hits, mge_index)
+    all_results = analyze_all_context(arg_hits, mge_hits, mge_index) if context_results and all_mge_hits else None
+    stats["analyze_seconds"] += time.perf_counter() - started
+    stats["associations"] += len(context_results)
+    started, outputs = time.perf_counter(), []
+    if store_path: store_results(store_path, sample_id, context_results)
+    if context_results: outputs = write_output(output_dir, sample_id, context_results, all_results, **output_options)
+    stats["write_seconds"] += time.perf_counter() - started
+    if context_results: return f"Done: {sample_id}", outputs + saved
+    return f"Done: {sample_id} (No hits)", saved
+
+def process_sample(input_fasta_path, output_dir, blast_threads, all_mge_hits=False, keep_raw_hits=False,
+                   output_format="tsv", dataset_dir=None, store_path=None, flank_bp=None, locus_options=None, save_hits=None,
+                   **search_options):
+    sample_id = sample_id_for(input_fasta_path)
+    stats = Counter()
+    if keep_raw_hits: os.makedirs(output_dir, exist_ok=True)
+    raw_arg_path = raw_hits_path(output_dir, sample_id, "ARG") if keep_raw_hits else None
+    raw_mge_path = raw_hits_path(output_dir, sample_id, "MGE") if keep_raw_hits else None
+    arg_hits, mge_hits = search_hits(input_fasta_path, sample_id, blast_threads, stats, raw_arg_path, raw_mge_path, **search_options)
+    raw_outputs = [p for p in (raw_arg_path, raw_mge_path) if p and os.path.exists(p)]
+    if stats["blast_failures"]:
+        return f"Failed: {sample_id} ({stats['blast_failures']} BLAST searches failed)", stats, raw_outputs
+    message, outputs = report_sample(output_dir, sample_id, arg_hits, mge_hits, all_mge_hits, store_path, stats, locus_options,
+                                     save_hits, output_format=output_format, dataset_dir=dataset_dir,
+                                     flank_fasta=input_fasta_path, flank_bp=flank_bp)
+    return message, stats, outputs + raw_outputs
+
+def plan_batches(fasta_files, batch_samples=None, batch_bases=None):
+    """Groups the sorted inputs into batches capped by sample count and/or total size (FASTA bytes ~ bases)."""
+    batches, current, current_bases = [], [], 0
+    for fasta in fasta_files:
+        size = fasta_size(fasta)
+        if current and ((batch_samples and len(current) >= batch_samples) or
+                        (batch_bases and current_bases + size > batch_bases)):
+            batches.append(current); current, current_bases = [], 0
+        current.append(fasta); current_bases += size
+    if current: batches.append(current)
+    return batches
+
+def process_batch(fasta_paths, output_dir, blast_threads, all_mge_hits=False, keep_raw_hits=False,
+                  output_format="tsv", dataset_dir=None, store_path=None, flank_bp=None, locus_options=None,
+                  save_hits=None, profile_dir=None, **search_options):
+    """Worker entry point: one sample or a packed batch, timed and (with profile_dir) run under cProfile.
+
+    Returns (batch stats, [(fasta, message, outputs, telemetry), ...]).
+    """
+    args = (fasta_paths, output_dir, blast_threads, all_mge_hits, keep_raw_hits, output_format, dataset_dir, store_path,
+            flank_bp, locus_options, save_hits)
+    reset_peak_rss()
+    started = time.perf_counter()
+    if profile_dir:
+        profiler = cProfile.Profile()
+        try: stats, reports = profiler.runcall(analyze_batch, *args, **search_options)
+        finally:
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, f"{sample_id_for(fasta_paths[0])}_{os.getpid()}.prof"))
+    else: stats, reports = analyze_batch(*args, **search_options)
+    stats["total_seconds"] += time.perf_counter() - started
+    stats["peak_rss_mb"] = peak_rss_mb() or 0
+    if len(fasta_paths) == 1: return stats, [(fasta, message, outputs, dict(stats)) for fasta, message, outputs, _ in reports]
+    label = f"batch_{sample_id_for(fasta_paths[0])}-{sample_id_for(fasta_paths[-1])}"
+    return stats, [(fasta, message, outputs, {**stats, **sample_stats, "Batch": label})
+                   for fasta, message, outputs, sample_stats in reports]
+
+def analyze_batch(fasta_paths, output_dir, blast_threads, all_mge_hits=False, keep_raw_hits=False,
+                  output_format="tsv", dataset_dir=None, store_path=None, flank_bp=None, locus_options=None,
+                  save_hits=None, **search_options):
+    """Packs several samples into one query (sample-prefixed contig IDs), searches once and demultiplexes.
+
+    Returns (batch stats, [(fasta, message, outputs, per-sample stats), ...]).
+    """
+    if len(fasta_paths) == 1:
+        message, stats, outputs = process_sample(fasta_paths[0], output_dir, blast_threads, all_mge_hits,
+                                                 keep_raw_hits, output_format, dataset_dir, store_path, flank_bp,
+                                                 locus_options, save_hits, **search_options)
+        return stats, [(fasta_paths[0], message, outputs, stats)]
+
+    sample_ids = [sample_id_for(f) for f in fasta_paths]
+    label = f"batch_{sample_ids[0]}-{sample_ids[-1]}"
+    stats = Counter()
+    if keep_raw_hits: os.makedirs(output_dir, exist_ok=True)
+    raw_arg_path = raw_hits_path(output_dir, label, "ARG") if keep_raw_hits else None
+    raw_mge_path = raw_hits_path(output_dir, label, "MGE") if keep_raw_hits else None
+
+    def batch_records():
+        for sample_id, fasta in zip(sample_ids, fasta_paths):
+            for cid, seq in read_fasta(fasta): yield f"{sample_id}{BATCH_ID_SEP}{cid}", seq
+
+    arg_hits, mge_hits = search_hits(batch_records, label, blast_threads, stats, raw_arg_path, raw_mge_path,
+                                     query_bytes=sum(map(fasta_size, fasta_paths)), **search_options)
+    raw_outputs = [p for p in (raw_arg_path, raw_mge_path) if p and os.path.exists(p)]
+    if stats["blast_failures"]:
+        return stats, [(f, f"Failed: {sid} (batch {label}: {stats['blast_failures']} BLAST searches failed)", raw_outputs, Counter())
+                       for sid, f in zip(sample_ids, fasta_paths)]
+
+    demuxed = {sid: ([], []) for sid in sample_ids}
+    for slot, hits in enumerate((arg_hits, mge_hits)):
+        for hit in hits:
+            sid, _, cid = hit['Contig_ID'].partition(BATCH_ID_SEP)
+            if sid in demuxed: demuxed[sid][slot].append({**hit, "Contig_ID": cid})
+    reports = []
+    for sid, fasta in zip(sample_ids, fasta_paths):
+        sample_stats = Counter()
+        message, outputs = report_sample(output_dir, sid, *demuxed[sid], all_mge_hits, store_path, sample_stats,
+                                         locus_options, save_hits,
+                                         output_format=output_format, dataset_dir=dataset_dir,
+                                         flank_fasta=fasta, flank_bp=flank_bp)
+        reports.append((fasta, message, outputs + raw_outputs, sample_stats))
+    return stats, reports
+
+def sample_id_for(input_fasta_path):
+    return os.path.basename(input_fasta_path).split('.')[0]
+
+def run_settings(args):
+    """Everything besides the input that determines a sample's outputs; a change forces a rerun under --resume."""
+    return {"Context_Threshold": CONTEXT_THRESHOLD, "All_MGE_Hits": args.all_mge_hits, "Raw_Hits": args.raw_hits, "Two_Stage": args.two_stage,
+            "Output_Format": args.output_format, "Parquet_Dataset": args.parquet_dataset,
+            "ARG_DB": args.arg_db, "ARG_DB_Fingerprint": db_fingerprint(args.arg_db),
+            "MGE_DB": args.mge_db, "MGE_DB_Fingerprint": db_fingerprint(args.mge_db),
+            "MGE_Engine": args.mge_engine, **({"Save_Hits": True} if args.save_hits else {}),
+            "Min_Pident": args.min_pident, "Min_Coverage": args.min_coverage,
+            "Collapse": args.collapse, **({"Export_Flanks": args.export_flanks} if args.export_flanks is not None else {})}
 
 if __name__ == "__main__":
     args = parse_arguments()
-    fasta_files = sorted(list(set([f for ext in ["*.fa", "*.fasta", "*.fna"] for f in glob.glob(os.path.join(args.input_dir, ext))])))
+    fasta_files = find_fastas(args.input_dir)
     
     if not fasta_files:
         print("No FASTA files found."); sys.exit(1)
 
+    if args.output_format != "tsv" or args.parquet_dataset:
+        try: import pyarrow
+        except ImportError: print("Parquet output needs pyarrow (pip install pyarrow)."); sys.exit(1)
+
+    if args.orchestrator == "async":
+        unsupported = [flag for flag, used in [("--cache_dir", args.cache_dir), ("--mge_engine kmer", args.mge_engine == "kmer"),
+                                               ("--batch_samples/--batch_bases", args.batch_samples or args.batch_bases),
+                                               ("--profile", args.profile)] if used]
+        if unsupported: print(f"--orchestrator async does not support {', '.join(unsupported)}."); sys.exit(1)
+    if args.shard and args.store:
+        # Concurrent writers on a shared filesystem would corrupt SQLite; the merge step loads the store instead
+        print("--store cannot be shared between shards; use cdmec_shards.py merge --store after the shards finish."); sys.exit(1)
+
+    if args.mge_engine == "kmer":
+        from cdmec_kmer import ensure_index
+        if ensure_index(args.mge_index, args.mge_references): print(f"Built k-mer MGE index: {args.mge_index}")
+    else:
+        try:
+            if ensure_mge_db(args.mge_db, args.mge_references): print(f"Built MGE database {args.mge_db} from {args.mge_references}")
+        except (OSError, RuntimeError) as e:
+            if not db_exists(args.mge_db, "nucl"): print(f"MGE database {args.mge_db} is missing and could not be built: {e}"); sys.exit(1)
+            print(f"Warning: MGE database {args.mge_db} is older than {args.mge_references} and could not be rebuilt ({e}).")
+    if not db_exists(args.arg_db, "prot"):
+        print(f"ARG database {args.arg_db} not found; build it from the CARD protein homolog FASTA with makeblastdb (see README)."); sys.exit(1)
+
+    settings = run_settings(args)
+    # Settings keep the original prefixes: staged copies share their fingerprints, so --resume and the cache carry over
+    arg_db, mge_db = args.arg_db, args.mge_db
+    if args.stage_db:
+        arg_db = stage_db(args.arg_db, args.stage_db)
+        if args.mge_engine == "blastn": mge_db = stage_db(args.mge_db, args.stage_db)
+        print(f"Databases staged to {args.stage_db}")
+    if args.shard:
+        index, count = args.shard
+        shard_files = assign_shards(fasta_files, count)[index - 1]
+        args.output_dir = shard_dir(args.output_dir, index, count)
+        write_shard_plan(args.output_dir, index, count, fasta_files, shard_files, settings, sample_id_for)
+        print(f"Shard {index}/{count}: {len(shard_files)} of {len(fasta_files)} samples "
+              f"({sum(map(fasta_size, shard_files)) / 1e6:.1f} Mb) -> {args.output_dir}")
+        fasta_files = shard_files
+
+    manifest = RunManifest(args.output_dir)
+    if args.resume:
+        pending = [f for f in fasta_files if not manifest.is_current(sample_id_for(f), f, settings)]
+        print(f"Resuming: {len(fasta_files) - len(pending)} samples up to date, {len(pending)} to (re)process.")
+        fasta_files = pending
+
     print(f"Processing {len(fasta_files)} files.")
-    print(f"Settings: {args.workers} samples at a time, each using {args.blast_threads} BLAST threads.")
+    if args.orchestrator == "async":
+        print(f"Settings: asyncio orchestrator, {args.cpus} BLAST threads in total, {args.workers} analysis processes.")
+    else: print(f"Settings: {args.workers} samples at a time, each using {args.blast_threads} BLAST threads.")
     
-    with ProcessPoolExecutor(max_workers=args.workers) as executor:
-        futures = {executor.submit(process_sample, f, args.output_dir, args.blast_threads): f for f in fasta_files}
-        for future in as_completed(futures):
-            print(future.result())
+    locus_options = dict(min_pident=args.min_pident, min_coverage=args.min_coverage, collapse=args.collapse)
+    options = dict(all_mge_hits=args.all_mge_hits, locus_options=locus_options, save_hits=settings if args.save_hits else None,
+                   keep_raw_hits=args.raw_hits, output_format=args.output_format,
+                   dataset_dir=args.parquet_dataset, store_path=args.store, cache_dir=args.cache_dir,
+                   cache_max_mb=args.cache_max_mb, two_stage=args.two_stage, mge_engine=args.mge_engine,
+                   mge_index=args.mge_index, arg_db=arg_db, mge_db=mge_db, flank_bp=args.export_flanks, profile_dir=os.path.join(args.output_dir, "profiles") if args.profile else None)
+    batches = plan_batches(fasta_files, args.batch_samples, args.batch_bases) if args.batch_samples or args.batch_bases \
+        else [[f] for f in fasta_files]
+    if len(batches) < len(fasta_files): print(f"Batching: {len(batches)} BLAST batches.")
+
+    if args.profile:
+        for stale in glob.glob(os.path.join(options["profile_dir"], "*.prof")): os.remove(stale)
+    run_stats = Counter()
+    run_log = RunLog(args.run_log or os.path.join(args.output_dir, RUN_LOG_NAME), settings)
+
+    def record_result(fasta, message, outputs, telemetry):
+        status = "failed" if message.startswith("Failed") else ("no_hits" if "(No hits)" in message else "done")
+        manifest.record(sample_id_for(fasta), fasta, settings, status, outputs)
+        run_log.sample(sample_id_for(fasta), status, {"Input_Bytes": os.path.getsize(fasta), **telemetry})
+        run_stats[status] += 1
+        print(message)
+
+    try:
+        if args.orchestrator == "async":
+            import cdmec_orchestrator
+            cdmec_orchestrator.run(fasta_files, args.output_dir, args.cpus, args.workers, record_result,
+                                   keep_raw_hits=args.raw_hits, two_stage=args.two_stage, all_mge_hits=args.all_mge_hits,
+                                   output_format=args.output_format, dataset_dir=args.parquet_dataset,
+                                   store_path=args.store, flank_bp=args.export_flanks, locus_options=locus_options,
+                                   save_hits=options["save_hits"],
+                                   arg_db=arg_db, mge_db=mge_db)
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                futures = {executor.submit(process_batch, batch, args.output_dir, args.blast_threads, **options): batch
+                           for batch in batches}
+                for future in as_completed(futures):
+                    try:
+                        stats, reports = future.result()
+                    except Exception as e:
+                        stats = Counter()
+                        reports = [(f, f"Failed: {sample_id_for(f)} ({e})", [], {}) for f in futures[future]]
+                    run_stats.update(stats)
+                    for fasta, message, outputs, telemetry in reports: record_result(fasta, message, outputs, telemetry)
+    finally:
+        manifest.save()  # folds the per-sample journal into the manifest once
+
+    print_summary(run_log.close())
+    print(f"Run log: {run_log.path}")
+
+    if run_stats["failed"]:
+        print(f"{run_stats['failed']} samples failed; rerun with --resume to retry only those.")
+    if args.cache_dir:
+        for hit_type in ["ARG", "MGE"]:
+            hits, misses = run_stats[f"{hit_type}_cache_hits"], run_stats[f"{hit_type}_cache_misses"]
+            rate = 100 * hits / (hits + misses) if hits + misses else 0
+            print(f"{hit_type} contig cache: {hits} hits, {misses} misses ({rate:.1f}% reused)")
+    if args.profile:
+        profile_path = merge_profiles(options["profile_dir"], os.path.join(args.output_dir, "cdmec_profile.prof"))
+        if profile_path: print(f"cProfile stats: {profile_path} (python -m pstats {profile_path})")
@@ -0,0 +1,77 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import sqlite3
+import hashlib
+import json
+import os
+import time
+
+# Bump when the cached payload layout changes so stale entries simply miss
+CACHE_VERSION = 1
+
+def sequence_hash(seq):
+    return hashlib.sha256(seq.upper().encode('ascii')).hexdigest()
+
+def cache_key(contig_hash, db_fp, params):
+    return hashlib.sha256(f"v{CACHE_VERSION}|{contig_hash}|{db_fp}|{params}".encode()).hexdigest()
+
+class HitCache:
+    """Content-addressed store of per-contig BLAST hits, evicting least recently used entries past max_bytes."""
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024**3):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "cdmec_hit_cache.sqlite"), timeout=120)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS hits (key TEXT PRIMARY KEY, payload TEXT, size INTEGER, last_used REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS hits_last_used ON hits (last_used)")
+        # Running payload total kept by triggers, so eviction never scans the table (shared by every worker)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER)")
+            self.conn.execute("CREATE TRIGGER IF NOT EXISTS hits_insert AFTER INSERT ON hits "
+                              "BEGIN UPDATE usage SET total = total + new.size; END")
+            self.conn.execute("CREATE TRIGGER IF NOT EXISTS hits_update AFTER UPDATE OF size ON hits "
+                              "BEGIN UPDATE usage SET total = total + new.size - old.size; END")
+            self.conn.execute("CREATE TRIGGER IF NOT EXISTS hits_delete AFTER DELETE ON hits "
+                              "BEGIN UPDATE usage SET total = total - old.size; END")
+            self.conn.execute("INSERT OR IGNORE INTO usage SELECT 0, COALESCE(SUM(size), 0) FROM hits")
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(set(keys))
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(f"SELECT key, payload FROM hits WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            found.update((key, json.loads(payload)) for key, payload in rows)
+        if found:
+            now = time.time()
+            self.conn.executemany("UPDATE hits SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            self.conn.commit()
+        return found
+
+    def put_many(self, entries):
+        now = time.time()
+        rows = []
+        for key, payload in entries.items():
+            text = json.dumps(payload, separators=(',', ':'))
+            rows.append((key, text, len(text), now))
+        # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete does not fire the delete trigger
+        self.conn.executemany("INSERT INTO hits VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                              "payload = excluded.payload, size = excluded.size, last_used = excluded.last_used", rows)
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        total = self.conn.execute("SELECT total FROM usage").fetchone()[0]
+        if total <= self.max_bytes: return
+        doomed, freed = [], 0
+        for key, size in self.conn.execute("SELECT key, size FROM hits ORDER BY last_used"):
+            if total - freed <= self.max_bytes: break
+            doomed.append((key,)); freed += size
+        self.conn.executemany("DELETE FROM hits WHERE key = ?", doomed)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,136 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import argparse
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# data/ sits beside bin/ in the checkout and inside the installed cdmec package
+DEFAULT_REFERENCES = os.path.join(HERE, "data", "mge_references")
+if not os.path.isdir(DEFAULT_REFERENCES): DEFAULT_REFERENCES = os.path.join(HERE, "..", "data", "mge_references")
+MGE_DB_TITLE = "C. Difficile MGE Nucleotide Database"
+
+def reference_fingerprint(reference_dir):
+    return {os.path.basename(p): f"{os.path.getsize(p)}:{int(os.path.getmtime(p))}"
+            for p in sorted(glob.glob(os.path.join(reference_dir, "*.fasta")))}
+
+def db_files(db_prefix):
+    """The volume, index and alias files makeblastdb wrote for db_prefix."""
+    return sorted(p for p in glob.glob(f"{glob.escape(db_prefix)}.*") if not p.endswith((".fasta", ".json", ".lock")))
+
+def db_exists(db_prefix, dbtype):
+    kind = dbtype[0]  # 'n' or 'p', as in .nin/.pin and .nal/.pal
+    return any(os.path.exists(f"{db_prefix}.{ext}") for ext in (f"{kind}in", f"{kind}al", f"00.{kind}in"))
+
+def db_fingerprint(db_prefix):
+    """Fingerprints a BLAST database from the name, size and mtime of its volume files."""
+    digest = hashlib.sha256()
+    for path in db_files(db_prefix):
+        st = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{st.st_size}:{int(st.st_mtime)};".encode())
+    return digest.hexdigest()[:16]
+
+def sources_path(db_prefix):
+    return f"{db_prefix}.sources.json"
+
+def mge_db_state(db_prefix, reference_dir=DEFAULT_REFERENCES):
+    """'current', 'missing' or 'stale' relative to the reference FASTAs.
+
+    A database built by hand (no sources record) is only stale once a reference is newer than it.
+    """
+    if not db_exists(db_prefix, "nucl"): return "missing"
+    if os.path.exists(sources_path(db_prefix)):
+        with open(sources_path(db_prefix)) as f:
+            return "current" if json.load(f).get("Sources") == reference_fingerprint(reference_dir) else "stale"
+    newest = max((os.path.getmtime(p) for p in glob.glob(os.path.join(reference_dir, "*.fasta"))), default=0)
+    return "stale" if newest > min(os.path.getmtime(p) for p in db_files(db_prefix)) else "current"
+
+def build_mge_db(db_prefix, reference_dir=DEFAULT_REFERENCES):
+    """Concatenates the reference FASTAs and runs makeblastdb; the sources record is written last, so an
+    interrupted build is simply rebuilt next time."""
+    references = sorted(glob.glob(os.path.join(reference_dir, "*.fasta")))
+    if not references: raise FileNotFoundError(f"No *.fasta references in {reference_dir}")
+    if shutil.which("makeblastdb") is None: raise RuntimeError("makeblastdb (BLAST+) is not on PATH")
+    os.makedirs(os.path.dirname(os.path.abspath(db_prefix)), exist_ok=True)
+    if os.path.exists(sources_path(db_prefix)): os.remove(sources_path(db_prefix))
+    combined = f"{db_prefix}.fasta"
+    with open(combined, 'w') as out:
+        for path in references:
+            with open(path) as f: text = f.read()
+            out.write(text if text.endswith("\n") else text + "\n")
+    result = subprocess.run(["makeblastdb", "-in", combined, "-dbtype", "nucl", "-out", db_prefix, "-title", MGE_DB_TITLE],
+                            capture_output=True, text=True)
+    if result.returncode != 0: raise RuntimeError(f"makeblastdb failed: {result.stderr.strip()}")
+    with open(sources_path(db_prefix), 'w') as f:
+        json.dump({"Sources": reference_fingerprint(reference_dir), "Fingerprint": db_fingerprint(db_prefix)}, f, indent=4)
+
+def ensure_mge_db(db_prefix, reference_dir=DEFAULT_REFERENCES):
+    """(Re)builds the MGE database when it is missing or stale; concurrent jobs wait on one builder. Returns True if built."""
+    if mge_db_state(db_prefix, reference_dir) == "current": return False
+    os.makedirs(os.path.dirname(os.path.abspath(db_prefix)), exist_ok=True)
+    with open(f"{db_prefix}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if mge_db_state(db_prefix, reference_dir) == "current": return False  # another job built it meanwhile
+        build_mge_db(db_prefix, reference_dir)
+    return True
+
+def stage_db(db_prefix, stage_dir):
+    """Copies a database to fast local storage once per node and returns the staged prefix.
+
+    Copies land in a directory named after the fingerprint and are published with an atomic rename, so
+    concurrent jobs on a node share one copy and a changed database is staged afresh.
+    """
+    name = os.path.basename(db_prefix)
+    target = os.path.join(stage_dir, f"cdmec_{name}_{db_fingerprint(db_prefix)}")
+    if os.path.isdir(target): return os.path.join(target, name)
+    os.makedirs(stage_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".cdmec_{name}_", dir=stage_dir)
+    try:
+        for path in db_files(db_prefix): shutil.copy2(path, tmp_dir)
+        os.rename(tmp_dir, target)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(target): raise  # a real failure rather than losing the race to another job
+    return os.path.join(target, name)
+
+def db_status(db_prefix, dbtype):
+    files = db_files(db_prefix)
+    return {"Prefix": db_prefix, "Present": db_exists(db_prefix, dbtype), "Files": len(files),
+            "MB": round(sum(map(os.path.getsize, files)) / 1e6, 1), "Fingerprint": db_fingerprint(db_prefix) if files else None}
+
+if __name__ == "__main__":
+    from cdmec_analyzer import ARG_DB_PATH, MGE_DB_PATH
+    parser = argparse.ArgumentParser(description="CdMEC-A BLAST database manager.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in [("status", "Show both databases, their fingerprints and whether the MGE DB is current."),
+                            ("build", "(Re)build the MGE database from the reference FASTAs if missing or stale."),
+                            ("stage", "Copy both databases to fast local storage and print the staged prefixes.")]:
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--arg_db", default=ARG_DB_PATH, help="ARG (protein) BLAST database prefix.")
+        cmd.add_argument("--mge_db", default=MGE_DB_PATH, help="MGE (nucleotide) BLAST database prefix.")
+        cmd.add_argument("-r", "--references", default=DEFAULT_REFERENCES, help="Directory of MGE *.fasta files.")
+        if name == "build": cmd.add_argument("--force", action="store_true", help="Rebuild even if current.")
+        if name == "stage": cmd.add_argument("stage_dir", help="e.g. /dev/shm or $TMPDIR")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for label, prefix, dbtype in [("ARG", args.arg_db, "prot"), ("MGE", args.mge_db, "nucl")]:
+            print(f"{label}: {json.dumps(db_status(prefix, dbtype))}")
+        print(f"MGE database vs {args.references}: {mge_db_state(args.mge_db, args.references)}")
+    elif args.command == "build":
+        if args.force: build_mge_db(args.mge_db, args.references); print(f"Built {args.mge_db}")
+        elif ensure_mge_db(args.mge_db, args.references): print(f"Built {args.mge_db}")
+        else: print(f"{args.mge_db} is current")
+    else:
+        for label, prefix, dbtype in [("ARG", args.arg_db, "prot"), ("MGE", args.mge_db, "nucl")]:
+            if not db_exists(prefix, dbtype): print(f"{label}: {prefix} not found"); sys.exit(1)
+            print(f"{label}: {stage_db(prefix, args.stage_dir)}")
@@ -0,0 +1,276 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import bisect
+import contextlib
+import glob
+import gzip
+import mmap
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import zlib
+
+FASTA_EXTENSIONS = (".fa", ".fasta", ".fna")
+FASTA_PATTERNS = [f"*{ext}{suffix}" for suffix in ("", ".gz", ".bgz", ".zst") for ext in FASTA_EXTENSIONS]
+# Typical assembly compression ratios; compressed sizes are scaled by these wherever size stands in for bases
+COMPRESSION_RATIO = {"gzip": 3.5, "zstd": 4.0}
+
+def find_fastas(input_dir):
+    """Sorted FASTA inputs of a directory, plain or gzip/bgzip/zstd compressed."""
+    return sorted({f for pattern in FASTA_PATTERNS for f in glob.glob(os.path.join(input_dir, pattern))})
+
+def compression(path):
+    """'gzip' (which includes bgzip), 'zstd' or None, from the file's magic bytes rather than its name."""
+    with open(path, 'rb') as f: magic = f.read(4)
+    if magic[:2] == b"\x1f\x8b": return "gzip"
+    if magic == b"\x28\xb5\x2f\xfd": return "zstd"
+    return None
+
+def fasta_size(path):
+    """Approximate uncompressed size in bytes (~ bases), for timeouts and load balancing."""
+    kind = compression(path)
+    return int(os.path.getsize(path) * COMPRESSION_RATIO[kind]) if kind else os.path.getsize(path)
+
+def decompress_command(path):
+    """Command writing the decompressed FASTA to stdout; pigz is preferred for gzip when installed."""
+    if compression(path) == "zstd":
+        if shutil.which("zstd") is None: raise RuntimeError(f"{path}: zstd input needs the zstd command on PATH")
+        return ["zstd", "-dcq", path]
+    return [shutil.which("pigz") or "gzip", "-dc", path]
+
+@contextlib.contextmanager
+def open_fasta(fasta_path):
+    """Text handle on a plain, gzip/bgzip or zstd FASTA; compressed input is decompressed as it is read."""
+    kind = compression(fasta_path)
+    if kind is None:
+        with open(fasta_path) as f: yield f
+    elif kind == "gzip":
+        with gzip.open(fasta_path, 'rt') as f: yield f
+    else:
+        proc = subprocess.Popen(decompress_command(fasta_path), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        try:
+            yield proc.stdout
+            proc.stdout.close()
+            if proc.wait() != 0: raise RuntimeError(f"{fasta_path}: zstd failed: {proc.stderr.read().strip()}")
+        finally:
+            if proc.poll() is None: proc.kill()
+            proc.wait()
+
+def read_fasta(fasta_path):
+    """Yields (contig_id, sequence) using the first word of each header, as BLAST reports qseqid."""
+    contig_id, chunks = None, []
+    with open_fasta(fasta_path) as f:
+        for line in f:
+            if line.startswith('>'):
+                if contig_id is not None: yield contig_id, ''.join(chunks)
+                contig_id, chunks = (line[1:].split() or [''])[0], []
+            else: chunks.append(line.strip())
+    if contig_id is not None: yield contig_id, ''.join(chunks)
+
+def query_records(query):
+    """(contig_id, sequence) pairs of a BLAST query: a FASTA path, or a callable producing the records."""
+    return query() if callable(query) else read_fasta(query)
+
+class QueryFeed:
+    """Gets a query to BLAST without an uncompressed copy on disk.
+
+    Plain FASTA paths are passed to BLAST as they are. Compressed ones are piped from a decompressor, and
+    record sources (callables, e.g. cache misses, two-stage regions or packed batches) are written into a
+    pipe by a thread; either way BLAST reads its stdin (-query -). Use as a context manager and call
+    started() once BLAST holds stdin, then finish() after a successful exit to surface source errors.
+    """
+
+    def __init__(self, query):
+        self.query, self.stdin, self._source, self._error = query, None, None, None
+        if callable(query):
+            read_fd, write_fd = os.pipe()
+            self.stdin = os.fdopen(read_fd, 'rb')
+            self._source = threading.Thread(target=self._write, args=(write_fd,), daemon=True)
+            self._source.start()
+        elif compression(query):
+            self._source = subprocess.Popen(decompress_command(query), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.stdin = self._source.stdout
+
+    @property
+    def argument(self):
+        return self.query if self.stdin is None else "-"
+
+    def _write(self, write_fd):
+        try:
+            with open(write_fd, 'w') as out:
+                for contig_id, seq in self.query(): out.write(f">{contig_id}\n{seq}\n")
+        except Exception as e: self._error = e
+
+    def started(self):
+        """Drops this process's end of the pipe, so a BLAST that exits early unblocks the source."""
+        if self.stdin is not None: self.stdin.close()
+
+    def finish(self):
+        """Waits for the source; raises if it failed, since BLAST would have searched a truncated query."""
+        if isinstance(self._source, threading.Thread):
+            self._source.join()
+            if self._error: raise RuntimeError(f"writing the query failed: {self._error}")
+        elif self._source is not None:
+            if self._source.wait() != 0:
+                raise RuntimeError(f"{self.query}: decompression failed: {self._source.stderr.read().decode().strip()}")
+
+    def close(self):
+        self.started()
+        if isinstance(self._source, subprocess.Popen):
+            if self._source.poll() is None: self._source.kill()
+            self._source.wait()
+            self._source.stderr.close()
+        elif self._source is not None: self._source.join()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+def is_bgzf(path):
+    """BGZF (bgzip) files are gzip members carrying a 'BC' extra subfield with the block size."""
+    with open(path, 'rb') as f: head = f.read(16)
+    return len(head) == 16 and head[:4] == b"\x1f\x8b\x08\x04" and head[12:14] == b"BC"
+
+def bgzf_blocks(path):
+    """(compressed offsets, uncompressed offsets) of every BGZF block, read from the block headers alone."""
+    coffsets, uoffsets, coffset, uoffset = [], [], 0, 0
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(12)
+            if not header: break
+            if len(header) < 12 or header[:4] != b"\x1f\x8b\x08\x04": raise ValueError(f"{path}: not a BGZF file (use bgzip)")
+            extra = f.read(struct.unpack("<H", header[10:12])[0])
+            bsize, pos = None, 0
+            while pos + 4 <= len(extra):
+                sub_len = struct.unpack("<H", extra[pos + 2:pos + 4])[0]
+                if extra[pos:pos + 2] == b"BC": bsize = struct.unpack("<H", extra[pos + 4:pos + 6])[0] + 1
+                pos += 4 + sub_len
+            if bsize is None: raise ValueError(f"{path}: gzip member without a BGZF block size (use bgzip)")
+            f.seek(coffset + bsize - 4)
+            isize = struct.unpack("<I", f.read(4))[0]
+            if isize:
+                coffsets.append(coffset); uoffsets.append(uoffset)
+            coffset += bsize; uoffset += isize
+    return coffsets, uoffsets
+
+def is_indexable(path):
+    kind = compression(path)
+    return kind is None or (kind == "gzip" and is_bgzf(path))
+
+def check_indexable(path):
+    if not is_indexable(path):
+        raise ValueError(f"{path}: plain gzip or zstd cannot be indexed for random access; recompress with bgzip")
+
+def build_fai(fasta_path):
+    """samtools-style index rows: (name, length, offset of first base, bases per line, bytes per line).
+
+    Offsets are into the uncompressed stream, so the same index serves plain and bgzip inputs.
+    """
+    check_indexable(fasta_path)
+    rows, entry, offset = [], None, 0
+    opener = gzip.open if is_bgzf(fasta_path) else open
+    with opener(fasta_path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if entry: rows.append(tuple(entry))
+                entry = [(line[1:].split() or [b''])[0].decode(), 0, offset + len(line), 0, 0]
+            elif entry is not None:
+                bases = len(line.rstrip(b"\r\n"))
+                if bases:
+                    if not entry[3]: entry[3], entry[4] = bases, len(line)
+                    entry[1] += bases
+            offset += len(line)
+    if entry: rows.append(tuple(entry))
+    return rows
+
+def write_fai(rows, fai_path):
+    tmp_path = f"{fai_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        for row in rows: f.write('\t'.join(map(str, row)) + '\n')
+    os.replace(tmp_path, fai_path)
+
+def load_fai(fasta_path):
+    """Reads <fasta>.fai, (re)building it when missing or older than the FASTA; kept in memory if the directory is read-only."""
+    fai_path = f"{fasta_path}.fai"
+    if os.path.exists(fai_path) and os.path.getmtime(fai_path) >= os.path.getmtime(fasta_path):
+        with open(fai_path) as f:
+            return [(n, int(l), int(o), int(b), int(w)) for n, l, o, b, w in (line.split('\t')[:5] for line in f if line.strip())]
+    rows = build_fai(fasta_path)
+    try: write_fai(rows, fai_path)
+    except OSError: pass
+    return rows
+
+class IndexedFasta:
+    """Random access to contig subsequences through the .fai index; plain FASTAs are memory-mapped, bgzip ones
+    are decompressed one 64 kb block at a time."""
+
+    def __init__(self, fasta_path):
+        check_indexable(fasta_path)
+        self.path = fasta_path
+        self.index = {row[0]: row[1:] for row in load_fai(fasta_path)}
+        self._file = open(fasta_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(fasta_path) else b""
+        self._blocks = bgzf_blocks(fasta_path) if is_bgzf(fasta_path) else None
+        self._cached = (None, b"")
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap): self._mm.close()
+        self._file.close()
+
+    def length(self, contig_id):
+        return self.index[contig_id][0]
+
+    def _block(self, i):
+        if self._cached[0] != i:
+            coffsets = self._blocks[0]
+            end = coffsets[i + 1] if i + 1 < len(coffsets) else len(self._mm)
+            self._cached = (i, zlib.decompress(self._mm[coffsets[i]:end], 31))
+        return self._cached[1]
+
+    def _read(self, offset, size):
+        if self._blocks is None: return self._mm[offset:offset + size]
+        coffsets, uoffsets = self._blocks
+        i, chunks = bisect.bisect_right(uoffsets, offset) - 1, []
+        while size > 0 and i < len(coffsets):
+            block = self._block(i)
+            piece = block[offset - uoffsets[i]:offset - uoffsets[i] + size]
+            chunks.append(piece)
+            offset, size, i = offset + len(piece), size - len(piece), i + 1
+        return b"".join(chunks)
+
+    def fetch(self, contig_id, start, end):
+        """Bases start..end (1-based, inclusive), clipped to the contig."""
+        length, offset, line_bases, line_width = self.index[contig_id]
+        start, end = max(1, start), min(length, end)
+        if end < start or not line_bases: return ""
+        first = offset + (start - 1) // line_bases * line_width + (start - 1) % line_bases
+        last = offset + (end - 1) // line_bases * line_width + (end - 1) % line_bases
+        return self._read(first, last - first + 1).translate(None, b"\r\n").decode('ascii')
+
+class SelectedContigs:
+    """IndexedFasta's interface over a FASTA that cannot be indexed (plain gzip, zstd): one streamed pass
+    keeps just the wanted contigs in memory."""
+
+    def __init__(self, fasta_path, contig_ids):
+        self.path = fasta_path
+        self.sequences = {cid: seq for cid, seq in read_fasta(fasta_path) if cid in contig_ids}
+        self.index = {cid: (len(seq),) for cid, seq in self.sequences.items()}
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): pass
+
+    def length(self, contig_id):
+        return len(self.sequences[contig_id])
+
+    def fetch(self, contig_id, start, end):
+        """Bases start..end (1-based, inclusive), clipped to the contig."""
+        return self.sequences[contig_id][max(1, start) - 1:max(0, end)]
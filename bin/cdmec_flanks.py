@@ -0,0 +1,81 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import argparse
+import csv
+import glob
+import os
+import sys
+from cdmec_fasta import FASTA_PATTERNS, IndexedFasta, SelectedContigs, is_indexable, load_fai
+
+FLANK = 10000
+
+def association_span(row):
+    """Smallest interval holding the ARG and its associated MGE ('name:start-end')."""
+    _, _, coords = row['MGE_Association'].rpartition(':')
+    mge_start, _, mge_end = coords.partition('-')
+    return min(int(row['ARG_Start']), int(mge_start)), max(int(row['ARG_End']), int(mge_end))
+
+def flank_records(fasta, sample_id, results, flank=FLANK):
+    """Yields (header, sequence) for each association: the ARG-MGE span plus flank bp either side, clipped to the contig."""
+    for row in results:
+        contig_id = row['Contig_ID']
+        if contig_id not in fasta.index:
+            sys.stderr.write(f"Flank export: {contig_id} not found in {os.path.basename(fasta.path)}\n")
+            continue
+        span_start, span_end = association_span(row)
+        start, end = max(1, span_start - flank), min(fasta.length(contig_id), span_end + flank)
+        status = row['Inferred_Status'].replace(' ', '_')
+        header = (f"{sample_id}|{contig_id}:{start}-{end} ARG={row['ARG_Name']} MGE={row['MGE_Association']} "
+                  f"Proximity_bp={row['Proximity_bp']} Status={status}")
+        yield header, fasta.fetch(contig_id, start, end)
+
+def export_flanks(fasta_path, sample_id, results, out_path, flank=FLANK, width=80):
+    """Writes the flanking region of every analyze_context result to out_path; returns the number of records.
+
+    Plain and bgzip FASTAs are read through their .fai index; plain gzip and zstd ones are streamed once.
+    """
+    tmp_path, written = f"{out_path}.part", 0
+    fasta = IndexedFasta(fasta_path) if is_indexable(fasta_path) else \
+        SelectedContigs(fasta_path, {row['Contig_ID'] for row in results})
+    with fasta, open(tmp_path, 'w') as out:
+        for header, seq in flank_records(fasta, sample_id, results, flank):
+            out.write(f">{header}\n")
+            for i in range(0, len(seq), width): out.write(seq[i:i + width] + "\n")
+            written += 1
+    os.replace(tmp_path, out_path)
+    return written
+
+def flanks_path(output_dir, sample_id):
+    return os.path.join(output_dir, f"{sample_id}_cdmec_flanks.fasta")
+
+def export_directory(results_dir, fasta_dir, output_dir, flank=FLANK):
+    """Backfills <sample>_cdmec_flanks.fasta for existing *_summary.tsv results."""
+    fastas = {os.path.basename(f).split('.')[0]: f for p in FASTA_PATTERNS for f in glob.glob(os.path.join(fasta_dir, p))}
+    os.makedirs(output_dir, exist_ok=True)
+    for tsv in sorted(glob.glob(os.path.join(results_dir, "*_cdmec_summary.tsv"))):
+        sample_id = os.path.basename(tsv)[:-len("_cdmec_summary.tsv")]
+        if sample_id not in fastas:
+            print(f"Skipping {sample_id}: no FASTA in {fasta_dir}")
+            continue
+        with open(tsv, newline='') as f: rows = list(csv.DictReader(f, delimiter='\t'))
+        n = export_flanks(fastas[sample_id], sample_id, rows, flanks_path(output_dir, sample_id), flank)
+        print(f"{sample_id}: {n} flanking regions")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CdMEC-A FASTA indexing and ARG-MGE flanking-sequence export.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index = sub.add_parser("index", help="Build <fasta>.fai indexes (plain or bgzip FASTA).")
+    index.add_argument("fasta", nargs="+")
+    export = sub.add_parser("export", help="Write <sample>_cdmec_flanks.fasta for existing results.")
+    export.add_argument("-i", "--input_dir", required=True, help="Directory containing *_cdmec_summary.tsv files.")
+    export.add_argument("-f", "--fasta_dir", required=True, help="Directory with the FASTAs the results came from.")
+    export.add_argument("-o", "--output_dir", default=None, help="Where to write the flank FASTAs (default: input_dir).")
+    export.add_argument("--flank", type=int, default=FLANK, help="bp added either side of each ARG-MGE span.")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        for path in args.fasta: print(f"{path}: {len(load_fai(path))} contigs indexed")
+    else:
+        export_directory(args.input_dir, args.fasta_dir, args.output_dir or args.input_dir, args.flank)
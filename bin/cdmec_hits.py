@@ -0,0 +1,126 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Columnar MGE hit store and the vectorized ARG-MGE context search.
+
+A sample's MGE hits are held as NumPy arrays (contig codes, starts, ends, hit-name codes), sorted per contig
+by start with a running max-end. Each contig's ARGs are then answered at once: window bounds by
+searchsorted, signed distances, positions and statuses as array operations over every candidate pair.
+Result rows are only built as dicts for the associations that are reported.
+"""
+
+import numpy as np
+
+# calculate_distance's position classes, in their order of precedence
+POSITIONS = ["Overlapping", "Upstream", "Downstream", "Internal Overlap"]
+OVERLAPPING, UPSTREAM, DOWNSTREAM, INTERNAL = range(len(POSITIONS))
+EMBEDDED = "Embedded within MGE"
+
+def mge_category(name):
+    if any(x in name for x in ["Transposase", "Integrase"]): return "Transposon-Associated"
+    elif "rep" in name or "plasmid" in name.lower(): return "Plasmid-Associated"
+    return "MGE-Associated"
+
+def status_table(names):
+    """Inferred_Status per (name code, position), computed once per distinct MGE name."""
+    table = np.empty((len(names), len(POSITIONS)), dtype=object)
+    for code, name in enumerate(names):
+        category = mge_category(name)
+        for position, label in enumerate(POSITIONS):
+            table[code, position] = EMBEDDED if position in (OVERLAPPING, INTERNAL) else f"{category} ({label})"
+    return table
+
+def signed_distances(arg_start, arg_end, mge_start, mge_end):
+    """Array form of calculate_distance: (signed distance, position code) for every pair."""
+    overlapping = np.maximum(arg_start, mge_start) < np.minimum(arg_end, mge_end)
+    upstream = ~overlapping & (mge_end < arg_start)
+    downstream = ~overlapping & ~upstream & (arg_end < mge_start)
+    distance = np.select([upstream, downstream], [-(arg_start - mge_end), mge_start - arg_end], 0)
+    position = np.select([overlapping, upstream, downstream], [OVERLAPPING, UPSTREAM, DOWNSTREAM], INTERNAL)
+    return distance, position
+
+class MGEIndex:
+    """A sample's MGE hits as per-contig arrays sorted by (start, BLAST order), with a running max-end."""
+
+    def __init__(self, mge_hits):
+        n, names, contigs = len(mge_hits), {}, {}
+        contig = np.fromiter((contigs.setdefault(h['Contig_ID'], len(contigs)) for h in mge_hits), np.int64, n)
+        start = np.fromiter((h['Start'] for h in mge_hits), np.int64, n)
+        end = np.fromiter((h['End'] for h in mge_hits), np.int64, n)
+        name = np.fromiter((names.setdefault(h['Hit_Name'], len(names)) for h in mge_hits), np.int64, n)
+        by_contig = np.lexsort((np.arange(n), start, contig))
+        self.order, self.start, self.end, self.name = by_contig, start[by_contig], end[by_contig], name[by_contig]
+        self.max_end = np.empty(n, dtype=np.int64)
+        bounds = np.searchsorted(contig[by_contig], np.arange(len(contigs) + 1))
+        self.slices = {}
+        for contig_id, code in contigs.items():
+            lo, hi = int(bounds[code]), int(bounds[code + 1])
+            self.slices[contig_id] = (lo, hi)
+            # max_end is non-decreasing within a contig, so everything left of a bisection ends before the window opens
+            np.maximum.accumulate(self.end[lo:hi], out=self.max_end[lo:hi])
+        self.names = list(names)
+        self.statuses = status_table(self.names)
+
+    def __contains__(self, contig_id):
+        return contig_id in self.slices
+
+    def pairs(self, arg_hits, threshold):
+        """Every ARG-MGE pair within threshold as (arg, mge, distance, position) arrays, where arg indexes arg_hits
+        and mge the sorted store, ordered by ARG, then |distance|, then MGE BLAST order."""
+        by_contig = {}
+        for i, arg in enumerate(arg_hits):
+            if arg['Contig_ID'] in self.slices: by_contig.setdefault(arg['Contig_ID'], []).append(i)
+        found = []
+        for contig_id, indices in by_contig.items():
+            lo, hi = self.slices[contig_id]
+            arg = np.array(indices, dtype=np.int64)
+            arg_start = np.fromiter((arg_hits[i]['Start'] for i in indices), np.int64, len(indices))
+            arg_end = np.fromiter((arg_hits[i]['End'] for i in indices), np.int64, len(indices))
+            first = lo + np.searchsorted(self.max_end[lo:hi], arg_start - threshold, 'left')
+            last = lo + np.searchsorted(self.start[lo:hi], arg_end + threshold, 'right')
+            counts = np.maximum(last - first, 0)
+            total = int(counts.sum())
+            if not total: continue
+            # Flatten each ARG's candidate range [first, last) into one pair list
+            offsets = np.repeat(np.cumsum(counts) - counts, counts)
+            mge = np.repeat(first, counts) + np.arange(total) - offsets
+            pair_arg = np.repeat(arg, counts)
+            distance, position = signed_distances(np.repeat(arg_start, counts), np.repeat(arg_end, counts),
+                                                  self.start[mge], self.end[mge])
+            within = np.abs(distance) <= threshold
+            found.append((pair_arg[within], mge[within], distance[within], position[within]))
+        if not found:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        arg, mge, distance, position = (np.concatenate(parts) for parts in zip(*found))
+        n_mges = len(self.order)
+        if len(arg_hits) * (threshold + 1) * n_mges < 2 ** 63:
+            # One packed int64 key (unique per pair) sorts several times faster than a three-key lexsort
+            ranked = np.argsort((arg * (threshold + 1) + np.abs(distance)) * n_mges + self.order[mge])
+        else: ranked = np.lexsort((self.order[mge], np.abs(distance), arg))
+        return arg[ranked], mge[ranked], distance[ranked], position[ranked]
+
+    def rows(self, arg_hits, pairs, threshold=None, nearest=True):
+        """Result rows from pairs (optionally narrowed to threshold): each ARG's nearest MGE, or every MGE."""
+        arg, mge, distance, position = pairs
+        if nearest:
+            first = np.ones(len(arg), dtype=bool)
+            first[1:] = arg[1:] != arg[:-1]
+            arg, mge, distance, position = arg[first], mge[first], distance[first], position[first]
+        if threshold is not None:
+            within = np.abs(distance) <= threshold
+            arg, mge, distance, position = arg[within], mge[within], distance[within], position[within]
+        names = [self.names[code] for code in self.name[mge].tolist()]
+        statuses = self.statuses[self.name[mge], position].tolist()
+        rows = []
+        for a, name, start, end, d, status in zip(arg.tolist(), names, self.start[mge].tolist(), self.end[mge].tolist(),
+                                                  distance.tolist(), statuses):
+            hit = arg_hits[a]
+            rows.append({
+                "ARG_Name": hit['Hit_Name'], "Contig_ID": hit['Contig_ID'],
+                "ARG_Start": hit['Start'], "ARG_End": hit['End'],
+                "MGE_Association": f"{name}:{start}-{end}",
+                "Proximity_bp": d, "Inferred_Status": status
+            })
+        return rows
@@ -0,0 +1,161 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import argparse
+import glob
+import json
+import os
+import sys
+import numpy as np
+from cdmec_db import DEFAULT_REFERENCES, reference_fingerprint
+from cdmec_fasta import find_fastas, read_fasta
+
+K = 21            # canonical k-mers, 2 bits per base in a uint64
+MAX_GAP = 100     # matched k-mer starts further apart than this split an interval
+MIN_INTERVAL = 50 # shortest interval (bp) reported as an MGE hit
+
+_CODES = np.full(256, 4, dtype=np.uint8)
+for _i, _bases in enumerate(["Aa", "Cc", "Gg", "Tt"]):
+    for _b in _bases: _CODES[ord(_b)] = _i
+
+def canonical_kmers(seq, k=K):
+    """Returns (0-based positions, canonical k-mer codes) of every k-mer without ambiguous bases."""
+    codes = _CODES[np.frombuffer(seq.encode('ascii'), dtype=np.uint8)]
+    m = len(codes) - k + 1
+    if m <= 0: return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    fwd, rev = np.zeros(m, dtype=np.uint64), np.zeros(m, dtype=np.uint64)
+    for j in range(k):
+        c = codes[j:j + m].astype(np.uint64)
+        fwd = (fwd << np.uint64(2)) | (c & np.uint64(3))
+        rev |= ((np.uint64(3) - c) & np.uint64(3)) << np.uint64(2 * j)
+    ambiguous = np.concatenate([[0], np.cumsum(codes > 3)])
+    valid = (ambiguous[k:] - ambiguous[:-k]) == 0
+    return np.nonzero(valid)[0], np.minimum(fwd, rev)[valid]
+
+def build_index(reference_dir, index_dir, k=K):
+    """Builds per-element sorted k-mer arrays from the reference FASTAs and saves them as .npy files."""
+    names, lengths, arrays = [], [], []
+    for path in sorted(glob.glob(os.path.join(reference_dir, "*.fasta"))):
+        for name, seq in read_fasta(path):
+            names.append(name); lengths.append(len(seq))
+            arrays.append(np.unique(canonical_kmers(seq, k)[1]))
+    if not arrays: raise FileNotFoundError(f"No *.fasta references in {reference_dir}")
+    os.makedirs(index_dir, exist_ok=True)
+    offsets = np.concatenate([[0], np.cumsum([len(a) for a in arrays])]).astype(np.int64)
+    np.save(os.path.join(index_dir, "kmers.npy"), np.concatenate(arrays))
+    np.save(os.path.join(index_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(index_dir, "union.npy"), np.unique(np.concatenate(arrays)))
+    with open(os.path.join(index_dir, "meta.json"), 'w') as f:
+        json.dump({"K": k, "Names": names, "Lengths": lengths, "Sources": reference_fingerprint(reference_dir)}, f, indent=4)
+
+def ensure_index(index_dir, reference_dir=DEFAULT_REFERENCES):
+    """(Re)builds the index when it is missing or the reference FASTAs changed since it was built."""
+    meta_path = os.path.join(index_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get("Sources") == reference_fingerprint(reference_dir): return False
+    build_index(reference_dir, index_dir)
+    return True
+
+class KmerIndex:
+    """Memory-mapped MGE k-mer index produced by build_index."""
+
+    def __init__(self, index_dir):
+        with open(os.path.join(index_dir, "meta.json")) as f: meta = json.load(f)
+        self.k, self.names = meta["K"], meta["Names"]
+        self.kmers = np.load(os.path.join(index_dir, "kmers.npy"), mmap_mode='r')
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"))
+        self.union = np.load(os.path.join(index_dir, "union.npy"), mmap_mode='r')
+
+    def screen(self, contigs, max_gap=MAX_GAP, min_interval=MIN_INTERVAL):
+        """Reports MGE intervals per contig in the same dict shape parse_hits produces (1-based, inclusive)."""
+        hits = []
+        for contig_id, seq in contigs:
+            pos, kmers = canonical_kmers(seq, self.k)
+            if not len(kmers): continue
+            # One pass against the union of all elements discards most of the genome up front
+            found = _members(self.union, kmers)
+            pos, kmers = pos[found], kmers[found]
+            for e, name in enumerate(self.names):
+                ref = self.kmers[self.offsets[e]:self.offsets[e + 1]]
+                matched = pos[_members(ref, kmers)]
+                if not len(matched): continue
+                breaks = np.nonzero(np.diff(matched) > max_gap)[0]
+                starts = matched[np.concatenate([[0], breaks + 1])]
+                ends = matched[np.concatenate([breaks, [len(matched) - 1]])] + self.k
+                for start, end in zip(starts, ends):
+                    if end - start < min_interval: continue
+                    hits.append({"Contig_ID": contig_id, "Hit_Name": name,
+                                 "Start": int(start) + 1, "End": int(end), "Hit_Type": "MGE"})
+        return hits
+
+def _members(sorted_ref, values):
+    if not len(sorted_ref): return np.zeros(len(values), dtype=bool)
+    idx = np.minimum(np.searchsorted(sorted_ref, values), len(sorted_ref) - 1)
+    return sorted_ref[idx] == values
+
+def _merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1: merged[-1][1] = max(merged[-1][1], end)
+        else: merged.append([start, end])
+    return merged
+
+def _covered_bp(hits):
+    spans = {}
+    for hit in hits: spans.setdefault((hit['Contig_ID'], hit['Hit_Name']), []).append((hit['Start'], hit['End']))
+    return {key: _merge(v) for key, v in spans.items()}
+
+def compare_intervals(reference_hits, kmer_hits):
+    """Base-pair agreement between blastn and k-mer intervals, per (contig, element)."""
+    ref, test = _covered_bp(reference_hits), _covered_bp(kmer_hits)
+    shared = 0
+    for key in ref.keys() & test.keys():
+        for rs, re_ in ref[key]:
+            for ts, te in test[key]: shared += max(0, min(re_, te) - max(rs, ts) + 1)
+    ref_bp = sum(e - s + 1 for v in ref.values() for s, e in v)
+    test_bp = sum(e - s + 1 for v in test.values() for s, e in v)
+    union = ref_bp + test_bp - shared
+    return {"Blastn_bp": ref_bp, "Kmer_bp": test_bp, "Shared_bp": shared,
+            "Jaccard": shared / union if union else 1.0,
+            "Recall": shared / ref_bp if ref_bp else 1.0, "Precision": shared / test_bp if test_bp else 1.0}
+
+def validate(input_dir, index_dir, db_prefix, blast_threads):
+    import cdmec_analyzer
+    index = KmerIndex(index_dir)
+    fasta_files = find_fastas(input_dir)
+    totals = {"Blastn_bp": 0, "Kmer_bp": 0, "Shared_bp": 0}
+    print("Sample\tBlastn_bp\tKmer_bp\tShared_bp\tJaccard\tRecall\tPrecision")
+    for fasta in fasta_files:
+        blastn_hits = cdmec_analyzer.stream_homology_search(fasta, db_prefix, "MGE", blast_threads)
+        row = compare_intervals(blastn_hits, index.screen(read_fasta(fasta)))
+        for key in totals: totals[key] += row[key]
+        print(f"{os.path.basename(fasta)}\t{row['Blastn_bp']}\t{row['Kmer_bp']}\t{row['Shared_bp']}\t"
+              f"{row['Jaccard']:.3f}\t{row['Recall']:.3f}\t{row['Precision']:.3f}")
+    union = totals["Blastn_bp"] + totals["Kmer_bp"] - totals["Shared_bp"]
+    print(f"TOTAL\t{totals['Blastn_bp']}\t{totals['Kmer_bp']}\t{totals['Shared_bp']}\t"
+          f"{totals['Shared_bp'] / union if union else 1.0:.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CdMEC-A k-mer MGE screener (blastn alternative).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build the k-mer index from the MGE reference FASTAs.")
+    build.add_argument("-r", "--references", default=DEFAULT_REFERENCES, help="Directory of MGE *.fasta files.")
+    build.add_argument("-x", "--index", default="mge_kmer_index", help="Index directory to write.")
+    build.add_argument("-k", type=int, default=K, help="k-mer length (<= 31).")
+    check = sub.add_parser("validate", help="Compare k-mer MGE intervals against blastn on a set of FASTAs.")
+    check.add_argument("-i", "--input_dir", required=True, help="Directory containing FASTA files.")
+    check.add_argument("-x", "--index", default="mge_kmer_index", help="Index directory.")
+    check.add_argument("-r", "--references", default=DEFAULT_REFERENCES, help="Directory of MGE *.fasta files.")
+    check.add_argument("-d", "--db", default="combined_C_Diff_mge_nucl_db", help="blastn MGE database prefix.")
+    check.add_argument("-bt", "--blast_threads", type=str, default="4")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if not 0 < args.k <= 31: sys.exit("k must be between 1 and 31.")
+        build_index(args.references, args.index, args.k)
+        print(f"Built k-mer index in {args.index}")
+    else:
+        ensure_index(args.index, args.references)
+        validate(args.input_dir, args.index, args.db, args.blast_threads)
@@ -0,0 +1,73 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_NAME = "cdmec_manifest.json"
+COMPLETE_STATES = ("done", "no_hits")
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''): digest.update(chunk)
+    return digest.hexdigest()
+
+def input_signature(path, previous=None):
+    """Size, mtime and content hash of an input; the hash is reused when size and mtime are unchanged."""
+    st = os.stat(path)
+    sig = {"Input": os.path.abspath(path), "Size": st.st_size, "Mtime": st.st_mtime}
+    if previous and previous.get("Size") == sig["Size"] and previous.get("Mtime") == sig["Mtime"]:
+        sig["SHA256"] = previous.get("SHA256")
+    else: sig["SHA256"] = file_sha256(path)
+    return sig
+
+class RunManifest:
+    """Per-sample record of inputs, settings, outputs and status kept in the output directory.
+
+    Finished samples are appended to a JSONL journal (<manifest>.log) as they complete, so recording costs
+    one short fsync'd write however large the run; save() folds the journal into the manifest once, at the
+    end of a run. A run that dies first leaves the journal, which the next load replays.
+    """
+
+    def __init__(self, output_dir, name=MANIFEST_NAME):
+        self.path = os.path.join(output_dir, name)
+        self.journal_path = f"{self.path}.log"
+        self.samples = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f: self.samples = json.load(f).get("Samples", {})
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                for line in f:
+                    try: entry = json.loads(line)
+                    except ValueError: continue  # a record torn by a crash; that sample simply reruns
+                    self.samples[entry.pop("Sample_ID")] = entry
+
+    def is_current(self, sample_id, input_path, settings):
+        """True when the sample completed with identical input content and settings and its outputs still exist."""
+        entry = self.samples.get(sample_id)
+        if not entry or entry.get("Status") not in COMPLETE_STATES or entry.get("Settings") != settings: return False
+        if not all(os.path.exists(p) for p in entry.get("Outputs", [])): return False
+        return input_signature(input_path, entry).get("SHA256") == entry.get("SHA256")
+
+    def record(self, sample_id, input_path, settings, status, outputs=(), **extra):
+        entry = input_signature(input_path, self.samples.get(sample_id))
+        entry.update({"Settings": settings, "Status": status, "Outputs": list(outputs),
+                      "Finished": time.strftime("%Y-%m-%dT%H:%M:%S"), **extra})
+        self.samples[sample_id] = entry
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.journal_path, 'a') as f:
+            f.write(json.dumps({"Sample_ID": sample_id, **entry}, separators=(',', ':')) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save(self):
+        """Writes the whole manifest and drops the journal it now contains."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f: json.dump({"Samples": self.samples}, f, indent=4)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.journal_path): os.remove(self.journal_path)
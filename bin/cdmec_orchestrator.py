@@ -0,0 +1,237 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Asyncio BLAST orchestrator: every blastx/blastn of the run shares one CPU budget.
+
+Jobs are dispatched longest-first (LPT), each sized to its share of the outstanding work,
+while parsing and context analysis run in a small process pool.
+"""
+
+import asyncio
+import functools
+import heapq
+import itertools
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import cdmec_analyzer as analyzer
+from cdmec_fasta import QueryFeed, fasta_size, read_fasta
+from cdmec_telemetry import peak_rss_mb, reset_peak_rss
+
+# blastx (six-frame translated search) costs several times blastn per query base
+COST_WEIGHT = {"ARG": 4.0, "MGE": 1.0}
+
+class BlastScheduler:
+    """Runs queued BLAST jobs under a total thread budget, largest estimated cost first.
+
+    A job gets ceil(cpus * cost / outstanding cost) threads, capped by what is free when it starts,
+    so early jobs run many-at-once on few threads and the tail gets the whole machine.
+    """
+
+    def __init__(self, cpus):
+        self.cpus, self.free, self.outstanding = cpus, cpus, 0.0
+        self.queue, self.order, self.running = [], itertools.count(), set()
+        self.changed = asyncio.Condition()
+
+    async def run(self, query, build_cmd, cost, timeout, out_path):
+        """Queues build_cmd(query argument, threads), streaming its stdout to out_path;
+        returns (returncode, output bytes, stderr, threads, seconds)."""
+        future = asyncio.get_running_loop().create_future()
+        async with self.changed:
+            heapq.heappush(self.queue, (-cost, next(self.order), query, build_cmd, cost, timeout, out_path, future))
+            self.outstanding += cost
+            self.changed.notify_all()
+        return await future
+
+    async def dispatch(self):
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.queue and self.free > 0)
+                _, _, query, build_cmd, cost, timeout, out_path, future = heapq.heappop(self.queue)
+                share = math.ceil(self.cpus * cost / self.outstanding) if self.outstanding else self.cpus
+                threads = max(1, min(self.free, share))
+                self.free -= threads
+            task = asyncio.create_task(self._execute(query, build_cmd, cost, timeout, out_path, threads, future))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _execute(self, query, build_cmd, cost, timeout, out_path, threads, future):
+        started = time.perf_counter()
+        try:
+            # The feed (a decompressor or writer thread) only starts once the job has its threads
+            with QueryFeed(query) as feed:
+                result = await run_blast(build_cmd(feed.argument, threads), timeout, out_path, feed)
+            if not future.done(): future.set_result((*result, threads, time.perf_counter() - started))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            if not future.done(): future.set_exception(e)
+        finally:
+            async with self.changed:
+                self.free += threads
+                self.outstanding -= cost
+                self.changed.notify_all()
+
+async def run_blast(cmd, timeout, out_path, feed=None):
+    """Runs one BLAST process to completion, writing stdout to out_path line by line as it arrives, so a large hit
+    set is never held in memory; on timeout or cancellation the process is killed, never orphaned.
+
+    Returns (returncode, output bytes, stderr).
+    """
+    proc = await asyncio.create_subprocess_exec(*cmd, stdin=feed.stdin if feed else None,
+                                                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    if feed: feed.started()
+
+    async def spool():
+        written = 0
+        with open(out_path, 'wb') as out:
+            async for line in proc.stdout:
+                out.write(line)
+                written += len(line)
+        return written
+
+    try:
+        out_bytes, stderr = await asyncio.wait_for(asyncio.gather(spool(), proc.stderr.read()), timeout)
+        await proc.wait()
+    except asyncio.TimeoutError:
+        proc.kill(); await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except asyncio.CancelledError:
+        proc.kill(); await proc.wait()
+        raise
+    if feed and proc.returncode == 0: feed.finish()
+    return proc.returncode, out_bytes, stderr
+
+def read_hits(path, hit_type):
+    """Parses a spooled or raw-hits file as it is read; a missing search (None) has no hits."""
+    if path is None: return []
+    with open(path) as f: return analyzer.parse_hits(f, hit_type)
+
+def stage_regions(input_fasta_path, mge_path, mode):
+    """Pool task: parses the stage-one MGE hits and cuts the stage-two query; returns (records, regions)."""
+    mge_hits, regions = read_hits(mge_path, "MGE"), {}
+    records = list(analyzer.mge_region_records(read_fasta(input_fasta_path), mge_hits, mode, regions))
+    return records, regions
+
+def finish_sample(input_fasta_path, output_dir, arg_path, mge_path, regions=None, all_mge_hits=False,
+                  output_format="tsv", dataset_dir=None, store_path=None, flank_bp=None, locus_options=None, save_hits=None):
+    """Pool task: parsing (streamed from the BLAST output files), context analysis and output for one sample;
+    returns (message, outputs, stats)."""
+    reset_peak_rss()
+    sample_id, stats = analyzer.sample_id_for(input_fasta_path), Counter()
+    started = time.perf_counter()
+    arg_hits = read_hits(arg_path, "ARG")
+    if regions is not None: arg_hits = analyzer.map_region_hits(arg_hits, regions)
+    stats["ARG_parse_seconds"], started = time.perf_counter() - started, time.perf_counter()
+    mge_hits = read_hits(mge_path, "MGE")
+    stats["MGE_parse_seconds"] = time.perf_counter() - started
+    stats["ARG_hits"], stats["MGE_hits"] = len(arg_hits), len(mge_hits)
+    message, outputs = analyzer.report_sample(output_dir, sample_id, arg_hits, mge_hits, all_mge_hits, store_path, stats,
+                                              locus_options, save_hits,
+                                              output_format=output_format, dataset_dir=dataset_dir,
+                                              flank_fasta=input_fasta_path, flank_bp=flank_bp)
+    stats["peak_rss_mb"] = peak_rss_mb() or 0
+    return message, outputs, stats
+
+async def run_sample(fasta, scheduler, pool, output_dir, spool_dir, keep_raw_hits=False, two_stage=None,
+                     arg_db=analyzer.ARG_DB_PATH, mge_db=analyzer.MGE_DB_PATH, **report_options):
+    """ARG and MGE searches run concurrently (MGE first under --two_stage); returns (message, outputs, telemetry).
+
+    BLAST output is spooled to files (the raw-hits files under --raw_hits, else in spool_dir) that the pool
+    workers parse as they read, so neither the event loop nor the workers hold it whole.
+    """
+    loop, sample_id, stats = asyncio.get_running_loop(), analyzer.sample_id_for(fasta), Counter()
+    started = time.perf_counter()
+    spooled = []
+
+    async def search(query, db_prefix, hit_type, query_bytes):
+        """Returns the path of the search's output file, or None when it failed."""
+        if keep_raw_hits:
+            raw_path = analyzer.raw_hits_path(output_dir, sample_id, hit_type)
+            out_path = f"{raw_path}.part"
+        else: raw_path = out_path = analyzer.raw_hits_path(spool_dir, sample_id, hit_type)
+        spooled.append(out_path)
+        try:
+            returncode, out_bytes, stderr, threads, seconds = await scheduler.run(
+                query, lambda query_arg, t: analyzer.blast_command(query_arg, db_prefix, hit_type, str(t)),
+                COST_WEIGHT[hit_type] * query_bytes, analyzer.blast_timeout(query_bytes), out_path)
+        except subprocess.TimeoutExpired as e:
+            sys.stderr.write(f"Error in {hit_type} search for {os.path.basename(fasta)}: {e}\n")
+            stats["blast_failures"] += 1; stats[f"{hit_type}_blast_timeouts"] += 1
+            return None
+        except (OSError, RuntimeError) as e:
+            sys.stderr.write(f"Error in {hit_type} search for {os.path.basename(fasta)}: {e}\n")
+            stats["blast_failures"] += 1
+            return None
+        stats[f"{hit_type}_blast_seconds"] += seconds
+        stats[f"{hit_type}_blast_threads"] = threads
+        stats[f"{hit_type}_blast_exit"] = returncode
+        stats[f"{hit_type}_blast_bytes"] += out_bytes
+        if returncode != 0:
+            sys.stderr.write(f"Error in {hit_type} search for {os.path.basename(fasta)}: exit status {returncode}: "
+                             f"{stderr.decode(errors='replace').strip()}\n")
+            stats["blast_failures"] += 1
+            return None
+        if keep_raw_hits:
+            os.replace(out_path, raw_path)
+            spooled.remove(out_path)
+        return raw_path
+
+    if keep_raw_hits: os.makedirs(output_dir, exist_ok=True)
+    regions, arg_path, fasta_bytes = None, None, fasta_size(fasta)
+    try:
+        if two_stage:
+            mge_path = await search(fasta, mge_db, "MGE", fasta_bytes)
+            if mge_path and os.path.getsize(mge_path):
+                records, regions = await loop.run_in_executor(pool, stage_regions, fasta, mge_path, two_stage)
+                if regions: arg_path = await search(lambda: records, arg_db, "ARG", sum(len(seq) for _, seq in records))
+        else:
+            # Each search streams its own copy of a compressed input; they are scheduled independently
+            arg_path, mge_path = await asyncio.gather(search(fasta, arg_db, "ARG", fasta_bytes),
+                                                      search(fasta, mge_db, "MGE", fasta_bytes))
+
+        raw_outputs = [p for p in (analyzer.raw_hits_path(output_dir, sample_id, t) for t in ("ARG", "MGE"))
+                       if keep_raw_hits and os.path.exists(p)]
+        if stats["blast_failures"]:
+            message, outputs = f"Failed: {sample_id} ({stats['blast_failures']} BLAST searches failed)", []
+        else:
+            message, outputs, report_stats = await loop.run_in_executor(
+                pool, functools.partial(finish_sample, fasta, output_dir, arg_path, mge_path, regions, **report_options))
+            stats.update(report_stats)
+    finally:
+        # Spooled output, and partial raw-hits files of failed searches
+        for path in spooled:
+            if os.path.exists(path): os.remove(path)
+    stats["total_seconds"] = time.perf_counter() - started
+    return message, outputs + raw_outputs, dict(stats)
+
+async def orchestrate(fasta_files, output_dir, cpus, workers, on_result, **options):
+    """Runs every sample under one BlastScheduler; on_result(fasta, message, outputs, telemetry) is called as each finishes."""
+    scheduler = BlastScheduler(cpus)
+    dispatcher = asyncio.create_task(scheduler.dispatch())
+    # Longest first: the biggest genomes start while there is still work to overlap their tail with
+    ordered = sorted(fasta_files, key=fasta_size, reverse=True)
+    os.makedirs(output_dir, exist_ok=True)
+    # BLAST output spools beside the results rather than in a possibly small node-local /tmp
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            tempfile.TemporaryDirectory(prefix=".cdmec_spool_", dir=output_dir) as spool_dir:
+        async def one(fasta):
+            try: result = await run_sample(fasta, scheduler, pool, output_dir, spool_dir, **options)
+            except Exception as e: result = (f"Failed: {analyzer.sample_id_for(fasta)} ({e})", [], {})
+            on_result(fasta, *result)
+        tasks = [asyncio.create_task(one(f)) for f in ordered]
+        try: await asyncio.gather(*tasks)
+        finally:
+            for task in tasks + [dispatcher] + list(scheduler.running): task.cancel()
+            await asyncio.gather(*tasks, dispatcher, *scheduler.running, return_exceptions=True)
+
+def run(fasta_files, output_dir, cpus, workers, on_result, **options):
+    asyncio.run(orchestrate(fasta_files, output_dir, cpus, workers, on_result, **options))
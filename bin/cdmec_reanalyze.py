@@ -0,0 +1,110 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Re-runs the context analysis at several thresholds from hits saved by cdmec_analyzer.py --save_hits.
+
+BLAST is never invoked: each sample's hits are loaded, resolved and indexed once, and every threshold is
+answered from a single window query per ARG. Outputs go to <output_dir>/threshold_<bp>/ with the usual
+file names, so the collector, reporter and plotters can be pointed at one threshold directory at a time.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import cdmec_analyzer as analyzer
+
+# Not *.tsv/*.txt: the sweep usually writes into a results directory that SignatureDistance and the map plotter glob
+SWEEP_NAME = "cdmec_threshold_sweep.csv"
+EMBEDDED = "Embedded within MGE"
+
+def threshold_dir(output_dir, threshold):
+    return os.path.join(output_dir, f"threshold_{threshold}")
+
+def usable_thresholds(settings, thresholds):
+    """--two_stage windows only searched for ARGs near an MGE, so wider windows than the run's would miss some."""
+    if settings.get("Two_Stage") == "windows":
+        return [t for t in thresholds if t <= settings.get("Context_Threshold", analyzer.CONTEXT_THRESHOLD)]
+    return list(thresholds)
+
+def locus_options_for(settings, overrides):
+    """The saved run's locus-resolution settings, with any given on the command line taking precedence."""
+    options = {"min_pident": settings.get("Min_Pident", 0.0), "min_coverage": settings.get("Min_Coverage", 0.0),
+               "collapse": settings.get("Collapse", "none")}
+    options.update({k: v for k, v in overrides.items() if v is not None})
+    return options
+
+def reanalyze_sample(hits_path, output_dir, thresholds, overrides, all_mge_hits=False, output_format="tsv"):
+    """Worker: one sample's saved hits -> outputs for every usable threshold.
+
+    Returns (sample_id, {threshold: (associations, embedded)}, skipped thresholds).
+    """
+    saved = analyzer.load_parsed_hits(hits_path)
+    sample_id, settings = saved["Sample_ID"], saved.get("Settings", {})
+    arg_hits, mge_hits = analyzer.resolve_sample_hits(saved["ARG_Hits"], saved["MGE_Hits"], Counter(),
+                                                      **locus_options_for(settings, overrides))
+    usable = usable_thresholds(settings, thresholds)
+    counts = {}
+    if usable:
+        mge_index = analyzer.build_mge_index(mge_hits)
+        nearest = analyzer.analyze_thresholds(arg_hits, mge_hits, usable, mge_index)
+        every = analyzer.analyze_thresholds(arg_hits, mge_hits, usable, mge_index, all_mges=True) if all_mge_hits else {}
+        for t in usable:
+            out_dir = threshold_dir(output_dir, t)
+            # Drop what an earlier sweep wrote for this sample, so a threshold that lost its hits leaves nothing behind
+            stale = glob.glob(os.path.join(out_dir, f"{glob.escape(sample_id)}_cdmec*"))
+            for path in stale + glob.glob(analyzer.all_mges_path(glob.escape(out_dir), glob.escape(sample_id))): os.remove(path)
+            if nearest[t]: analyzer.write_output(out_dir, sample_id, nearest[t], every.get(t), output_format)
+            counts[t] = (len(nearest[t]), sum(row['Inferred_Status'] == EMBEDDED for row in nearest[t]))
+    return sample_id, counts, [t for t in thresholds if t not in usable]
+
+def sweep(input_dir, output_dir, thresholds, overrides, all_mge_hits=False, output_format="tsv", workers=None):
+    """Reanalyzes every saved sample; writes and returns the per-threshold summary rows."""
+    hits_files = sorted(glob.glob(os.path.join(input_dir, "*_cdmec_hits.json.gz")))
+    if not hits_files: return None
+    thresholds = sorted(set(thresholds))
+    totals = {t: Counter() for t in thresholds}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(reanalyze_sample, path, output_dir, thresholds, overrides, all_mge_hits, output_format)
+                   for path in hits_files]
+        for future in futures:
+            sample_id, counts, skipped = future.result()
+            if skipped: print(f"{sample_id}: saved from a --two_stage windows run; skipped thresholds {skipped}")
+            for t, (associations, embedded) in counts.items():
+                totals[t].update(Samples=1, Samples_With_Associations=int(associations > 0),
+                                 Associations=associations, Embedded=embedded)
+    rows = [{"Threshold": t, **{k: totals[t][k] for k in ("Samples", "Samples_With_Associations", "Associations", "Embedded")}}
+            for t in thresholds]
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, SWEEP_NAME), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader(); writer.writerows(rows)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CdMEC-A threshold sweep over hits saved with cdmec_analyzer.py --save_hits.")
+    parser.add_argument("-i", "--input_dir", required=True, help="Directory containing <sample>_cdmec_hits.json.gz files.")
+    parser.add_argument("-o", "--output_dir", default=None, help="Where threshold_<bp>/ directories go (default: input_dir).")
+    parser.add_argument("-T", "--thresholds", type=int, nargs="+", required=True, help="Context windows in bp, e.g. 1000 5000 20000.")
+    parser.add_argument("--all_mge_hits", action="store_true", help="Also write all_mges/<sample>_cdmec_all_mges.tsv per threshold.")
+    parser.add_argument("--output_format", choices=["tsv", "parquet", "both"], default="tsv")
+    parser.add_argument("--collapse", choices=["arg", "all", "none"], default=None, help="Override the saved run's --collapse.")
+    parser.add_argument("--min_pident", type=float, default=None, help="Override the saved run's --min_pident.")
+    parser.add_argument("--min_coverage", type=float, default=None, help="Override the saved run's --min_coverage.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    if min(args.thresholds) < 0: parser.error("thresholds must be non-negative")
+
+    output_dir = args.output_dir or args.input_dir
+    overrides = {"collapse": args.collapse, "min_pident": args.min_pident, "min_coverage": args.min_coverage}
+    rows = sweep(args.input_dir, output_dir, args.thresholds, overrides, args.all_mge_hits, args.output_format, args.workers)
+    if rows is None:
+        print(f"No *_cdmec_hits.json.gz in {args.input_dir}; run cdmec_analyzer.py with --save_hits first."); sys.exit(1)
+    print(f"{'Threshold':>10} {'Samples':>8} {'With_Assoc':>11} {'Associations':>13} {'Embedded':>9}")
+    for r in rows:
+        print(f"{r['Threshold']:>10} {r['Samples']:>8} {r['Samples_With_Associations']:>11} {r['Associations']:>13} {r['Embedded']:>9}")
+    print(f"Outputs in {threshold_dir(output_dir, '<bp>')}; summary: {os.path.join(output_dir, SWEEP_NAME)}")
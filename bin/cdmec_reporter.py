@@ -2,41 +2,64 @@
 # Copyright (C) 2025 [Dr. Reema Singh]
 # Licensed under the GNU General Public License v3.0
 
-import pandas as pd
-import glob
-import os
+import sqlite3
 import argparse
+from cdmec_results import find_result_files
+from cdmec_sketch import merge_sketches, result_sketch
 
 def get_manuscript_stats(output_dir):
     # Locate all summary files generated by CdMEC-A
-    all_files = glob.glob(os.path.join(output_dir, "*_summary.tsv"))
+    all_files = find_result_files(output_dir)
 
     if not all_files:
         print(f"Error: No summary files found in {output_dir}")
         return
 
-    # Aggregate individual sample reports into one master dataset
-    full_df = pd.concat([pd.read_csv(f, sep='\t') for f in all_files], ignore_index=True)
+    # Merge the per-sample sketches (built from the file where one is missing); rows are never concatenated
+    cohort = merge_sketches(result_sketch(f) for f in all_files)
+    print_manuscript_stats(cohort.samples, cohort.rows, cohort.status_counts(), cohort.proximity_stats())
 
+def get_store_stats(store_path):
+    """Same report from the analyzer's SQLite store (--store), using aggregate SQL instead of re-reading TSVs."""
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        n_samples, n_rows = conn.execute("SELECT COUNT(DISTINCT Sample_ID), COUNT(*) FROM associations").fetchone()
+        if not n_rows:
+            print(f"Error: No associations found in {store_path}")
+            return
+        # Ties keep first-seen order, as value_counts does
+        status_counts = conn.execute("SELECT Inferred_Status, COUNT(*) AS n FROM associations "
+                                     "GROUP BY Inferred_Status ORDER BY n DESC, MIN(rowid)").fetchall()
+        mean, low, high = conn.execute("SELECT AVG(ABS(Proximity_bp)), MIN(ABS(Proximity_bp)), MAX(ABS(Proximity_bp)) "
+                                       "FROM associations").fetchone()
+        sq_dev = conn.execute("SELECT SUM((ABS(Proximity_bp) - ?) * (ABS(Proximity_bp) - ?)) FROM associations",
+                              (mean, mean)).fetchone()[0]
+        middle = [r[0] for r in conn.execute("SELECT ABS(Proximity_bp) AS d FROM associations ORDER BY d LIMIT 2 OFFSET ?",
+                                             ((n_rows - 1) // 2,))]
+    finally: conn.close()
+    median = middle[0] if n_rows % 2 else (middle[0] + middle[1]) / 2
+    std = (sq_dev / (n_rows - 1)) ** 0.5 if n_rows > 1 else float('nan')
+    print_manuscript_stats(n_samples, n_rows, status_counts,
+                           {"mean": mean, "50%": median, "std": std, "min": low, "max": high})
+
+def print_manuscript_stats(n_samples, n_rows, status_counts, proximity_stats):
     print("\n" + "="*50)
     print(" CdMEC-A MANUSCRIPT SUMMARY STATISTICS ")
     print("="*50)
 
     # General Sample and Hit Counts
-    print(f"Total Samples Analyzed:       {full_df['Sample_ID'].nunique()}")
-    print(f"Total Associated ARGs Found: {len(full_df)}")
+    print(f"Total Samples Analyzed:       {n_samples}")
+    print(f"Total Associated ARGs Found: {n_rows}")
 
     # Breakdown by Inferred Association Status
     print("\n[MGE Association Classifications]")
-    status_counts = full_df['Inferred_Status'].value_counts()
-    for status, count in status_counts.items():
-        percentage = (count / len(full_df)) * 100
+    for status, count in status_counts:
+        percentage = (count / n_rows) * 100
         print(f" - {status:.<30} {count} ({percentage:.1f}%)")
 
     # Physical Distance Metrics
     print("\n[Proximity Analysis (Distance in bp)]")
     # Using absolute value to represent physical distance regardless of Up/Downstream
-    proximity_stats = full_df['Proximity_bp'].abs().describe()
     print(f" - Mean Distance:  {proximity_stats['mean']:.2f} bp")
     print(f" - Median (50%):   {proximity_stats['50%']:.2f} bp")
     print(f" - Std Deviation:  {proximity_stats['std']:.2f} bp")
@@ -45,7 +68,10 @@ def get_manuscript_stats(output_dir):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate CdMEC-A stats for manuscript.")
-    parser.add_argument("-i", "--input", required=True, help="Directory containing *_summary.tsv files")
+    parser.add_argument("-i", "--input", help="Directory containing *_summary.tsv or *_cdmec.parquet files")
+    parser.add_argument("--store", help="SQLite results store written by cdmec_analyzer.py --store (instead of -i)")
     args = parser.parse_args()
+    if not args.input and not args.store: parser.error("one of -i/--input or --store is required")
 
-    get_manuscript_stats(args.input)
+    if args.store: get_store_stats(args.store)
+    else: get_manuscript_stats(args.input)
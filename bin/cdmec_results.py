@@ -0,0 +1,22 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Locating per-sample result files; shared by the collector, reporters and sketches."""
+
+import glob
+import os
+
+PARQUET_SUFFIX = "_cdmec.parquet"
+TSV_SUFFIX = "_cdmec_summary.tsv"
+
+def result_sample_id(path):
+    name = os.path.basename(path)
+    return name[:-len(PARQUET_SUFFIX)] if name.endswith(PARQUET_SUFFIX) else name[:-len(TSV_SUFFIX)]
+
+def find_result_files(output_dir):
+    """Per-sample summaries (TSV or Parquet); a sample written in both formats is only counted once."""
+    parquet_files = glob.glob(os.path.join(output_dir, f"*{PARQUET_SUFFIX}"))
+    have_parquet = {result_sample_id(f) for f in parquet_files}
+    tsv_files = [f for f in glob.glob(os.path.join(output_dir, "*_summary.tsv")) if result_sample_id(f) not in have_parquet]
+    return parquet_files + tsv_files
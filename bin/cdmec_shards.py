@@ -0,0 +1,174 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import argparse
+import csv
+import glob
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import sys
+from cdmec_fasta import fasta_size, find_fastas
+from cdmec_manifest import COMPLETE_STATES, RunManifest
+from cdmec_store import COLUMNS, open_store, replace_sample
+
+SHARD_PLAN_NAME = "cdmec_shard.json"
+SHARDS_DIR = "shards"
+
+def parse_shard(spec):
+    """argparse type for 'I/N' (1-based, so Slurm's --array=1-N maps straight onto it)."""
+    try: index, count = (int(x) for x in spec.split('/'))
+    except ValueError: raise argparse.ArgumentTypeError(f"expected I/N, got {spec!r}")
+    if not 1 <= index <= count: raise argparse.ArgumentTypeError(f"shard index must be between 1 and N, got {spec!r}")
+    return index, count
+
+def assign_shards(fasta_files, count):
+    """Splits the inputs into count lists of near-equal total size (uncompressed FASTA bytes ~ bases).
+
+    Largest file first onto the lightest shard, ties broken by name and shard number, so every
+    array task computes the same partition from the same directory.
+    """
+    shards, load = [[] for _ in range(count)], [(0, i) for i in range(count)]
+    for size, fasta in sorted(((fasta_size(f), f) for f in fasta_files), key=lambda x: (-x[0], x[1])):
+        bases, i = heapq.heappop(load)
+        shards[i].append(fasta)
+        heapq.heappush(load, (bases + size, i))
+    return [sorted(s) for s in shards]
+
+def partition_fingerprint(fasta_files):
+    """Changes whenever the file list or a file size changes, i.e. whenever the partition could."""
+    digest = hashlib.sha256()
+    for f in sorted(fasta_files): digest.update(f"{os.path.basename(f)}\t{os.path.getsize(f)}\n".encode())
+    return digest.hexdigest()
+
+def shard_dir(output_dir, index, count):
+    return os.path.join(output_dir, SHARDS_DIR, f"shard_{index}_of_{count}")
+
+def write_shard_plan(shard_output_dir, index, count, all_files, shard_files, settings, sample_id_for):
+    """Records what this shard is responsible for, before any work starts, so merge can tell unfinished from missing."""
+    os.makedirs(shard_output_dir, exist_ok=True)
+    plan = {"Shard": index, "Shards": count, "Partition_Fingerprint": partition_fingerprint(all_files),
+            "Input_Bytes": sum(os.path.getsize(f) for f in shard_files),
+            "Samples": [sample_id_for(f) for f in shard_files], "Settings": settings}
+    path = os.path.join(shard_output_dir, SHARD_PLAN_NAME)
+    with open(f"{path}.tmp", 'w') as f: json.dump(plan, f, indent=4)
+    os.replace(f"{path}.tmp", path)
+    return plan
+
+def load_shard_plans(output_dir):
+    plans = []
+    for path in sorted(glob.glob(os.path.join(output_dir, SHARDS_DIR, "shard_*_of_*", SHARD_PLAN_NAME))):
+        with open(path) as f: plans.append({**json.load(f), "Dir": os.path.dirname(path)})
+    return sorted(plans, key=lambda p: (p["Shards"], p["Shard"]))
+
+def verify_shards(output_dir):
+    """Checks that one complete, consistent set of shards exists; returns (plans, manifests, problems)."""
+    plans = load_shard_plans(output_dir)
+    if not plans: return [], [], [f"no shard plans under {os.path.join(output_dir, SHARDS_DIR)}"]
+    counts = {p["Shards"] for p in plans}
+    if len(counts) > 1: return plans, [], [f"shards from different splits present: N = {sorted(counts)}"]
+    count, problems = counts.pop(), []
+    missing = sorted(set(range(1, count + 1)) - {p["Shard"] for p in plans})
+    if missing: problems.append(f"shards never started: {', '.join(f'{i}/{count}' for i in missing)}")
+    if len({p["Partition_Fingerprint"] for p in plans}) > 1:
+        problems.append("shards were planned from different input lists (files added or changed between array tasks)")
+    if any(p["Settings"] != plans[0]["Settings"] for p in plans):
+        problems.append("shards were run with different settings or databases")
+    manifests = []
+    for plan in plans:
+        manifest = RunManifest(plan["Dir"])
+        manifests.append(manifest)
+        unfinished = [sid for sid in plan["Samples"]
+                      if manifest.samples.get(sid, {}).get("Status") not in COMPLETE_STATES
+                      or manifest.samples[sid].get("Settings") != plan["Settings"]]
+        lost = [p for sid in plan["Samples"] for p in manifest.samples.get(sid, {}).get("Outputs", []) if not os.path.exists(p)]
+        if unfinished:
+            problems.append(f"shard {plan['Shard']}/{count}: {len(unfinished)} of {len(plan['Samples'])} samples not completed "
+                            f"(e.g. {', '.join(unfinished[:3])}); rerun it with --resume")
+        if lost: problems.append(f"shard {plan['Shard']}/{count}: {len(lost)} output files missing (e.g. {lost[0]})")
+    return plans, manifests, problems
+
+def place_output(path, shard_output_dir, output_dir):
+    """Hard-links a shard's output into the combined directory (copying across filesystems); other paths stay put."""
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(shard_output_dir))
+    if rel.startswith(os.pardir): return path  # e.g. a shared --parquet_dataset partition
+    target = os.path.join(output_dir, rel)
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    if os.path.lexists(target): os.remove(target)
+    try: os.link(path, target)
+    except OSError: shutil.copy2(path, target)
+    return target
+
+def summary_rows(outputs):
+    """Rows of a sample's summary, streamed from its TSV or, for Parquet-only runs, its Parquet file."""
+    tsv = next((p for p in outputs if p.endswith("_cdmec_summary.tsv")), None)
+    if tsv:
+        with open(tsv, newline='') as f: yield from csv.DictReader(f, delimiter='\t')
+        return
+    parquet = next((p for p in outputs if p.endswith("_cdmec.parquet")), None)
+    if parquet:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(parquet).iter_batches(): yield from batch.to_pylist()
+
+def merge_shards(output_dir, master_path=None, store_path=None):
+    """Verifies the shards, then in one pass over their samples links the outputs into output_dir, streams
+    every summary into the master table (and optionally a store) and writes the combined manifest.
+
+    Returns (samples, master rows), or None when verification fails.
+    """
+    plans, manifests, problems = verify_shards(output_dir)
+    if problems:
+        for problem in problems: print(f"!!! {problem}")
+        return None
+    master_path = master_path or os.path.join(output_dir, "cdmec_Master.csv")
+    combined, rows, samples = RunManifest(output_dir), 0, 0
+    conn = open_store(store_path) if store_path else None
+    try:
+        with open(f"{master_path}.part", 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for plan, manifest in zip(plans, manifests):
+                for sample_id in sorted(plan["Samples"]):
+                    entry = manifest.samples[sample_id]
+                    sample_rows = []
+                    for row in summary_rows(entry["Outputs"]):
+                        writer.writerow([row.get(c) for c in COLUMNS])
+                        if conn: sample_rows.append({**row, **{c: int(row[c]) for c in ("ARG_Start", "ARG_End", "Proximity_bp")}})
+                        rows += 1
+                    if conn: replace_sample(conn, sample_id, sample_rows)
+                    outputs = [place_output(p, plan["Dir"], output_dir) for p in entry["Outputs"]]
+                    combined.samples[sample_id] = {**entry, "Outputs": outputs, "Shard": f"{plan['Shard']}/{plan['Shards']}"}
+                    samples += 1
+        os.replace(f"{master_path}.part", master_path)
+    finally:
+        if conn: conn.close()
+    combined.save()
+    return samples, rows
+
+def print_plan(input_dir, count):
+    for i, shard in enumerate(assign_shards(find_fastas(input_dir), count), 1):
+        print(f"shard {i}/{count}: {len(shard):>6} samples {sum(map(fasta_size, shard)) / 1e6:>10.1f} Mb")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CdMEC-A sharded runs: preview a split, or verify and merge finished shards.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    plan = sub.add_parser("plan", help="Show how --shard I/N would split an input directory.")
+    plan.add_argument("-i", "--input_dir", required=True)
+    plan.add_argument("-n", "--shards", type=int, required=True)
+    merge = sub.add_parser("merge", help="Verify every shard completed, then build the combined outputs and master table.")
+    merge.add_argument("-o", "--output_dir", required=True, help="The -o given to every cdmec_analyzer.py --shard run.")
+    merge.add_argument("--master", default=None, help="Master table path (default: <output_dir>/cdmec_Master.csv).")
+    merge.add_argument("--store", default=None, help="Also load the merged results into this SQLite store.")
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        print_plan(args.input_dir, args.shards)
+    else:
+        merged = merge_shards(args.output_dir, args.master, args.store)
+        if merged is None:
+            print("Merge aborted: the shards above are incomplete or inconsistent."); sys.exit(1)
+        print(f"Merged {merged[0]} samples ({merged[1]} associations) into {args.output_dir}; "
+              f"master table: {args.master or os.path.join(args.output_dir, 'cdmec_Master.csv')}")
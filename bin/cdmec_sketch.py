@@ -0,0 +1,124 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+"""Per-sample summary sketches: small partial aggregates written next to each sample's results.
+
+A sketch holds the status counts, an exact histogram of Proximity_bp (bounded by the context window)
+and per-ARG / per-MGE counts of mobile hits (|Proximity_bp| <= MOBILE_BP). Sketches merge by addition,
+so cohort statistics cost one small file per sample and memory bounded by the window and the ARG/MGE
+vocabularies, never by the number of rows.
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from cdmec_results import result_sample_id
+
+SKETCH_VERSION = 1
+MOBILE_BP = 1000
+EMBEDDED = "Embedded within MGE"
+
+def sketch_path(output_dir, sample_id):
+    return os.path.join(output_dir, f"{sample_id}_cdmec_sketch.json")
+
+def build_sketch(rows, mobile_bp=MOBILE_BP):
+    """Sketch of result rows (analyzer results, or rows read back from a summary file)."""
+    samples, status, proximity, args, mges = set(), Counter(), Counter(), Counter(), Counter()
+    for row in rows:
+        distance = int(row['Proximity_bp'])
+        samples.add(row['Sample_ID'])
+        status[row['Inferred_Status']] += 1
+        proximity[distance] += 1
+        if abs(distance) <= mobile_bp:
+            args[row['ARG_Name']] += 1
+            mges[row['MGE_Association']] += 1
+    return {"Version": SKETCH_VERSION, "Samples": len(samples), "Rows": sum(status.values()), "Mobile_bp": mobile_bp,
+            "Status_Counts": dict(status), "Proximity_Counts": {str(d): n for d, n in sorted(proximity.items())},
+            "Mobile_ARGs": dict(args), "Mobile_MGEs": dict(mges)}
+
+def write_sketch(path, sample_id, results, mobile_bp=MOBILE_BP):
+    sketch = {"Sample_ID": sample_id, **build_sketch(({**r, "Sample_ID": sample_id} for r in results), mobile_bp)}
+    with open(f"{path}.tmp", 'w') as f: json.dump(sketch, f, separators=(',', ':'))
+    os.replace(f"{path}.tmp", path)
+
+def read_result_rows(path):
+    """Rows of a *_summary.tsv or *_cdmec.parquet file."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(): yield from batch.to_pylist()
+        return
+    with open(path, newline='') as f: yield from csv.DictReader(f, delimiter='\t')
+
+def result_sketch(result_path, mobile_bp=MOBILE_BP):
+    """The sketch written beside a result file, or one built from the file when it is missing, older or differently configured."""
+    path = sketch_path(os.path.dirname(result_path), result_sample_id(result_path))
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(result_path):
+        with open(path) as f: sketch = json.load(f)
+        if sketch.get("Version") == SKETCH_VERSION and sketch.get("Mobile_bp") == mobile_bp: return sketch
+    return build_sketch(read_result_rows(result_path), mobile_bp)
+
+class CohortSketch:
+    """Sum of sample sketches. Counters keep first-seen order, so ties rank as pandas value_counts does
+    on the concatenated table."""
+
+    def __init__(self):
+        self.samples, self.rows = 0, 0
+        self.status, self.proximity, self.args, self.mges = Counter(), Counter(), Counter(), Counter()
+
+    def add(self, sketch):
+        self.samples += sketch["Samples"]
+        self.rows += sketch["Rows"]
+        self.status.update(sketch["Status_Counts"])
+        self.proximity.update({int(d): n for d, n in sketch["Proximity_Counts"].items()})
+        self.args.update(sketch["Mobile_ARGs"])
+        self.mges.update(sketch["Mobile_MGEs"])
+        return self
+
+    @staticmethod
+    def ranked(counts, n=None):
+        """(key, count) by count descending, ties in first-seen order."""
+        return sorted(counts.items(), key=lambda kv: -kv[1])[:n]
+
+    def status_counts(self):
+        return self.ranked(self.status)
+
+    def top_args(self, n=10):
+        return self.ranked(self.args, n)
+
+    def top_mges(self, n=10):
+        return self.ranked(self.mges, n)
+
+    def embedded(self):
+        return self.status.get(EMBEDDED, 0)
+
+    @staticmethod
+    def _value_at(distances, index):
+        seen = 0
+        for d, n in distances:
+            seen += n
+            if seen > index: return d
+
+    def _quantile(self, q, distances):
+        """Linearly interpolated quantile (pandas' default) of a sorted (value, count) histogram."""
+        position = q * (self.rows - 1)
+        i, fraction = int(position), position - int(position)
+        lower = self._value_at(distances, i)
+        return lower + (self._value_at(distances, i + 1) - lower) * fraction if fraction else float(lower)
+
+    def proximity_stats(self):
+        """mean, 50%, std, min and max of |Proximity_bp|, exact from the merged histogram."""
+        counts = Counter()
+        for d, n in self.proximity.items(): counts[abs(d)] += n
+        distances, n = sorted(counts.items()), self.rows
+        total = sum(d * c for d, c in distances)
+        squares = sum(d * d * c for d, c in distances)
+        std = ((n * squares - total * total) / (n * (n - 1))) ** 0.5 if n > 1 else float('nan')
+        return {"mean": total / n, "50%": self._quantile(0.5, distances), "std": std,
+                "min": distances[0][0], "max": distances[-1][0]}
+
+def merge_sketches(sketches):
+    cohort = CohortSketch()
+    for sketch in sketches: cohort.add(sketch)
+    return cohort
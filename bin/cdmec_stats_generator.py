@@ -4,7 +4,10 @@
 
 import pandas as pd
 import os
+import sqlite3
 import argparse
+from cdmec_results import find_result_files
+from cdmec_sketch import MOBILE_BP, merge_sketches, result_sketch
 
 def generate_publication_report(input_csv, output_prefix):
     if not os.path.exists(input_csv):
@@ -25,7 +28,7 @@ def generate_publication_report(input_csv, output_prefix):
 
     # 1. Filter for high-risk mobility (Distance within 1kb or Embedded)
     # Using .abs() ensures we capture both Upstream (-1000) and Downstream (+1000)
-    mobile_hits = df[df[dist_col].abs() <= 1000].copy()
+    mobile_hits = df[df[dist_col].abs() <= MOBILE_BP].copy()
 
     # 2. Table 1: Top 10 Most Mobile ARGs
     top_args = mobile_hits[arg_col].value_counts().head(10).reset_index()
@@ -39,7 +42,39 @@ def generate_publication_report(input_csv, output_prefix):
     # 4. Summary Statistics for Abstract
     total_hits = len(df)
     embedded_count = len(df[df[status_col] == 'Embedded within MGE'])
-    
+
+    write_publication_report(top_args, top_mges, total_hits, embedded_count, output_prefix)
+
+def generate_sketch_report(results_dir, output_prefix):
+    """Same tables from the per-sample sketches beside the analyzer's results, merged one sample at a time."""
+    result_files = find_result_files(results_dir)
+    if not result_files:
+        print(f"Error: No summary files found in {results_dir}")
+        return
+    # Files in the order master_Collector concatenates them, so ties rank as in the master table
+    cohort = merge_sketches(result_sketch(f) for f in result_files)
+    top_args = pd.DataFrame(cohort.top_args(), columns=['Resistance_Gene', 'Mobile_Occurrence_Count'])
+    top_mges = pd.DataFrame(cohort.top_mges(), columns=['MGE_Accession_Info', 'Total_Cargo_Genes'])
+    write_publication_report(top_args, top_mges, cohort.rows, cohort.embedded(), output_prefix)
+
+def generate_store_report(store_path, output_prefix):
+    """Same tables from the analyzer's SQLite store (--store); the 1kb filter runs on the Proximity_bp index."""
+    if not os.path.exists(store_path):
+        print(f"Error: {store_path} not found!")
+        return
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        mobile = f"FROM associations WHERE Proximity_bp BETWEEN -{MOBILE_BP} AND {MOBILE_BP}"
+        top_args = pd.read_sql_query(f"SELECT ARG_Name AS Resistance_Gene, COUNT(*) AS Mobile_Occurrence_Count {mobile} "
+                                     "GROUP BY ARG_Name ORDER BY Mobile_Occurrence_Count DESC, MIN(rowid) LIMIT 10", conn)
+        top_mges = pd.read_sql_query(f"SELECT MGE_Association AS MGE_Accession_Info, COUNT(*) AS Total_Cargo_Genes {mobile} "
+                                     "GROUP BY MGE_Association ORDER BY Total_Cargo_Genes DESC, MIN(rowid) LIMIT 10", conn)
+        total_hits, embedded_count = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(Inferred_Status = 'Embedded within MGE'), 0) FROM associations").fetchone()
+    finally: conn.close()
+    write_publication_report(top_args, top_mges, total_hits, embedded_count, output_prefix)
+
+def write_publication_report(top_args, top_mges, total_hits, embedded_count, output_prefix):
     # --- PRINTING TO TERMINAL ---
     print("\n" + "="*60)
     print(f"   CdMEC-A SUMMARY REPORT: {output_prefix}")
@@ -66,8 +101,14 @@ def generate_publication_report(input_csv, output_prefix):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("-i", "--input", required=True, help="Input Master CSV")
+    parser.add_argument("-i", "--input", help="Input Master CSV")
+    parser.add_argument("--store", help="SQLite results store written by cdmec_analyzer.py --store (instead of -i)")
+    parser.add_argument("-r", "--results", help="Analyzer output directory; merges the per-sample sketches (instead of -i)")
     parser.add_argument("-o", "--output", default="Cdiff_Analysis", help="Output prefix")
     args = parser.parse_args()
+    if not args.input and not args.store and not args.results:
+        parser.error("one of -i/--input, -r/--results or --store is required")
     
-    generate_publication_report(args.input, args.output)
+    if args.store: generate_store_report(args.store, args.output)
+    elif args.results: generate_sketch_report(args.results, args.output)
+    else: generate_publication_report(args.input, args.output)
@@ -0,0 +1,69 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import argparse
+import csv
+import glob
+import os
+import sqlite3
+import time
+
+COLUMNS = ["Sample_ID", "Contig_ID", "ARG_Name", "ARG_Start", "ARG_End", "MGE_Association", "Proximity_bp", "Inferred_Status"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS associations (
+    Sample_ID TEXT NOT NULL, Contig_ID TEXT, ARG_Name TEXT, ARG_Start INTEGER, ARG_End INTEGER,
+    MGE_Association TEXT, Proximity_bp INTEGER, Inferred_Status TEXT);
+CREATE TABLE IF NOT EXISTS samples (Sample_ID TEXT PRIMARY KEY, Rows INTEGER, Updated TEXT);
+CREATE INDEX IF NOT EXISTS idx_sample ON associations (Sample_ID, ARG_Start);
+CREATE INDEX IF NOT EXISTS idx_contig ON associations (Contig_ID);
+CREATE INDEX IF NOT EXISTS idx_arg ON associations (ARG_Name);
+CREATE INDEX IF NOT EXISTS idx_mge ON associations (MGE_Association);
+CREATE INDEX IF NOT EXISTS idx_proximity ON associations (Proximity_bp);
+"""
+
+def open_store(store_path):
+    """Opens (and if needed creates) the results store. WAL lets readers query while workers write."""
+    os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+    conn = sqlite3.connect(store_path, timeout=300)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def replace_sample(conn, sample_id, results):
+    """Replaces a sample's rows in one transaction, so reruns never duplicate it."""
+    with conn:
+        conn.execute("DELETE FROM associations WHERE Sample_ID = ?", (sample_id,))
+        conn.executemany(f"INSERT INTO associations VALUES ({','.join('?' * len(COLUMNS))})",
+                         [(sample_id, *(hit[c] for c in COLUMNS[1:])) for hit in results])
+        conn.execute("INSERT OR REPLACE INTO samples VALUES (?, ?, ?)",
+                     (sample_id, len(results), time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+def store_results(store_path, sample_id, results):
+    conn = open_store(store_path)
+    try: replace_sample(conn, sample_id, results)
+    finally: conn.close()
+
+def import_summaries(store_path, input_dir):
+    """Backfills the store from existing *_summary.tsv files."""
+    conn = open_store(store_path)
+    imported = 0
+    try:
+        for path in sorted(glob.glob(os.path.join(input_dir, "*_summary.tsv"))):
+            with open(path, newline='') as f: rows = list(csv.DictReader(f, delimiter='\t'))
+            if not rows: continue
+            for row in rows:
+                for c in ["ARG_Start", "ARG_End", "Proximity_bp"]: row[c] = int(row[c])
+            for sample_id in dict.fromkeys(row["Sample_ID"] for row in rows):
+                replace_sample(conn, sample_id, [r for r in rows if r["Sample_ID"] == sample_id])
+                imported += 1
+    finally: conn.close()
+    return imported
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CdMEC-A results store (SQLite).")
+    parser.add_argument("-i", "--input_dir", required=True, help="Directory containing *_summary.tsv files to import.")
+    parser.add_argument("-s", "--store", required=True, help="SQLite store to create or update.")
+    args = parser.parse_args()
+    print(f"Imported {import_summaries(args.store, args.input_dir)} samples into {args.store}")
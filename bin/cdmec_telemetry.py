@@ -0,0 +1,89 @@
+# CdMEC-A: Contextual mDNA Mobile Element Classifier - Analyzer
+# Copyright (C) 2025 [Dr. Reema Singh]
+# Licensed under the GNU General Public License v3.0
+
+import glob
+import json
+import os
+import pstats
+import sys
+import time
+
+RUN_LOG_NAME = "cdmec_run_log.jsonl"
+
+def reset_peak_rss():
+    """Resets the kernel's RSS high-water mark (Linux >= 4.0) so peak_rss_mb covers only what follows."""
+    try:
+        with open("/proc/self/clear_refs", 'w') as f: f.write("5")
+    except OSError: pass
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"): return int(line.split()[1]) / 1024
+    except OSError: pass
+    try: import resource
+    except ImportError: return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB elsewhere
+
+class RunLog:
+    """Append-only JSONL log of one analyzer run: a run_start record, one record per sample and a run_end summary."""
+
+    def __init__(self, path, settings):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path, self.samples, self.started = path, [], time.time()
+        self.write({"Event": "run_start", "Time": time.strftime("%Y-%m-%dT%H:%M:%S"), "Settings": settings})
+
+    def write(self, record):
+        with open(self.path, 'a') as f: f.write(json.dumps(record) + "\n")
+
+    def sample(self, sample_id, status, telemetry):
+        record = {"Event": "sample", "Sample_ID": sample_id, "Status": status, **telemetry}
+        self.samples.append(record)
+        self.write(record)
+
+    def close(self, top=5):
+        """Writes and returns the run summary: throughput, stage totals and the slowest samples."""
+        wall = time.time() - self.started
+        # Batched samples share one set of BLAST numbers; count each batch once
+        units = {r.get("Batch", r["Sample_ID"]): r for r in self.samples}.values()
+        def total(key, records=units): return round(sum(r.get(key, 0) for r in records), 3)
+        input_mb = sum(r.get("Input_Bytes", 0) for r in self.samples) / 1e6
+        summary = {
+            "Event": "run_end", "Time": time.strftime("%Y-%m-%dT%H:%M:%S"), "Wall_Seconds": round(wall, 3),
+            "Samples": len(self.samples), "Failed": sum(r["Status"] == "failed" for r in self.samples),
+            "Input_Mb": round(input_mb, 3),
+            "Samples_Per_Hour": round(3600 * len(self.samples) / wall, 2) if wall else None,
+            "Mb_Per_Minute": round(60 * input_mb / wall, 3) if wall else None,
+            "ARG_Blast_Seconds": total("ARG_blast_seconds"), "MGE_Blast_Seconds": total("MGE_blast_seconds"),
+            "Parse_Seconds": total("ARG_parse_seconds") + total("MGE_parse_seconds"),
+            "Analyze_Seconds": total("analyze_seconds", self.samples), "Write_Seconds": total("write_seconds", self.samples),
+            "Max_Peak_RSS_MB": max((r.get("peak_rss_mb") or 0 for r in self.samples), default=0),
+            "Slowest": [{"Sample_ID": r["Sample_ID"], "Seconds": r.get("total_seconds", 0)}
+                        for r in sorted(self.samples, key=lambda r: -r.get("total_seconds", 0))[:top]],
+        }
+        self.write(summary)
+        return summary
+
+def print_summary(summary):
+    print("\n" + "=" * 50)
+    print(f"RUN SUMMARY: {summary['Samples']} samples ({summary['Failed']} failed) in {summary['Wall_Seconds']:.1f}s")
+    print(f"Throughput : {summary['Samples_Per_Hour']} samples/h, {summary['Mb_Per_Minute']} Mb/min of input")
+    print(f"Stage time : blastx {summary['ARG_Blast_Seconds']:.1f}s | blastn {summary['MGE_Blast_Seconds']:.1f}s | "
+          f"parse {summary['Parse_Seconds']:.2f}s | analyze {summary['Analyze_Seconds']:.2f}s | write {summary['Write_Seconds']:.2f}s")
+    print(f"Peak RSS   : {summary['Max_Peak_RSS_MB']:.0f} MB (largest single worker)")
+    if summary["Slowest"]:
+        print("Slowest samples:")
+        for r in summary["Slowest"]: print(f"  {r['Sample_ID']:<40} {r['Seconds']:.1f}s")
+    print("=" * 50)
+
+def merge_profiles(profile_dir, out_path, top=25):
+    """Combines the per-batch cProfile dumps into one file and prints the top functions by cumulative time."""
+    paths = sorted(glob.glob(os.path.join(profile_dir, "*.prof")))
+    if not paths: return None
+    stats = pstats.Stats(*paths)
+    stats.dump_stats(out_path)
+    stats.sort_stats("cumulative").print_stats(top)
+    return out_path
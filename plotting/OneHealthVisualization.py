@@ -3,95 +3,125 @@
 # Licensed under the GNU General Public License v3.0
 
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+METRICS = ['Prevalence_Pct', 'Avg_Copies_Per_Genome', 'Signature_Distance_bp']
+KEY_MARKERS = ['vanA', 'vanC', 'tet(S)', 'tet(T)', 'ranA', 'bcrA', 'poxtA']
+TOP_N = 25
+
+def load_signatures(path, hosts=None):
+    """Signature rows with short gene names (e.g. 'ranA'); only the given host categories, if any."""
+    df = pd.read_csv(path)
+    if hosts: df = df[df['Host'].isin(hosts)]
+    gene = df['Gene'].astype(str)
+    df = df.assign(Gene_Short=gene.str.rsplit('|', n=1).str[-1])
+    return df
+
+def wide_table(df, hosts=None):
+    """One row per gene: the host-mean of every metric (columns metric x host, 0 where absent), the
+    row-mean ranking metrics and the number of hosts carrying the gene. Built once; every figure slices it."""
+    wide = df.groupby(['Gene_Short', 'Host'])[METRICS].mean().unstack('Host')
+    if hosts: wide = wide.reindex(columns=pd.MultiIndex.from_product([METRICS, hosts]))
+    wide = wide.fillna(0)
+    ranks = df.groupby('Gene_Short')[['Prevalence_Pct', 'Avg_Copies_Per_Genome']].mean()
+    ranks['Hosts'] = df.groupby('Gene_Short')['Host'].nunique()
+    return wide, ranks
+
+def select_genes(ranks, n_hosts, top_n=TOP_N):
+    """Genes present in every host category, by mean redundancy (dosage); failing that, all genes by mean prevalence."""
+    common = ranks['Hosts'] == n_hosts
+    if not common.any():
+        print(f"Warning: No common genes found across all {n_hosts} hosts. Using top {top_n} by overall prevalence.")
+        return ranks['Prevalence_Pct'].sort_values(ascending=False).head(top_n).index
+    # Sort common genes by their average redundancy (dosage) to highlight 'super-signatures'
+    return ranks.loc[common, 'Avg_Copies_Per_Genome'].sort_values(ascending=False).head(top_n).index
+
+def figure_specs(wide, genes, key_df):
+    """(file name, kind, data, options) per figure; data is only the slice that figure draws."""
+    height = max(12, 0.45 * len(genes))
+    specs = [
+        ('prevalence.png', 'heatmap', wide['Prevalence_Pct'].loc[genes],
+         dict(fmt=".1f", cmap="YlGnBu", vmax=100, label='Prevalence (%)', height=height,
+              title='Top Conserved Signatures - Prevalence (%)')),
+        ('redundancy.png', 'heatmap', wide['Avg_Copies_Per_Genome'].loc[genes],
+         dict(fmt=".1f", cmap="YlOrRd", label='Avg Copies per Genome', height=height,
+              title='Top Conserved Signatures - Redundancy (Dosage)')),
+        # RdBu_r highlights 0bp (internalized) as center/white, distant as blue/red
+        ('distance.png', 'heatmap', wide['Signature_Distance_bp'].loc[genes],
+         dict(fmt=".0f", cmap="RdBu_r", center=0, label='Distance to MGE (bp)', height=height,
+              title='Spatial Signatures - Genomic Distance (bp)')),
+    ]
+    if not key_df.empty:
+        specs += [
+            ('key_prevalence.png', 'bars', key_df,
+             dict(y='Prevalence_Pct', palette='viridis', line=(100, 'red', '--', 0.6, '100% Fixation'), ylim=(0, 120),
+                  ylabel='Prevalence (%)', title='Prevalence of Priority One Health Markers')),
+            ('key_redundancy.png', 'bars', key_df,
+             dict(y='Avg_Copies_Per_Genome', palette='magma', line=(1, 'black', '-', 0.3, 'Single Copy Baseline'),
+                  ylabel='Avg Copies Per Genome', title='Genomic Redundancy of Priority Markers')),
+        ]
+    return specs
+
+def render_figure(out_path, kind, data, options):
+    """Worker: draws one figure, saves it and closes it, so no figure outlives its task."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    if kind == 'heatmap':
+        fig = plt.figure(figsize=(10, options['height']))
+        sns.heatmap(data, annot=True, fmt=options['fmt'], cmap=options['cmap'], vmax=options.get('vmax'),
+                    center=options.get('center'), cbar_kws={'label': options['label']})
+    else:
+        fig = plt.figure(figsize=(12, 6))
+        sns.barplot(data=data, x='Gene_Short', y=options['y'], hue='Host', palette=options['palette'])
+        value, color, style, alpha, label = options['line']
+        plt.axhline(value, color=color, linestyle=style, alpha=alpha, label=label)
+        plt.ylabel(options['ylabel'])
+        if 'ylim' in options: plt.ylim(*options['ylim'])
+        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.title(options['title'])
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close(fig)
+    return out_path
 
 def main():
     parser = argparse.ArgumentParser(description="CdMEC-A One Health Visualization Suite")
     parser.add_argument("input", nargs="?", default="one_health_spatial_signatures.csv")
+    parser.add_argument("--hosts", nargs="+", default=None,
+                        help="Host categories to compare, in plotting order (default: every Host in the input).")
+    parser.add_argument("--top", type=int, default=TOP_N, help="Genes shown in the heatmaps.")
+    parser.add_argument("-o", "--output_dir", default=".", help="Where the figures are written.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Processes rendering figures.")
     args = parser.parse_args()
 
     if not os.path.exists(args.input):
         print(f"Error: {args.input} not found. Ensure you ran the updated SignatureDistance.py first.")
         return
 
-    # Load data
-    df = pd.read_csv(args.input)
-    
-    # Extract short gene name for cleaner labels (e.g., 'ranA')
-    df['Gene_Short'] = df['Gene'].apply(lambda x: str(x).split('|')[-1] if '|' in str(x) else str(x))
+    df = load_signatures(args.input, args.hosts)
+    if df.empty:
+        print(f"Error: no rows for hosts {args.hosts} in {args.input}.")
+        return
+    n_hosts = len(args.hosts) if args.hosts else df['Host'].nunique()
 
     # --- SELECTION LOGIC ---
-    # Identify genes common to all 3 hosts for the core comparison heatmaps
-    common_genes = df.groupby('Gene_Short').filter(lambda x: x['Host'].nunique() == 3)['Gene_Short'].unique()
-    
-    if len(common_genes) == 0:
-        print("Warning: No common genes found across all 3 hosts. Using top 25 by overall prevalence.")
-        top_genes = df.groupby('Gene_Short')['Prevalence_Pct'].mean().sort_values(ascending=False).head(25).index
-    else:
-        # Sort common genes by their average redundancy (dosage) to highlight 'super-signatures'
-        top_genes = (df[df['Gene_Short'].isin(common_genes)]
-                     .groupby('Gene_Short')['Avg_Copies_Per_Genome']
-                     .mean().sort_values(ascending=False).head(25).index)
-        
-  # ---------------- FIGURE: PREVALENCE HEATMAP (%) ----------------
-    prev_pivot = df.pivot_table(index='Gene_Short', columns='Host', values='Prevalence_Pct').fillna(0)
-    plt.figure(figsize=(10, 12))
-    sns.heatmap(prev_pivot.loc[top_genes], annot=True, fmt=".1f", cmap="YlGnBu", vmax=100,
-                cbar_kws={'label': 'Prevalence (%)'})
-    plt.title('Top Conserved Signatures - Prevalence (%)')
-    plt.tight_layout()
-    plt.savefig('prevalence.png')
-
-    # ---------------- FIGURE: REDUNDANCY HEATMAP (DOSAGE) ----------------
-    redu_pivot = df.pivot_table(index='Gene_Short', columns='Host', values='Avg_Copies_Per_Genome').fillna(0)
-    plt.figure(figsize=(10, 12))
-    sns.heatmap(redu_pivot.loc[top_genes], annot=True, fmt=".1f", cmap="YlOrRd",
-                cbar_kws={'label': 'Avg Copies per Genome'})
-    plt.title('Top Conserved Signatures - Redundancy (Dosage)')
-    plt.tight_layout()
-    plt.savefig('redundancy.png')
-
-    # ---------------- FIGURE: GENOMIC DISTANCE HEATMAP (bp) ----------------
-    dist_pivot = df.pivot_table(index='Gene_Short', columns='Host', values='Signature_Distance_bp').fillna(0)
-    plt.figure(figsize=(10, 12))
-    # RdBu_r highlights 0bp (internalized) as center/white, distant as blue/red
-    sns.heatmap(dist_pivot.loc[top_genes], annot=True, fmt=".0f", cmap="RdBu_r", center=0,
-                cbar_kws={'label': 'Distance to MGE (bp)'})
-    plt.title('Spatial Signatures - Genomic Distance (bp)')
-    plt.tight_layout()
-    plt.savefig('distance.png')
-    
-    # ---------------- FIGURE: KEY ONE HEALTH MARKER BARS ----------------
-    key_markers = ['vanA', 'vanC', 'tet(S)', 'tet(T)', 'ranA', 'bcrA', 'poxtA']
-    key_df = df[df['Gene_Short'].isin(key_markers)]
+    wide, ranks = wide_table(df, args.hosts)
+    genes = select_genes(ranks, n_hosts, args.top)
+    key_df = df[df['Gene_Short'].isin(KEY_MARKERS)]
 
-    if not key_df.empty:
-        # Prevalence Comparison
-        plt.figure(figsize=(12, 6))
-        sns.barplot(data=key_df, x='Gene_Short', y='Prevalence_Pct', hue='Host', palette='viridis')
-        plt.axhline(100, color='red', linestyle='--', alpha=0.6, label='100% Fixation')
-        plt.title('Prevalence of Priority One Health Markers')
-        plt.ylabel('Prevalence (%)')
-        plt.ylim(0, 120)
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        plt.savefig('key_prevalence.png')
-
-        # Redundancy Comparison
-        plt.figure(figsize=(12, 6))
-        sns.barplot(data=key_df, x='Gene_Short', y='Avg_Copies_Per_Genome', hue='Host', palette='magma')
-        plt.axhline(1, color='black', linestyle='-', alpha=0.3, label='Single Copy Baseline')
-        plt.title('Genomic Redundancy of Priority Markers')
-        plt.ylabel('Avg Copies Per Genome')
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        plt.savefig('key_redundancy.png')
+    os.makedirs(args.output_dir, exist_ok=True)
+    specs = figure_specs(wide, genes, key_df)
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers or 1, len(specs)))) as executor:
+        futures = [executor.submit(render_figure, os.path.join(args.output_dir, name), kind, data, options)
+                   for name, kind, data, options in specs]
+        written = [future.result() for future in futures]
 
     print("\n Visualization Suite Complete!")
-    print("Generated: prevalence.png, redundancy.png, distance.png, key_prevalence.png, key_redundancy.png")
+    print(f"Generated: {', '.join(os.path.basename(p) for p in written)}")
 
 if __name__ == "__main__":
     main()
@@ -2,60 +2,164 @@
 # Copyright (C) 2025 [Dr. Reema Singh]
 # Licensed under the GNU General Public License v3.0
 
+import matplotlib
+matplotlib.use('Agg')  # Worker processes render off-screen
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 import argparse
 import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bin"))
+from cdmec_results import find_result_files
+
+COLUMN_NAMES = [
+    'Sample_ID', 'Contig_ID', 'ARG_Name', 'ARG_Start', 'ARG_End',
+    'MGE_Association', 'Proximity_bp', 'Inferred_Status'
+]
+# Explicit dtypes skip pandas' type sniffing; Proximity_bp is coerced separately so malformed rows drop out
+RESULT_DTYPES = {"Sample_ID": str, "Contig_ID": str, "ARG_Name": str, "ARG_Start": "Int64", "ARG_End": "Int64",
+                 "MGE_Association": str, "Proximity_bp": str, "Inferred_Status": str}
+PLOT_SUFFIXES = ["_status_bar.png", "_proximity_dist.png"]
+
+def read_tokens(file_path):
+    """Fallback for whitespace-separated files: the first seven tokens are columns, the rest is the status."""
+    records = []
+    with open(file_path, 'r', errors='replace') as f:
+        next(f, None)
+        for line in f:
+            tokens = line.split()
+            if len(tokens) >= 8: records.append(tokens[:7] + [' '.join(tokens[7:])])
+    return pd.DataFrame(records, columns=COLUMN_NAMES)
+
+def load_sample(file_path):
+    """Typed read of one summary file (TSV or Parquet)."""
+    if file_path.endswith(".parquet"):
+        df = pd.read_parquet(file_path)
+        for col in df.select_dtypes("category").columns: df[col] = df[col].astype(object)
+        return df
+    try:
+        df = pd.read_csv(file_path, sep='\t', dtype=RESULT_DTYPES)
+        if set(COLUMN_NAMES) <= set(df.columns): return df
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError):
+        pass
+    return read_tokens(file_path)
+
+def plots_current(base_name, output_dir, source_mtime):
+    """True when both PNGs exist and are newer than the data they were drawn from."""
+    paths = [os.path.join(output_dir, f"{base_name}{s}") for s in PLOT_SUFFIXES]
+    return all(os.path.exists(p) and os.path.getmtime(p) >= source_mtime for p in paths)
 
 def visualize_arg_mge_robust(file_path, output_dir):
     """
     Loads ARG-MGE association data and saves plots to the specified output directory.
+    Returns the list of saved plot paths.
     """
-    print(f"\n--- Processing: {os.path.basename(file_path)} ---")
-    
     base_name = os.path.splitext(os.path.basename(file_path))[0]
-    
-    # Ensure the output directory exists
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Created directory: {output_dir}")
-
-    column_names = [
-        'Sample_ID', 'Contig_ID', 'ARG_Name', 'ARG_Start', 'ARG_End',
-        'MGE_Association', 'Proximity_bp', 'Inferred_Status'
-    ]
-    
-    records = [] 
     try:
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-            if not lines: return
-            for line in lines[1:]: 
-                tokens = line.split() 
-                if len(tokens) >= 8:
-                    record = tokens[:7]
-                    inferred_status = ' '.join(tokens[7:])
-                    record.append(inferred_status)
-                    records.append(record)
-        
-        df = pd.DataFrame(records, columns=column_names)
+        df = load_sample(file_path)
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
-        return
+        return []
+    return plot_sample(df, base_name, output_dir, file_path)
+
+def render_file(task):
+    """Worker: (file_path, output_dir, force) -> (name, status, seconds, saved paths)."""
+    file_path, output_dir, force = task
+    started = time.perf_counter()
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    if not force and plots_current(base_name, output_dir, os.path.getmtime(file_path)):
+        return base_name, "skipped", time.perf_counter() - started, []
+    saved = visualize_arg_mge_robust(file_path, output_dir)
+    return base_name, "rendered" if saved else "empty", time.perf_counter() - started, saved
+
+def render_store_sample(task):
+    """Worker: (store_path, sample_id, updated, output_dir, force); each worker opens the store read-only."""
+    store_path, sample_id, updated, output_dir, force = task
+    started = time.perf_counter()
+    base_name = f"{sample_id}_cdmec_summary"
+    if not force and updated is not None and plots_current(base_name, output_dir, updated):
+        return sample_id, "skipped", time.perf_counter() - started, []
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try: df = pd.read_sql_query("SELECT * FROM associations WHERE Sample_ID = ?", conn, params=(sample_id,))
+    finally: conn.close()
+    saved = plot_sample(df, base_name, output_dir, sample_id)
+    return sample_id, "rendered" if saved else "empty", time.perf_counter() - started, saved
+
+def store_tasks(store_path, output_dir, force):
+    """One task per sample in an analyzer --store database; samples.Updated stands in for the TSV mtime."""
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        updated = {s: u for s, u in conn.execute("SELECT Sample_ID, Updated FROM samples")}
+        sample_ids = [r[0] for r in conn.execute("SELECT DISTINCT Sample_ID FROM associations ORDER BY Sample_ID")]
+    finally: conn.close()
+    def to_epoch(stamp):
+        return time.mktime(time.strptime(stamp, "%Y-%m-%dT%H:%M:%S")) if stamp else None
+    return [(store_path, s, to_epoch(updated.get(s)), output_dir, force) for s in sample_ids]
+
+def visualize_store(store_path, output_dir, workers=1, force=False):
+    """Plots every sample in an analyzer --store database, fetching each sample's rows through the Sample_ID index."""
+    return run_batch(render_store_sample, store_tasks(store_path, output_dir, force), workers)
 
+def run_batch(worker, tasks, workers):
+    """Runs render tasks across a process pool (or inline with one worker) and prints each result as it lands."""
+    results = []
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = executor.map(worker, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+            for outcome in outcomes:
+                report_result(outcome)
+                results.append(outcome)
+    else:
+        for task in tasks:
+            outcome = worker(task)
+            report_result(outcome)
+            results.append(outcome)
+    return results
+
+def report_result(outcome):
+    name, status, seconds, saved = outcome
+    print(f"--- {name}: {status} ({seconds:.2f}s) ---")
+    for path in saved: print(f"Saved: {path}")
+
+def print_timing_summary(results, wall_seconds):
+    counts = pd.Series([r[1] for r in results], dtype=object).value_counts()
+    print("\n" + "=" * 50)
+    print(f"RENDER SUMMARY: {len(results)} samples in {wall_seconds:.1f}s wall time")
+    for status in ["rendered", "skipped", "empty"]:
+        print(f"{status.capitalize():<10}: {int(counts.get(status, 0))}")
+    rendered = [(r[2], r[0]) for r in results if r[1] == "rendered"]
+    if rendered:
+        seconds = np.array([s for s, _ in rendered])
+        print(f"Per sample: mean {seconds.mean():.2f}s | median {np.median(seconds):.2f}s | "
+              f"max {seconds.max():.2f}s | {seconds.sum():.1f}s summed across workers")
+        print("Slowest samples:")
+        for secs, name in sorted(rendered, reverse=True)[:5]: print(f"  {name:<40} {secs:.2f}s")
+    print("=" * 50)
+
+def plot_sample(df, base_name, output_dir, source):
+    """Draws the status bar chart and the proximity histogram for one sample; returns the saved paths."""
+    import seaborn as sns  # the slowest import here; only paid once there is something to draw
+    saved = []
     # --- Data Cleaning ---
     try:
         df['Proximity_bp'] = pd.to_numeric(df['Proximity_bp'], errors='coerce')
         df.dropna(subset=['Proximity_bp'], inplace=True)
-        df['Gene_Name'] = df['ARG_Name'].apply(lambda x: x.split('|')[-1] if '|' in x else x)
+        df['Gene_Name'] = df['ARG_Name'].astype(str).str.split('|').str[-1]
     except Exception as e:
-        print(f"Skipping {file_path} due to cleaning error: {e}")
-        return
+        print(f"Skipping {source} due to cleaning error: {e}")
+        return saved
+    if df.empty: return saved
+
+    os.makedirs(output_dir, exist_ok=True)
 
     # --- Visualization 1: Bar Chart ---
-    if 'Inferred_Status' in df.columns and not df.empty:
-        plt.figure(figsize=(10, 6))
+    if 'Inferred_Status' in df.columns:
+        fig = plt.figure(figsize=(10, 6))
         sns.countplot(
             y='Inferred_Status',
             data=df,
@@ -64,46 +168,55 @@ def visualize_arg_mge_robust(file_path, output_dir):
         )
         plt.title(f'ARG-MGE Status: {base_name}', fontsize=14)
         plt.tight_layout()
-        
+
         # Save to output folder
         out_path1 = os.path.join(output_dir, f"{base_name}_status_bar.png")
         plt.savefig(out_path1)
-        plt.close()
-        print(f"Saved: {out_path1}")
+        plt.close(fig)
+        saved.append(out_path1)
 
     # --- Visualization 2: Distribution ---
-    if not df.empty:
-        plt.figure(figsize=(10, 6))
-        df['Proximity_Type'] = df['Proximity_bp'].apply(
-            lambda x: 'Downstream (Positive)' if x > 0 else ('Embedded (Zero)' if x == 0 else 'Upstream (Negative)')
-        )
+    fig = plt.figure(figsize=(10, 6))
+    df['Proximity_Type'] = np.select(
+        [df['Proximity_bp'] > 0, df['Proximity_bp'] == 0],
+        ['Downstream (Positive)', 'Embedded (Zero)'], default='Upstream (Negative)'
+    )
 
-        sns.histplot(
-            df, x='Proximity_bp', hue='Proximity_Type',
-            multiple='stack', bins=15, kde=False,
-            palette={'Downstream (Positive)': 'skyblue', 'Upstream (Negative)': 'salmon', 'Embedded (Zero)': 'lightgreen'}
-        )
-        plt.axvline(x=0, color='grey', linestyle='--', linewidth=1)
-        plt.title(f'Proximity Distribution: {base_name}', fontsize=14)
-        plt.tight_layout()
-        
-        # Save to output folder
-        out_path2 = os.path.join(output_dir, f"{base_name}_proximity_dist.png")
-        plt.savefig(out_path2)
-        plt.close()
-        print(f"Saved: {out_path2}")
+    sns.histplot(
+        df, x='Proximity_bp', hue='Proximity_Type',
+        multiple='stack', bins=15, kde=False,
+        palette={'Downstream (Positive)': 'skyblue', 'Upstream (Negative)': 'salmon', 'Embedded (Zero)': 'lightgreen'}
+    )
+    plt.axvline(x=0, color='grey', linestyle='--', linewidth=1)
+    plt.title(f'Proximity Distribution: {base_name}', fontsize=14)
+    plt.tight_layout()
+
+    # Save to output folder
+    out_path2 = os.path.join(output_dir, f"{base_name}_proximity_dist.png")
+    plt.savefig(out_path2)
+    plt.close(fig)
+    saved.append(out_path2)
+    return saved
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Batch visualize ARG-MGE data and save to a folder.")
-    parser.add_argument('-i', '--input_dir', type=str, required=True, help="Directory with input files.")
+    parser.add_argument('-i', '--input_dir', type=str, help="Directory with *_summary.tsv or *_cdmec.parquet files.")
+    parser.add_argument('--store', type=str, help="SQLite results store written by cdmec_analyzer.py --store (instead of -i).")
     parser.add_argument('-o', '--output_dir', type=str, required=True, help="Directory to save plots.")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="Rendering processes (default: all cores).")
+    parser.add_argument('--force', action='store_true', help="Re-render samples whose plots are newer than their data.")
 
     args = parser.parse_args()
+    if not args.input_dir and not args.store: parser.error("one of -i/--input_dir or --store is required")
 
-    if os.path.isdir(args.input_dir):
-        for filename in os.listdir(args.input_dir):
-            full_path = os.path.join(args.input_dir, filename)
-            if os.path.isfile(full_path):
-                visualize_arg_mge_robust(full_path, args.output_dir)
+    started = time.perf_counter()
+    if args.store:
+        results = visualize_store(args.store, args.output_dir, args.workers, args.force)
+    elif os.path.isdir(args.input_dir):
+        # Only per-sample summaries; JSON, sketches, saved hits and raw BLAST rows are never opened
+        tasks = [(p, args.output_dir, args.force) for p in sorted(find_result_files(args.input_dir))]
+        results = run_batch(render_file, tasks, args.workers)
     else:
         print(f"Error: {args.input_dir} is not a valid directory.")
+        results = None
+    if results is not None: print_timing_summary(results, time.perf_counter() - started)
@@ -2,43 +2,95 @@
 # Copyright (C) 2025 [Dr. Reema Singh]
 # Licensed under the GNU General Public License v3.0
 
+import matplotlib
+matplotlib.use('Agg')  # Worker processes render off-screen
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.lines import Line2D
 import argparse
 import os
 import glob
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+MAP_COLUMNS = ['Contig', 'Name', 'Start', 'End', 'Type']
+
+def feature_type(status):
+    """ARG vs MGE from the first word of 'Inferred_Status'."""
+    status = str(status).split()[0].upper() if str(status).split() else ""
+    return 'MGE' if "MGE" in status or "MOBILE" in status else 'ARG'
+
+def add_labels(df):
+    df['Label'] = df['Name'].astype(str).str.split('|').str[-1].str.split('_').str[0]
+    return df
 
 def load_data(file_path):
     """Robustly loads data and identifies ARG vs MGE status."""
-    records = []
     try:
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-            for line in lines[1:]:
-                t = line.split()
-                if len(t) >= 8:
-                    # Logic to distinguish ARG from MGE based on 'Inferred_Status'
-                    # or proximity columns typical in cdmec outputs
-                    status = t[7].upper() 
-                    is_mge = "MGE" in status or "MOBILE" in status
-                    records.append({
-                        'Name': t[2], 
-                        'Start': int(t[3]), 
-                        'End': int(t[4]),
-                        'Type': 'MGE' if is_mge else 'ARG'
-                    })
-        df = pd.DataFrame(records)
-        df['Label'] = df['Name'].apply(lambda x: str(x).split('|')[-1].split('_')[0])
-        return df
+        try:
+            raw = pd.read_csv(file_path, sep='\t', usecols=['Contig_ID', 'ARG_Name', 'ARG_Start', 'ARG_End', 'Inferred_Status'],
+                              dtype={'Contig_ID': str, 'ARG_Name': str, 'ARG_Start': 'int64', 'ARG_End': 'int64', 'Inferred_Status': str})
+            df = pd.DataFrame({'Contig': raw['Contig_ID'], 'Name': raw['ARG_Name'], 'Start': raw['ARG_Start'],
+                               'End': raw['ARG_End'], 'Type': raw['Inferred_Status'].map(feature_type)})
+        except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError):
+            # Whitespace-separated files fall back to token parsing
+            records = []
+            with open(file_path, 'r') as f:
+                next(f, None)
+                for line in f:
+                    t = line.split()
+                    if len(t) >= 8: records.append((t[1], t[2], int(t[3]), int(t[4]), feature_type(t[7])))
+            df = pd.DataFrame(records, columns=MAP_COLUMNS)
+        return add_labels(df)
     except Exception as e:
         print(f"Skipping {file_path}: {e}")
         return None
 
-def plot_simultaneous(df, sample_id, start_bp, end_bp, output_path):
+class RegionIndex:
+    """Per-contig features sorted by Start with a running max End, so a window is two binary searches per contig."""
+
+    def __init__(self, df):
+        self.df = df.sort_values(['Contig', 'Start'], kind='stable').reset_index(drop=True)
+        self.contigs = {}
+        for contig, rows in self.df.groupby('Contig', sort=False, dropna=False).indices.items():
+            lo, hi = rows.min(), rows.max() + 1
+            starts = self.df['Start'].to_numpy()[lo:hi]
+            max_ends = np.maximum.accumulate(self.df['End'].to_numpy()[lo:hi])
+            self.contigs[contig] = (lo, starts, max_ends)
+
+    def window(self, start_bp, end_bp, contig=None):
+        """Rows overlapping [start_bp, end_bp] (End >= start and Start <= end), optionally on one contig."""
+        ends = self.df['End'].to_numpy()
+        picked = []
+        for name, (offset, starts, max_ends) in self.contigs.items():
+            if contig is not None and name != contig: continue
+            # max_ends is non-decreasing, so everything left of lo ends before the window opens
+            lo = np.searchsorted(max_ends, start_bp, side='left')
+            hi = np.searchsorted(starts, end_bp, side='right')
+            if lo >= hi: continue
+            candidates = np.arange(offset + lo, offset + hi)
+            picked.append(candidates[ends[candidates] >= start_bp])
+        if not picked: return self.df.iloc[0:0]
+        return self.df.iloc[np.sort(np.concatenate(picked))]
+
+def load_store_window(conn, sample_id, start_bp, end_bp, contig=None):
+    """Rows of one sample overlapping the window, via the (Sample_ID, ARG_Start) index; same frame as load_data."""
+    query = ("SELECT Contig_ID, ARG_Name, ARG_Start, ARG_End, Inferred_Status FROM associations "
+             "WHERE Sample_ID = ? AND ARG_Start <= ? AND ARG_End >= ?")
+    params = [sample_id, end_bp, start_bp]
+    if contig is not None:
+        query += " AND Contig_ID = ?"
+        params.append(contig)
+    records = [(c, name, int(start), int(end), feature_type(status)) for c, name, start, end, status in conn.execute(query, params)]
+    return add_labels(pd.DataFrame(records, columns=MAP_COLUMNS))
+
+def plot_simultaneous(df, sample_id, start_bp, end_bp, output_path, dpi=300):
     """Generates a fragmented map for a specific window with a legend."""
-    df_win = df[(df['End'] >= start_bp) & (df['Start'] <= end_bp)].copy()
+    df_win = df[(df['End'] >= start_bp) & (df['Start'] <= end_bp)].sort_values('Start', kind='stable')
+    win_starts, win_ends = df_win['Start'].to_numpy(), df_win['End'].to_numpy()
     
     num_rows = 10 
     bp_per_row = (end_bp - start_bp) / num_rows
@@ -54,11 +106,13 @@ def plot_simultaneous(df, sample_id, start_bp, end_bp, output_path):
         r_start = start_bp + (i * bp_per_row)
         r_end = r_start + bp_per_row
         
-        row_df = df_win[(df_win['Start'] >= r_start - 100) & (df_win['End'] <= r_end + 100)]
+        # df_win is sorted by Start, so each segment is a slice plus an End check
+        lo = np.searchsorted(win_starts, r_start - 100, side='left')
+        hi = np.searchsorted(win_starts, r_end + 100, side='right')
+        row_df = df_win.iloc[lo:hi][win_ends[lo:hi] <= r_end + 100]
         ax.hlines(50, r_start, r_end, color='#7f8c8d', linewidth=10, alpha=0.5)
         
-        sorted_genes = row_df.sort_values('Start').to_dict('records')
-        for j, row in enumerate(sorted_genes):
+        for j, row in enumerate(row_df.itertuples(index=False)):
             # Up/Down Alternating Tiers (Total 8 height levels)
             is_up = (j % 2 == 0)
             tier = (j // 2) % 4
@@ -66,15 +120,15 @@ def plot_simultaneous(df, sample_id, start_bp, end_bp, output_path):
             y_text = 50 + y_offset if is_up else 50 - y_offset
             
             # Feature Box
-            color = color_map.get(row['Type'], 'gray')
-            ax.add_patch(patches.Rectangle((row['Start'], 48), max(100, row['End']-row['Start']), 4, 
+            color = color_map.get(row.Type, 'gray')
+            ax.add_patch(patches.Rectangle((row.Start, 48), max(100, row.End-row.Start), 4, 
                                           facecolor=color, edgecolor='black', zorder=5))
             
             # Anchor Line
-            ax.plot([row['Start'], row['Start']], [50, y_text], 'k:', lw=1, alpha=0.3)
+            ax.plot([row.Start, row.Start], [50, y_text], 'k:', lw=1, alpha=0.3)
             
             # Label
-            ax.text(row['Start'], y_text, row['Label'], fontsize=16, weight='bold',
+            ax.text(row.Start, y_text, row.Label, fontsize=16, weight='bold',
                     ha='center', va='bottom' if is_up else 'top',
                     bbox=dict(facecolor='white', edgecolor='none', alpha=0.8, pad=0.5))
 
@@ -94,25 +148,96 @@ def plot_simultaneous(df, sample_id, start_bp, end_bp, output_path):
     plt.suptitle(f"COMPARATIVE GENOMIC MAP: {sample_id}\nWindow: {start_bp:,} - {end_bp:,} bp", 
                  fontsize=32, y=0.98, weight='bold')
     
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+def window_path(output_dir, name, window, multi):
+    start_bp, end_bp = window
+    return os.path.join(output_dir, f"{name}_{start_bp}-{end_bp}_Comparison.png" if multi else f"{name}_Comparison.png")
+
+def render_file(task):
+    """Worker: indexes one summary file once and renders every window from it."""
+    file_path, windows, contig, output_dir, dpi = task
+    name = os.path.basename(file_path).split('.')[0]
+    started = time.perf_counter()
+    data = load_data(file_path)
+    if data is None: return name, [], time.perf_counter() - started
+    index = RegionIndex(data)
+    saved = []
+    for window in windows:
+        out_path = window_path(output_dir, name, window, len(windows) > 1)
+        plot_simultaneous(index.window(*window, contig=contig), name, *window, out_path, dpi)
+        saved.append(out_path)
+    return name, saved, time.perf_counter() - started
+
+def render_store_sample(task):
+    """Worker: renders every window of one store sample; each window is its own indexed range query."""
+    store_path, sample_id, windows, contig, output_dir, dpi = task
+    name = f"{sample_id}_cdmec_summary"
+    started = time.perf_counter()
+    saved = []
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        for window in windows:
+            out_path = window_path(output_dir, name, window, len(windows) > 1)
+            plot_simultaneous(load_store_window(conn, sample_id, *window, contig), name, *window, out_path, dpi)
+            saved.append(out_path)
+    finally: conn.close()
+    return name, saved, time.perf_counter() - started
+
+def read_windows(args, parser):
+    """--start/--end plus any --window START:END and --windows_file lines ('start end', '#' comments allowed)."""
+    windows = []
+    if args.start is not None or args.end is not None:
+        if args.start is None or args.end is None: parser.error("--start and --end must be given together")
+        windows.append((args.start, args.end))
+    for spec in args.window or []:
+        try: start_bp, end_bp = (int(x) for x in spec.replace(',', '').split(':'))
+        except ValueError: parser.error(f"--window expects START:END, got {spec!r}")
+        windows.append((start_bp, end_bp))
+    if args.windows_file:
+        with open(args.windows_file) as f:
+            for line in f:
+                fields = line.split('#')[0].split()
+                if len(fields) >= 2: windows.append((int(fields[0]), int(fields[1])))
+    if not windows: parser.error("give a window with --start/--end, --window or --windows_file")
+    bad = [w for w in windows if w[1] <= w[0]]
+    if bad: parser.error(f"window end must be greater than start: {bad[0][0]}:{bad[0][1]}")
+    return list(dict.fromkeys(windows))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("-i", "--input_dir", required=True, help="Directory with .txt/.tsv files")
-    parser.add_argument("--start", type=int, required=True, help="Fixed Start (bp)")
-    parser.add_argument("--end", type=int, required=True, help="Fixed End (bp)")
+    parser.add_argument("-i", "--input_dir", help="Directory with .txt/.tsv files")
+    parser.add_argument("--store", help="SQLite results store written by cdmec_analyzer.py --store (instead of -i)")
+    parser.add_argument("--start", type=int, help="Fixed Start (bp)")
+    parser.add_argument("--end", type=int, help="Fixed End (bp)")
+    parser.add_argument("--window", action="append", metavar="START:END", help="Extra window to render (repeatable)")
+    parser.add_argument("--windows_file", help="File with one 'start end' window per line, all rendered in one pass")
+    parser.add_argument("--contig", help="Only draw features on this contig (default: all contigs)")
     parser.add_argument("-o", "--output_dir", default="Simultaneous_Results")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Rendering processes (default: all cores)")
+    parser.add_argument("--dpi", type=int, default=300, help="Output resolution")
     args = parser.parse_args()
+    if not args.input_dir and not args.store: parser.error("one of -i/--input_dir or --store is required")
+    windows = read_windows(args, parser)
 
     if not os.path.exists(args.output_dir): os.makedirs(args.output_dir)
-    
-    files = glob.glob(os.path.join(args.input_dir, "*.txt")) + glob.glob(os.path.join(args.input_dir, "*.tsv"))
-    
-    for f in files:
-        name = os.path.basename(f).split('.')[0]
-        print(f"Generating simultaneous map for: {name}")
-        data = load_data(f)
-        if data is not None:
-            out_path = os.path.join(args.output_dir, f"{name}_Comparison.png")
-            plot_simultaneous(data, name, args.start, args.end, out_path)
+
+    if args.store:
+        conn = sqlite3.connect(f"file:{args.store}?mode=ro", uri=True)
+        sample_ids = [r[0] for r in conn.execute("SELECT DISTINCT Sample_ID FROM associations ORDER BY Sample_ID")]
+        conn.close()
+        worker, tasks = render_store_sample, [(args.store, s, windows, args.contig, args.output_dir, args.dpi) for s in sample_ids]
+    else:
+        files = glob.glob(os.path.join(args.input_dir, "*.txt")) + glob.glob(os.path.join(args.input_dir, "*.tsv"))
+        worker, tasks = render_file, [(f, windows, args.contig, args.output_dir, args.dpi) for f in files]
+
+    print(f"Generating simultaneous maps: {len(tasks)} samples x {len(windows)} windows")
+    started = time.perf_counter()
+    n_maps = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        outcomes = executor.map(worker, tasks) if args.workers > 1 and len(tasks) > 1 else map(worker, tasks)
+        for name, saved, seconds in outcomes:
+            print(f"Generated {len(saved)} map(s) for: {name} ({seconds:.1f}s)")
+            n_maps += len(saved)
+    print(f"Done: {n_maps} maps in {time.perf_counter() - started:.1f}s")
@@ -5,31 +5,143 @@
 import matplotlib
 matplotlib.use('Agg')  # Essential for Linux/HPC environments
 import pandas as pd
+import numpy as np
 import glob
+import json
 import os
+import sqlite3
+import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 
-def collect_data(input_dir):
+# Result-file helpers shared with the reporters live in bin/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bin"))
+from cdmec_results import find_result_files
+
+# Explicit dtypes skip pandas' type sniffing and keep coordinates integer across appends
+RESULT_DTYPES = {"Sample_ID": str, "Contig_ID": str, "ARG_Name": str, "ARG_Start": "int64", "ARG_End": "int64",
+                 "MGE_Association": str, "Proximity_bp": "int64", "Inferred_Status": str}
+HIST_RANGE = 10000  # the 10kb context window
+HIST_BINS = 100
+
+def decode_categories(df):
+    for col in df.select_dtypes("category").columns: df[col] = df[col].astype(object)
+    return df
+
+def read_result_file(path):
+    if path.endswith(".parquet"): return decode_categories(pd.read_parquet(path))
+    return pd.read_csv(path, sep='\t', dtype=RESULT_DTYPES)
+
+def proximity_counts(proximity, hist_range=HIST_RANGE, bins=HIST_BINS):
+    return np.histogram(proximity, bins=bins, range=(-hist_range, hist_range))[0]
+
+def summarize_file(path, hist_range=HIST_RANGE, bins=HIST_BINS):
+    """Worker: one summary file -> (path, rows, fixed-bin proximity counts)."""
+    df = read_result_file(path)
+    return path, df, proximity_counts(df['Proximity_bp'], hist_range, bins).tolist()
+
+def file_signature(path):
+    st = os.stat(path)
+    return {"Size": st.st_size, "Mtime": st.st_mtime}
+
+def collect_dataset(dataset_dir, master_path, hist_range=HIST_RANGE):
+    # A --parquet_dataset directory reads back in one call
+    print("Found a partitioned Parquet dataset. Loading now...")
+    df = decode_categories(pd.read_parquet(dataset_dir))
+    df = df[["Sample_ID"] + [c for c in df.columns if c != "Sample_ID"]]
+    df.to_csv(master_path, index=False)
+    return len(df), proximity_counts(df['Proximity_bp'], hist_range)
+
+def collect_store(store_path, master_path, hist_range=HIST_RANGE, bins=HIST_BINS):
+    """Exports the master table from an analyzer --store database in chunks and bins Proximity_bp in SQL."""
+    print(f"--- [STEP 1/3] Reading Store: {store_path} ---")
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        rows, first = 0, True
+        for chunk in pd.read_sql_query("SELECT * FROM associations ORDER BY Sample_ID", conn, chunksize=200000):
+            chunk.to_csv(master_path, mode='w' if first else 'a', header=first, index=False)
+            rows, first = rows + len(chunk), False
+        if first:
+            print("!!! ERROR: The store holds no associations. !!!")
+            return None
+        # Same bins as np.histogram: [edge_i, edge_i+1), with the last bin closed on the right
+        width = 2 * hist_range / bins
+        counts = np.zeros(bins, dtype=int)
+        for b, n in conn.execute("SELECT MIN(CAST((Proximity_bp + ?) / ? AS INTEGER), ?) AS b, COUNT(*) FROM associations "
+                                 "WHERE Proximity_bp BETWEEN ? AND ? GROUP BY b",
+                                 (hist_range, width, bins - 1, -hist_range, hist_range)):
+            counts[b] = n
+    finally: conn.close()
+    return rows, counts
+
+def collect_data(input_dir, master_path, workers=None, full=False, hist_range=HIST_RANGE):
+    """Brings master_path up to date with input_dir, reading only new or changed summaries.
+
+    The list of merged files, their sample IDs and per-file histogram counts live in
+    <master>.state.json, so unchanged files are never re-read. Returns (rows, histogram counts).
+    """
     print(f"--- [STEP 1/3] Scanning Directory: {input_dir} ---")
-    tsv_files = glob.glob(os.path.join(input_dir, "*_summary.tsv"))
-    
-    if not tsv_files:
-        print("!!! ERROR: No *_summary.tsv files found. !!!")
+    if glob.glob(os.path.join(input_dir, "Sample_ID=*")):
+        return collect_dataset(input_dir, master_path, hist_range)
+
+    result_files = find_result_files(input_dir)
+    if not result_files:
+        print("!!! ERROR: No *_summary.tsv or *_cdmec.parquet files found. !!!")
         return None
 
-    print(f"Found {len(tsv_files)} files. Merging now...")
-    all_df = [pd.read_csv(f, sep='\t') for f in tsv_files]
-    return pd.concat(all_df, ignore_index=True)
+    state_path = f"{master_path}.state.json"
+    settings = {"Hist_Range": hist_range, "Bins": HIST_BINS}
+    state, resumed = {"Settings": settings, "Files": {}}, False
+    if not full and os.path.exists(state_path) and os.path.exists(master_path):
+        with open(state_path) as f: saved = json.load(f)
+        if saved.get("Settings") == settings: state, resumed = saved, True
+    merged = state["Files"]
+
+    signatures = {f: file_signature(f) for f in result_files}
+    fresh = [f for f in result_files if f not in merged or
+             {k: merged[f][k] for k in ("Size", "Mtime")} != signatures[f]]
+    removed = [f for f in merged if f not in signatures]
+    stale = [f for f in fresh + removed if f in merged]
+    print(f"Found {len(result_files)} files: {len(fresh) - len(stale) + len(removed)} new, {len(stale) - len(removed)} changed, "
+          f"{len(removed)} removed, {len(result_files) - len(fresh)} already merged.")
+
+    frames = []
+    if fresh:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for path, df, counts in executor.map(summarize_file, fresh, [hist_range] * len(fresh),
+                                                 chunksize=max(1, len(fresh) // (4 * (workers or os.cpu_count() or 1)))):
+                merged[path] = {**signatures[path], "Samples": sorted(df['Sample_ID'].astype(str).unique().tolist()),
+                                "Rows": len(df), "Hist": counts}
+                frames.append(df)
+
+    # Appending is only safe onto the master that the loaded state describes; --full, a missing or
+    # mismatched state (e.g. a master from an older collector) all rebuild it from scratch
+    if stale or not resumed:
+        stale_samples = {sample for f in stale for sample in state["Files"].get(f, {}).get("Samples", [])} if stale else set()
+        kept = pd.read_csv(master_path, dtype=RESULT_DTYPES) if stale else None
+        if kept is not None: kept = kept[~kept['Sample_ID'].astype(str).isin(stale_samples)]
+        pd.concat(([kept] if kept is not None else []) + frames, ignore_index=True).to_csv(master_path, index=False)
+    elif frames:
+        # Only new samples: append instead of rewriting the whole master table
+        pd.concat(frames, ignore_index=True).to_csv(master_path, mode='a', header=False, index=False)
+    for f in removed: merged.pop(f, None)
+
+    with open(f"{state_path}.tmp", 'w') as f: json.dump(state, f)
+    os.replace(f"{state_path}.tmp", state_path)
+    total_rows = sum(entry["Rows"] for entry in merged.values())
+    counts = np.sum([entry["Hist"] for entry in merged.values()], axis=0) if merged else np.zeros(HIST_BINS, dtype=int)
+    return total_rows, counts
 
-def create_enhanced_plot(df, output_prefix):
+def create_enhanced_plot(counts, output_prefix, hist_range=HIST_RANGE):
     print(f"--- [STEP 2/3] Generating Publication-Quality Plot ---")
     
     plt.figure(figsize=(12, 7))
     
     # 1. Create the Histogram
-    # We use more bins (100) for better resolution near 0
-    plt.hist(df['Proximity_bp'], bins=100, color='#2c7bb6', edgecolor='white', alpha=0.8)
+    # 100 fixed bins across the window, pre-counted per file so the full table is never needed here
+    edges = np.linspace(-hist_range, hist_range, len(counts) + 1)
+    plt.hist(edges[:-1], bins=edges, weights=counts, color='#2c7bb6', edgecolor='white', alpha=0.8)
     
     # 2. Add the "Embedded" Red Line
     plt.axvline(0, color='#d7191c', linestyle='--', linewidth=2.5, label='Embedded (0 bp)')
@@ -45,7 +157,7 @@ def create_enhanced_plot(df, output_prefix):
     
     # 5. Styling
     plt.grid(axis='y', linestyle=':', alpha=0.7)
-    plt.xlim(-10000, 10000) # Keep the 10kb window
+    plt.xlim(-hist_range, hist_range) # Keep the 10kb window
     plt.legend(loc='upper right')
     
     # Save the file
@@ -56,19 +168,25 @@ def create_enhanced_plot(df, output_prefix):
 
 def main():
     parser = argparse.ArgumentParser(description="CdMEC-A HPC Collector & Visualizer")
-    parser.add_argument("-i", "--input", required=True, help="Input directory with TSVs")
+    parser.add_argument("-i", "--input", help="Input directory with TSVs/Parquet files, or a Parquet dataset")
+    parser.add_argument("--store", help="SQLite results store written by cdmec_analyzer.py --store (instead of -i)")
     parser.add_argument("-o", "--output", default="MyReport", help="Output prefix")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Processes used to read new summaries")
+    parser.add_argument("--full", action="store_true", help="Ignore the merge state and rebuild the master table")
+    parser.add_argument("--hist_range", type=int, default=HIST_RANGE, help="Histogram covers +/- this many bp")
     args = parser.parse_args()
+    if not args.input and not args.store: parser.error("one of -i/--input or --store is required")
 
-    master_df = collect_data(args.input)
+    master_path = f"{args.output}_Master.csv"
+    if args.store: collected = collect_store(args.store, master_path, args.hist_range)
+    else: collected = collect_data(args.input, master_path, args.workers, args.full, args.hist_range)
     
-    if master_df is not None:
-        # Save Master CSV
-        master_df.to_csv(f"{args.output}_Master.csv", index=False)
-        print(f"--- [STEP 3/3] Created {args.output}_Master.csv ---")
+    if collected is not None:
+        total_rows, counts = collected
+        print(f"--- [STEP 3/3] Updated {master_path} ({total_rows} rows) ---")
         
         # Create Plot
-        create_enhanced_plot(master_df, args.output)
+        create_enhanced_plot(counts, args.output, args.hist_range)
         print("\nProcess Complete!")
 
 if __name__ == "__main__":